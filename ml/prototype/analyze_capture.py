@@ -3,20 +3,23 @@ from __future__ import annotations
 import json
 from dataclasses import asdict
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import cv2
-import numpy as np
 import typer
 from rich import print
-from rich.progress import track
 
-from aruco_scale import detect_aruco_scale
-from geometry import compute_metrics
-from segmentation import segment_roi
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# OpenCV, NumPy and the pipeline modules are imported inside the command so that
+# `--help` and the unified ml.py dispatcher don't pay for them.
 
 
 def _augment_image(image_bgr: np.ndarray, seed: int) -> np.ndarray:
+    import cv2
+    import numpy as np
+
     rng = np.random.default_rng(seed)
     img = image_bgr.copy().astype(np.float32)
     # Brightness and contrast jitter
@@ -43,10 +46,24 @@ def main(
     out: Optional[Path] = typer.Option(None, help="Output overlay image path (PNG)"),
     json_out: Optional[Path] = typer.Option(None, help="Output metrics JSON path"),
     uncertainty_samples: int = typer.Option(0, min=0, max=32, help="If >0, run ensemble sampling for uncertainty"),
+    model: Optional[Path] = typer.Option(None, exists=True, readable=True, help="Segmentation ONNX model (default: classical)"),
+    max_batch: int = typer.Option(8, min=1, help="Max images per model call when segmenting ensemble samples"),
+    aruco_preset: str = typer.Option("default", help="ArUco detector preset: default, fast, accurate, low-light"),
+    centerline: str = typer.Option("contour", help="Centerline method: contour (outline midline) or skeleton"),
 ):
     """
     Analyze a capture image: detect ArUco scale, segment ROI, extract centerline, compute metrics.
     """
+    import cv2
+    import numpy as np
+
+    from aruco_scale import detect_aruco_scale
+    from geometry import CENTERLINE_METHODS, compute_metrics
+    from segmentation import OnnxSegmenter, segment_roi_contour
+
+    if centerline not in CENTERLINE_METHODS:
+        raise typer.BadParameter(f"--centerline must be one of {', '.join(CENTERLINE_METHODS)}")
+
     print("[bold]Loading image...[/bold]")
     image_bgr = cv2.imread(str(image))
     if image_bgr is None:
@@ -54,18 +71,25 @@ def main(
 
     # Step 1: ArUco scale detection
     print("[bold]Detecting calibration marker...[/bold]")
-    scale = detect_aruco_scale(image_bgr, marker_length_mm=marker_mm)
+    scale = detect_aruco_scale(image_bgr, marker_length_mm=marker_mm, preset=aruco_preset)
     px_per_mm = scale.pixels_per_mm
     if px_per_mm is None:
         print("[yellow]Warning: No calibration marker detected. Results will not be scaled.[/yellow]")
 
-    # Step 2: Segmentation (placeholder)
+    # Step 2: Segmentation (learned model if provided, classical placeholder otherwise)
     print("[bold]Segmenting region of interest...[/bold]")
-    mask, seg_debug = segment_roi(image_bgr)
+    segmenter = OnnxSegmenter(model) if model is not None else None
+    contour = None  # compute_metrics finds it from the mask if segmentation didn't provide one
+    if segmenter is not None:
+        mask = segmenter.segment(image_bgr)
+        seg_debug = image_bgr.copy()
+        seg_debug[mask > 0] = (0, 255, 0)
+    else:
+        mask, contour, seg_debug = segment_roi_contour(image_bgr, debug=True)
 
     # Step 3: Geometry and metrics
     print("[bold]Computing centerline and metrics...[/bold]")
-    metrics, geom_debug, path = compute_metrics(mask, pixels_per_mm=px_per_mm)
+    metrics, geom_debug, path = compute_metrics(mask, pixels_per_mm=px_per_mm, method=centerline, contour=contour)
 
     # Compose overlay
     overlay = image_bgr.copy()
@@ -103,11 +127,22 @@ def main(
             "hinge_location_ratio": [],
         }
         seeds = np.random.SeedSequence().spawn(uncertainty_samples)
-        for i, ss in enumerate(seeds):
-            aug = _augment_image(image_bgr, seed=int(ss.entropy))
+        augs = [_augment_image(image_bgr, seed=int(ss.entropy)) for ss in seeds]
+        if segmenter is not None:
+            # Ensemble members are independent, so segment them in batched model calls
+            masks = []
+            for i in range(0, len(augs), max_batch):
+                masks.extend(segmenter.predict_masks(augs[i:i + max_batch]))
+            contours = [None] * len(masks)
+        else:
+            masks, contours = [], []
+            for aug in augs:
+                msk, cnt, _ = segment_roi_contour(aug)
+                masks.append(msk)
+                contours.append(cnt)
+        for msk, cnt in zip(masks, contours):
             # Reuse detected scale from original to keep calibration stable
-            msk, _ = segment_roi(aug)
-            m_i, _, _ = compute_metrics(msk, pixels_per_mm=px_per_mm)
+            m_i, _, _ = compute_metrics(msk, pixels_per_mm=px_per_mm, method=centerline, contour=cnt)
             samples["arc_length_mm"].append(m_i.arc_length_mm)
             samples["length_mm"].append(m_i.length_mm)
             samples["max_curvature_deg"].append(m_i.max_curvature_deg)
@@ -1,25 +1,118 @@
 from __future__ import annotations
 
 import math
+import os
+import threading
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 
 import cv2
 import numpy as np
 
 
+# DetectorParameters overrides per preset. Most of ArUco's detection time goes into thresholding
+# the image once per adaptive-threshold window size (min..max in steps), so the presets mainly
+# trade how many windows are swept against detection rate on hard (dim, blurred, small) markers:
+#   default    OpenCV defaults: windows 3, 13, 23
+#   fast       one 15 px window; about as reliable as default on well-lit cards at ~2.5x the speed
+#   accurate   ten windows 3..39 and sub-pixel corner refinement for a steadier px/mm
+#   low-light  wide windows, lower threshold offset and Otsu contrast floor for dim frames
+PRESETS: Dict[str, Dict[str, object]] = {
+    "default": {},
+    "fast": {
+        "adaptiveThreshWinSizeMin": 15,
+        "adaptiveThreshWinSizeMax": 15,
+    },
+    "accurate": {
+        "adaptiveThreshWinSizeMin": 3,
+        "adaptiveThreshWinSizeMax": 39,
+        "adaptiveThreshWinSizeStep": 4,
+        "minMarkerPerimeterRate": 0.01,
+        "cornerRefinementMethod": cv2.aruco.CORNER_REFINE_SUBPIX,
+    },
+    "low-light": {
+        "adaptiveThreshWinSizeMin": 5,
+        "adaptiveThreshWinSizeMax": 65,
+        "adaptiveThreshWinSizeStep": 12,
+        "adaptiveThreshConstant": 3.0,
+        "minOtsuStdDev": 2.0,
+        "cornerRefinementMethod": cv2.aruco.CORNER_REFINE_SUBPIX,
+    },
+}
+
+
+def make_parameters(preset: str = "default") -> cv2.aruco.DetectorParameters:
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown ArUco preset {preset!r}; choose from {', '.join(PRESETS)}")
+    parameters = cv2.aruco.DetectorParameters()
+    for name, value in PRESETS[preset].items():
+        setattr(parameters, name, value)
+    return parameters
+
+
+# Detector registry. OpenCV does not promise that one ArucoDetector can be used from several
+# threads at once, so each thread gets its own instances, keyed by (dictionary, preset). The
+# cache is also tagged with the process id: a forked worker starts with an empty registry
+# instead of objects it inherited from its parent.
+_local = threading.local()
+
+
+def _registry() -> Dict[Tuple[str, object], object]:
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.cache = {}
+    return _local.cache
+
+
+def get_dictionary(dictionary_name: int = cv2.aruco.DICT_4X4_50) -> cv2.aruco.Dictionary:
+    """This thread's instance of a predefined dictionary."""
+    cache = _registry()
+    key = ("dict", dictionary_name)
+    if key not in cache:
+        cache[key] = cv2.aruco.getPredefinedDictionary(dictionary_name)
+    return cache[key]
+
+
+def get_detector(dictionary_name: int = cv2.aruco.DICT_4X4_50, preset: str = "default") -> cv2.aruco.ArucoDetector:
+    """This thread's detector for (dictionary, preset), created on first use."""
+    cache = _registry()
+    key = ("detector", (dictionary_name, preset))
+    if key not in cache:
+        cache[key] = cv2.aruco.ArucoDetector(get_dictionary(dictionary_name), make_parameters(preset))
+    return cache[key]
+
+
+def warm_up(
+    dictionaries: Iterable[int] = (cv2.aruco.DICT_4X4_50,),
+    presets: Iterable[str] = ("default",),
+) -> None:
+    """
+    Create this thread's detectors and run each once on a blank frame, so the first real frame
+    doesn't pay for dictionary construction and OpenCV's lazy initialisation.
+    """
+    blank = np.full((64, 64), 255, dtype=np.uint8)
+    for dictionary_name in dictionaries:
+        for preset in presets:
+            get_detector(dictionary_name, preset).detectMarkers(blank)
+
+
 @dataclass
 class ArucoScaleResult:
     pixels_per_mm: Optional[float]
     mean_marker_side_px: Optional[float]
     detected_markers: int
-    debug_image_bgr: np.ndarray
+    debug_image_bgr: Optional[np.ndarray]  # None when called with draw_debug=False
+    corners: Tuple[np.ndarray, ...] = ()
+    ids: Optional[np.ndarray] = None
 
 
 def detect_aruco_scale(
     image_bgr: np.ndarray,
     marker_length_mm: float = 20.0,
     dictionary_name: int = cv2.aruco.DICT_4X4_50,
+    preset: str = "default",
+    draw_debug: bool = True,
+    gray: Optional[np.ndarray] = None,
 ) -> ArucoScaleResult:
     """
     Detect ArUco markers and estimate pixels-per-millimeter scale.
@@ -32,26 +125,31 @@ def detect_aruco_scale(
         The real-world side length of the calibration square on the card, in millimeters.
     dictionary_name: int
         cv2.aruco dictionary constant, e.g., DICT_4X4_50.
+    preset: str
+        Detector parameter preset, one of PRESETS ("default", "fast", "accurate", "low-light").
+    draw_debug: bool
+        Render debug_image_bgr. Callers that draw the returned corners onto their own frame
+        (live_capture) pass False and skip the full-frame copy.
+    gray: np.ndarray, optional
+        The image already converted to grayscale, if the caller has it.
 
     Returns
     -------
     ArucoScaleResult
-        Contains pixels_per_mm (if markers found), marker stats, and a debug render.
+        Contains pixels_per_mm (if markers found), marker stats and corners, and a debug render.
     """
-    debug = image_bgr.copy()
-    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
-
-    aruco_dict = cv2.aruco.getPredefinedDictionary(dictionary_name)
-    parameters = cv2.aruco.DetectorParameters()
-    detector = cv2.aruco.ArucoDetector(aruco_dict, parameters)
+    debug = image_bgr.copy() if draw_debug else None
+    if gray is None:
+        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
 
-    corners, ids, _ = detector.detectMarkers(gray)
+    corners, ids, _ = get_detector(dictionary_name, preset).detectMarkers(gray)
 
     mean_side_px: Optional[float] = None
     px_per_mm: Optional[float] = None
 
     if ids is not None and len(ids) > 0:
-        cv2.aruco.drawDetectedMarkers(debug, corners, ids)
+        if debug is not None:
+            cv2.aruco.drawDetectedMarkers(debug, corners, ids)
         side_lengths: list[float] = []
         for marker_corners in corners:
             pts = marker_corners[0]
@@ -70,6 +168,7 @@ def detect_aruco_scale(
             if marker_length_mm > 0:
                 px_per_mm = mean_side_px / marker_length_mm
 
+        if debug is not None:
             # Draw scale text
             text = f"px/mm: {px_per_mm:.3f}" if px_per_mm else "px/mm: N/A"
             cv2.putText(
@@ -90,5 +189,7 @@ def detect_aruco_scale(
         mean_marker_side_px=mean_side_px,
         detected_markers=detected,
         debug_image_bgr=debug,
+        corners=tuple(corners),
+        ids=ids,
     )
 
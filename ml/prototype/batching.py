@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import typer
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class BatcherStats:
+    batches: int = 0
+    items: int = 0
+    total_wait_ms: float = 0.0  # time items spent queued before their batch started
+    total_infer_ms: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "mean_queue_wait_ms": self.total_wait_ms / self.items if self.items else 0.0,
+            "mean_infer_ms_per_batch": self.total_infer_ms / self.batches if self.batches else 0.0,
+        }
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Coalesce single-item requests from concurrent callers into batched calls.
+
+    A batch is dispatched once it holds ``max_batch_size`` items or ``max_wait_ms`` has
+    passed since its first item was queued, whichever comes first. ``infer_batch`` must
+    return one result per input, in order; results are scattered back to each caller's
+    Future. ``max_wait_ms=0`` only batches requests that are already waiting.
+    """
+
+    def __init__(
+        self,
+        infer_batch: Callable[[List[T]], Sequence[R]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        name: str = "micro-batcher",
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.stats = BatcherStats()
+        self._infer_batch = infer_batch
+        self._queue: "queue.Queue[Optional[Tuple[T, Future, float]]]" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, item: T) -> "Future[R]":
+        fut: "Future[R]" = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((item, fut, time.perf_counter()))
+        return fut
+
+    def __call__(self, item: T) -> R:
+        return self.submit(item).result()
+
+    def map(self, items: Sequence[T]) -> List[R]:
+        futures = [self.submit(it) for it in items]
+        return [f.result() for f in futures]
+
+    def close(self) -> None:
+        """Finish everything already submitted, then stop the dispatcher thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self) -> None:
+        max_wait_s = self.max_wait_ms / 1000.0
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = first[2] + max_wait_s
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch: List[Tuple[T, Future, float]]) -> None:
+        live = [b for b in batch if b[1].set_running_or_notify_cancel()]
+        if not live:
+            return
+        start = time.perf_counter()
+        try:
+            results = self._infer_batch([b[0] for b in live])
+            if len(results) != len(live):
+                raise RuntimeError(f"infer_batch returned {len(results)} results for {len(live)} inputs")
+        except BaseException as e:
+            for _, fut, _ in live:
+                fut.set_exception(e)
+        else:
+            for (_, fut, _), r in zip(live, results):
+                fut.set_result(r)
+        end = time.perf_counter()
+        s = self.stats
+        s.batches += 1
+        s.items += len(live)
+        s.total_wait_ms += sum((start - t0) * 1000.0 for _, _, t0 in live)
+        s.total_infer_ms += (end - start) * 1000.0
+
+
+app = typer.Typer(add_completion=False)
+
+
+def _run_load(
+    infer_one: Callable[[np.ndarray], np.ndarray],
+    images: List[np.ndarray],
+    requests: int,
+    concurrency: int,
+) -> Tuple[float, np.ndarray]:
+    import numpy as np
+
+    latencies = np.zeros(requests, dtype=np.float64)
+
+    def one(i: int) -> None:
+        t0 = time.perf_counter()
+        infer_one(images[i % len(images)])
+        latencies[i] = (time.perf_counter() - t0) * 1000.0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return time.perf_counter() - start, latencies
+
+
+@app.command()
+def bench(
+    model: Path = typer.Option(..., exists=True, readable=True, help="Segmentation ONNX model"),
+    images_dir: Optional[Path] = typer.Option(None, exists=True, help="Images to send (defaults to random frames)"),
+    requests: int = typer.Option(256, min=1, help="Requests per configuration"),
+    concurrency: int = typer.Option(8, min=1, help="Concurrent callers"),
+    max_batch_sizes: List[int] = typer.Option([1, 4, 8], help="max_batch_size values to try"),
+    max_waits_ms: List[float] = typer.Option([0.0, 5.0, 20.0], help="max_wait_ms values to try"),
+    threads: int = typer.Option(0, min=0, help="ONNX Runtime intra-op threads (0 = runtime default)"),
+):
+    """
+    Measure throughput and latency of the batched segmentation backend across batching knobs.
+    """
+    import cv2
+    import numpy as np
+    from rich import print
+    from rich.table import Table
+
+    from segmentation import OnnxSegmenter
+
+    if images_dir is not None:
+        paths = sorted(images_dir.glob("*.jpg")) + sorted(images_dir.glob("*.png"))
+        images = [img for img in (cv2.imread(str(p)) for p in paths[:32]) if img is not None]
+    else:
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 256, size=(720, 1280, 3), dtype=np.uint8) for _ in range(8)]
+    if not images:
+        raise typer.BadParameter("No readable images")
+
+    segmenter = OnnxSegmenter(model, intra_op_threads=threads)
+    segmenter.predict_masks(images[:1])  # warm-up
+
+    table = Table(title=f"{requests} requests, {concurrency} concurrent callers")
+    for col in ("max_batch", "max_wait_ms", "img/s", "p50 ms", "p95 ms", "mean batch", "queue wait ms"):
+        table.add_column(col, justify="right")
+
+    elapsed, lat = _run_load(lambda im: segmenter.predict_masks([im])[0], images, requests, concurrency)
+    table.add_row("unbatched", "-", f"{requests / elapsed:.1f}", f"{np.percentile(lat, 50):.1f}",
+                  f"{np.percentile(lat, 95):.1f}", "1.00", "-")
+
+    for bs in max_batch_sizes:
+        for wait in max_waits_ms:
+            batcher = MicroBatcher(segmenter.predict_masks, max_batch_size=bs, max_wait_ms=wait)
+            elapsed, lat = _run_load(batcher, images, requests, concurrency)
+            batcher.close()
+            st = batcher.stats.as_dict()
+            table.add_row(str(bs), f"{wait:g}", f"{requests / elapsed:.1f}", f"{np.percentile(lat, 50):.1f}",
+                          f"{np.percentile(lat, 95):.1f}", f"{st['mean_batch_size']:.2f}", f"{st['mean_queue_wait_ms']:.1f}")
+    print(table)
+
+
+if __name__ == "__main__":
+    app()
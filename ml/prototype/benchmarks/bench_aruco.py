@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import itertools
+from typing import List
+
+import cv2
+import numpy as np
+import pytest
+
+from aruco_scale import PRESETS, detect_aruco_scale, get_detector
+from synthetic import SceneSpec, SyntheticScene, degrade, render_scene
+
+
+# Detection rate against time for the ArUco detector presets. Each round detects the marker in
+# a fixed set of HD scenes: three marker scales, each dimmed, blurred and noised in combination,
+# so rate and side-length error are comparable across presets and runs.
+
+GAINS = (1.0, 0.3, 0.12, 0.06)
+BLUR_SIGMAS = (0.0, 1.5, 3.0)
+PIXELS_PER_MM = (1.0, 2.0, 4.0)
+
+
+@pytest.fixture(scope="module")
+def hard_scenes() -> List[SyntheticScene]:
+    scenes = []
+    for i, (ppm, gain, blur) in enumerate(itertools.product(PIXELS_PER_MM, GAINS, BLUR_SIGMAS)):
+        scene = render_scene(SceneSpec(width=1280, height=720, pixels_per_mm=ppm, seed=1234))
+        scene.image_bgr = degrade(scene.image_bgr, gain=gain, blur_sigma=blur, noise_sigma=1.0 + 4.0 * gain, seed=i)
+        scenes.append(scene)
+    return scenes
+
+
+@pytest.mark.parametrize("preset", list(PRESETS))
+def bench_aruco_preset(benchmark, record_mean, hard_scenes: List[SyntheticScene], preset: str):
+    def run():
+        return [detect_aruco_scale(s.image_bgr, s.spec.marker_mm, preset=preset) for s in hard_scenes]
+
+    results = benchmark(run)
+    found = [(r, s) for r, s in zip(results, hard_scenes) if r.detected_markers == 1]
+    side_err = [abs(r.mean_marker_side_px - s.marker_side_px) / s.marker_side_px for r, s in found]
+    benchmark.extra_info.update({
+        "scenes": len(hard_scenes),
+        "detection_rate": len(found) / len(hard_scenes),
+        "side_rel_err_mean": float(np.mean(side_err)) if side_err else None,
+    })
+    record_mean(benchmark, ms_per_frame=lambda s: s * 1000.0 / len(hard_scenes))
+    # Every preset must still find a well-lit, sharp card of reasonable size
+    conditions = itertools.product(PIXELS_PER_MM, GAINS, BLUR_SIGMAS)
+    assert all(r.detected_markers == 1 for (ppm, gain, blur), r in zip(conditions, results) if ppm >= 2.0 and gain == 1.0 and blur == 0.0)
+
+
+@pytest.mark.parametrize("setup", ["per_call", "registry"])
+def bench_aruco_detector_setup(benchmark, scene: SyntheticScene, setup: str):
+    gray = cv2.cvtColor(scene.image_bgr, cv2.COLOR_BGR2GRAY)
+
+    def per_call():
+        # What detect_aruco_scale used to do on every frame
+        dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
+        detector = cv2.aruco.ArucoDetector(dictionary, cv2.aruco.DetectorParameters())
+        return detector.detectMarkers(gray)
+
+    def registry():
+        return get_detector(cv2.aruco.DICT_4X4_50, "default").detectMarkers(gray)
+
+    _, ids, _ = benchmark(per_call if setup == "per_call" else registry)
+    assert ids is not None and len(ids) == 1
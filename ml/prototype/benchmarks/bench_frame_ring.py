@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from frame_ring import FrameRing
+
+
+# Handing 1080p frames from the grabbing process to an analysis worker process: pickled through a
+# multiprocessing.Queue versus written once into a shared-memory ring slot and sent as a handle.
+# Both producers pay one frame copy (standing in for the camera decode); the worker reads a pixel
+# and acknowledges, so a round measures transport only.
+
+SHAPE = (1080, 1920, 3)
+FRAMES = 32
+SLOTS = 8
+
+
+def _queue_worker(frames, acks) -> None:
+    while (frame := frames.get()) is not None:
+        acks.put(int(frame[0, 0, 0]))
+
+
+def _ring_worker(ring: FrameRing, handles, acks) -> None:
+    while (handle := handles.get()) is not None:
+        with ring.borrow(handle) as frame:
+            acks.put(int(frame[0, 0, 0]))
+    ring.close()
+
+
+@pytest.fixture(scope="module")
+def source() -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, SHAPE, dtype=np.uint8)
+
+
+def _throughput(record_mean, benchmark) -> None:
+    record_mean(benchmark, frames_per_s=lambda s: FRAMES / s, mb_per_s=lambda s: FRAMES * np.prod(SHAPE) / s / 1e6)
+
+
+def bench_handoff_pickled_queue(benchmark, record_mean, source: np.ndarray):
+    ctx = mp.get_context()
+    frames, acks = ctx.Queue(maxsize=SLOTS), ctx.Queue()
+    worker = ctx.Process(target=_queue_worker, args=(frames, acks), daemon=True)
+    worker.start()
+
+    def run():
+        for _ in range(FRAMES):
+            frame = np.empty(SHAPE, dtype=np.uint8)
+            np.copyto(frame, source)
+            frames.put(frame)
+        return [acks.get() for _ in range(FRAMES)]
+
+    try:
+        got = benchmark(run)
+    finally:
+        frames.put(None)
+        worker.join()
+    assert got == [int(source[0, 0, 0])] * FRAMES
+    _throughput(record_mean, benchmark)
+
+
+def bench_handoff_frame_ring(benchmark, record_mean, source: np.ndarray):
+    ctx = mp.get_context()
+    ring = FrameRing(SLOTS, SHAPE, mp_context=ctx)
+    handles, acks = ctx.Queue(), ctx.Queue()
+    worker = ctx.Process(target=_ring_worker, args=(ring, handles, acks), daemon=True)
+    worker.start()
+
+    def run():
+        got = []
+        for _ in range(FRAMES):
+            while (slot := ring.claim()) is None:
+                # Every slot is with the worker: wait for it to finish one
+                got.append(acks.get())
+            np.copyto(ring.buffer(slot), source)
+            handles.put(ring.publish(slot))  # the worker's borrow() releases the claim's reference
+        got.extend(acks.get() for _ in range(FRAMES - len(got)))
+        return got
+
+    try:
+        got = benchmark(run)
+    finally:
+        handles.put(None)
+        worker.join()
+    assert got == [int(source[0, 0, 0])] * FRAMES
+    assert ring.in_use() == 0
+    ring.close()
+    _throughput(record_mean, benchmark)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import List
+
+import cv2
+import numpy as np
+import pytest
+
+from live_capture import FrameQuality, LoopStats, cheap_checks, heavy_checks
+from synthetic import SceneSpec, render_scene
+
+
+# Per-frame quality work in live_capture with and without early exit, over an HD stream where most
+# frames can't be captured anyway: a quarter too dark, a quarter with the card out of view, the
+# rest steady and good.
+
+FRAMES = 40
+
+
+@pytest.fixture(scope="module")
+def stream() -> List[np.ndarray]:
+    scene = render_scene(SceneSpec(width=1280, height=720, pixels_per_mm=4.0, bend_deg=30.0, noise_sigma=0.0, seed=1234))
+    good = np.clip(scene.image_bgr.astype(np.int16) + 60, 0, 255).astype(np.uint8)
+    dark = good // 4
+    no_card = good.copy()
+    no_card[:, :300] = 140
+    n = FRAMES // 4
+    return [dark] * n + [no_card] * n + [good] * (FRAMES - 2 * n)
+
+
+def _run(frames: List[np.ndarray], gated: bool) -> LoopStats:
+    stats = LoopStats()
+    h, w = frames[0].shape[:2]
+    diag = float(np.hypot(h, w))
+    prev_gray = None
+    for frame in frames:
+        stats.frames += 1
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        q = FrameQuality()
+        if cheap_checks(q, gray, prev_gray, stats, gated=gated):
+            stats.analyzed += 1
+            heavy_checks(q, frame, gray, 20.0, diag, stats, gated=gated)
+        if q.failed is not None:
+            stats.failed_at[q.failed] += 1
+        prev_gray = gray
+    return stats
+
+
+@pytest.mark.parametrize("gated", [False, True], ids=["all-checks", "gated"])
+def bench_live_quality_checks(benchmark, record_mean, stream: List[np.ndarray], gated: bool):
+    stats = benchmark(_run, stream, gated)
+    benchmark.extra_info["segmentations"] = stats.runs["framing"]
+    record_mean(benchmark, ms_per_frame=lambda s: s * 1000.0 / len(stream))
+    if gated:
+        # Segmentation only on the good frames (minus the first, which has no stability reference)
+        assert stats.runs["framing"] <= len(stream) // 2
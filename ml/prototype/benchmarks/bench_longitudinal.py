@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from longitudinal import load_captures, trends
+
+
+# Loading and aggregating a subject's capture history: 10k metrics_*.json files as live_capture
+# writes them (one every ~2 h), with a planted level shift in arc length at capture 6000.
+
+N_CAPTURES = 10_000
+SHIFT_AT = 6000
+
+
+@pytest.fixture(scope="module")
+def capture_dir(tmp_path_factory) -> Path:
+    out = tmp_path_factory.mktemp("captures")
+    rng = np.random.default_rng(0)
+    t0 = datetime(2025, 1, 1)
+    for i in range(N_CAPTURES):
+        ts = (t0 + timedelta(hours=2.1 * i)).strftime("%Y%m%dT%H%M%S%fZ")
+        metrics = {
+            "arc_length_mm": 100.0 + (8.0 if i >= SHIFT_AT else 0.0) + rng.normal(0, 1.5),
+            "max_curvature_deg": 20.0 + rng.normal(0, 2.0),
+            "length_mm": 95.0 + rng.normal(0, 1.0),
+            "hinge_location_ratio": 0.4 + rng.normal(0, 0.02),
+        }
+        result = {"pixels_per_mm": 3.2, "detected_markers": 1, "metrics": metrics}
+        (out / f"metrics_{ts}.json").write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return out
+
+
+def bench_longitudinal_load_and_trends(benchmark, record_mean, capture_dir: Path):
+    def run():
+        series = load_captures(capture_dir)
+        return series, trends(series)
+
+    series, result = benchmark(run)
+    benchmark.extra_info["captures"] = len(series)
+    assert len(series) == N_CAPTURES
+    arc = result["arc_length_mm"]
+    assert any(abs(int(i) - SHIFT_AT) <= 5 for i in arc.change_points)
+    mean = record_mean(benchmark, ms=lambda s: s * 1000.0)
+    if mean is not None:
+        assert mean < 1.0
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+import pytest
+
+from motion import RoiTracker
+from segmentation import segment_roi
+from synthetic import SceneSpec, render_scene
+
+
+# ROI per frame over a handheld-like HD stream (sub-pixel to 2 px random-walk jitter, with the
+# subject bending from 30 to 45 degrees halfway): segmenting every frame versus tracking the last
+# segmentation with optical flow and re-segmenting only when confidence drops. Accuracy is IoU
+# against the rendered ground-truth mask.
+
+FRAMES = 40
+
+
+def _shift(img: np.ndarray, dx: float, dy: float) -> np.ndarray:
+    m = np.float32([[1, 0, dx], [0, 1, dy]])
+    return cv2.warpAffine(img, m, (img.shape[1], img.shape[0]), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+@pytest.fixture(scope="module")
+def stream() -> List[Tuple[np.ndarray, np.ndarray]]:
+    rng = np.random.default_rng(7)
+    scenes = [render_scene(SceneSpec(width=1280, height=720, pixels_per_mm=4.0, bend_deg=b, seed=1234)) for b in (30.0, 45.0)]
+    offsets = np.cumsum(rng.normal(0.0, 0.8, (FRAMES, 2)), axis=0)
+    frames = []
+    for i, (dx, dy) in enumerate(offsets):
+        scene = scenes[0] if i < FRAMES // 2 else scenes[1]
+        frames.append((_shift(scene.image_bgr, dx, dy), _shift(scene.mask, dx, dy)))
+    return frames
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> float:
+    a, b = a > 0, b > 0
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def _segment_every_frame(frames):
+    return [segment_roi(f, debug=False)[0] for f, _ in frames], len(frames)
+
+
+def _track(frames):
+    tracker = RoiTracker()
+    masks, segmented = [], 0
+    for frame, _ in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if tracker.active:
+            tracker.track(gray)
+        if tracker.confident:
+            masks.append(tracker.mask(gray.shape))
+        else:
+            mask, _ = segment_roi(frame, debug=False)
+            tracker.reset(gray, mask)
+            masks.append(mask)
+            segmented += 1
+    return masks, segmented
+
+
+@pytest.mark.parametrize("mode", ["segment", "track"])
+def bench_roi_per_frame(benchmark, record_mean, stream, mode: str):
+    run = _segment_every_frame if mode == "segment" else _track
+    masks, segmented = benchmark(run, stream)
+    ious = [_iou(m, gt) for m, (_, gt) in zip(masks, stream)]
+    benchmark.extra_info.update({
+        "segmented_frames": segmented,
+        "iou_mean": float(np.mean(ious)),
+        "iou_min": float(np.min(ious)),
+    })
+    record_mean(benchmark, ms_per_frame=lambda s: s * 1000.0 / len(stream))
+    assert min(ious) > 0.9
+    if mode == "track":
+        # Once at the start, again after the bend, plus the periodic refresh
+        assert segmented <= 6
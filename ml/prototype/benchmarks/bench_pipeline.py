@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from aruco_scale import detect_aruco_scale
+from geometry import (
+    CENTERLINE_METHODS,
+    _extract_centerline_points,
+    _polyline_length,
+    _skeletonize,
+    compute_metrics,
+    contour_centerline,
+    largest_contour,
+)
+from segmentation import segment_roi, segment_roi_contour
+from synthetic import SyntheticScene, centerline_distance_px, mask_iou
+
+
+# Each benchmark times one pipeline stage on a synthetic scene and records its accuracy
+# against the scene's ground truth in ``extra_info`` so it is stored with the timings.
+
+
+def bench_detect_aruco_scale(benchmark, scene: SyntheticScene):
+    result = benchmark(detect_aruco_scale, scene.image_bgr, scene.spec.marker_mm)
+
+    assert result.detected_markers == 1
+    assert result.pixels_per_mm is not None
+    rel_err = abs(result.pixels_per_mm - scene.spec.pixels_per_mm) / scene.spec.pixels_per_mm
+    benchmark.extra_info.update({
+        "pixels_per_mm": result.pixels_per_mm,
+        "pixels_per_mm_true": scene.spec.pixels_per_mm,
+        "pixels_per_mm_rel_err": rel_err,
+    })
+    assert rel_err < 0.05
+
+
+def bench_segment_roi(benchmark, scene: SyntheticScene):
+    mask, _ = benchmark(segment_roi, scene.image_bgr)
+
+    iou = mask_iou(mask, scene.mask)
+    benchmark.extra_info["iou"] = iou
+    assert iou > 0.8
+
+
+def bench_skeletonize(benchmark, scene: SyntheticScene):
+    skel = benchmark(_skeletonize, scene.mask)
+
+    ys, xs = np.nonzero(skel)
+    mean_d, max_d = centerline_distance_px(np.stack([ys, xs], axis=1), scene.centerline_xy)
+    benchmark.extra_info.update({
+        "skeleton_px": int(len(xs)),
+        "mean_dist_px": mean_d,
+        "max_dist_px": max_d,
+    })
+
+
+def bench_extract_centerline_points(benchmark, scene: SyntheticScene):
+    skel = _skeletonize(scene.mask)
+    path = benchmark(_extract_centerline_points, skel)
+
+    mean_d, max_d = centerline_distance_px(np.array(path).reshape(-1, 2), scene.centerline_xy)
+    benchmark.extra_info.update({
+        "path_points": len(path),
+        "path_length_px": _polyline_length(path),
+        "arc_length_px_true": scene.arc_length_px,
+        "mean_dist_px": mean_d,
+        "max_dist_px": max_d,
+    })
+
+
+def bench_contour_centerline(benchmark, scene: SyntheticScene):
+    # Outline extraction included: it's the contour method's counterpart to skeletonizing
+    path = benchmark(lambda: contour_centerline(largest_contour(scene.mask)))
+
+    mean_d, max_d = centerline_distance_px(np.array(path).reshape(-1, 2), scene.centerline_xy)
+    benchmark.extra_info.update({
+        "path_points": len(path),
+        "path_length_px": _polyline_length(path),
+        "arc_length_px_true": scene.arc_length_px,
+        "mean_dist_px": mean_d,
+        "max_dist_px": max_d,
+    })
+    assert mean_d < 2.0
+
+
+def _record_metrics_error(benchmark, scene: SyntheticScene, metrics) -> None:
+    benchmark.extra_info.update({
+        "arc_length_mm": metrics.arc_length_mm,
+        "arc_length_mm_true": scene.spec.arc_length_mm,
+        "arc_length_abs_err_mm": abs(metrics.arc_length_mm - scene.spec.arc_length_mm),
+        "max_curvature_deg": metrics.max_curvature_deg,
+        "max_curvature_deg_true": scene.expected_max_curvature_deg,
+        "max_curvature_abs_err_deg": abs(metrics.max_curvature_deg - scene.expected_max_curvature_deg),
+    })
+
+
+@pytest.mark.parametrize("method", CENTERLINE_METHODS)
+def bench_compute_metrics(benchmark, scene: SyntheticScene, method: str):
+    metrics, _, _ = benchmark(compute_metrics, scene.mask, scene.spec.pixels_per_mm, method)
+    _record_metrics_error(benchmark, scene, metrics)
+
+
+@pytest.mark.parametrize("method", CENTERLINE_METHODS)
+def bench_compute_metrics_bend(benchmark, bent_scene: SyntheticScene, method: str):
+    metrics, _, _ = benchmark(compute_metrics, bent_scene.mask, bent_scene.spec.pixels_per_mm, method)
+    _record_metrics_error(benchmark, bent_scene, metrics)
+
+
+def bench_full_pipeline(benchmark, scene: SyntheticScene):
+    def run():
+        scale = detect_aruco_scale(scene.image_bgr, marker_length_mm=scene.spec.marker_mm)
+        mask, contour, _ = segment_roi_contour(scene.image_bgr, debug=True)
+        metrics, _, _ = compute_metrics(mask, pixels_per_mm=scale.pixels_per_mm, contour=contour)
+        return metrics
+
+    metrics = benchmark(run)
+    _record_metrics_error(benchmark, scene, metrics)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import typer
+from rich import print
+from rich.table import Table
+
+
+app = typer.Typer(add_completion=False)
+
+
+def _latest_runs(storage: Path, count: int) -> list[Path]:
+    runs = sorted(storage.glob("*/*.json"), key=lambda p: p.name)
+    return runs[-count:]
+
+
+def _extra_info(run: Path) -> Dict[str, dict]:
+    data = json.loads(run.read_text(encoding="utf-8"))
+    return {b["fullname"]: b.get("extra_info", {}) for b in data.get("benchmarks", [])}
+
+
+@app.command()
+def main(
+    baseline: Optional[Path] = typer.Option(None, help="Saved run to compare against (defaults to the previous run)"),
+    current: Optional[Path] = typer.Option(None, help="Saved run to check (defaults to the latest run)"),
+    storage: Path = typer.Option(Path(".benchmarks"), help="pytest-benchmark storage directory"),
+):
+    """
+    Compare ground-truth accuracy recorded by two benchmark runs.
+    pytest-benchmark compares timings itself (--benchmark-compare); this covers the extra_info metrics.
+    """
+    if baseline is None or current is None:
+        runs = _latest_runs(storage, 2)
+        if len(runs) < 2:
+            raise typer.BadParameter("Need two saved runs; run the benchmarks twice or pass --baseline/--current")
+        baseline = baseline or runs[0]
+        current = current or runs[1]
+
+    base = _extra_info(baseline)
+    cur = _extra_info(current)
+
+    table = Table(title=f"{baseline.name} -> {current.name}")
+    table.add_column("benchmark")
+    table.add_column("metric")
+    table.add_column("baseline", justify="right")
+    table.add_column("current", justify="right")
+    table.add_column("delta", justify="right")
+    for name in sorted(cur):
+        for key, value in sorted(cur[name].items()):
+            old = base.get(name, {}).get(key)
+            if not isinstance(value, (int, float)):
+                continue
+            delta = "" if not isinstance(old, (int, float)) else f"{value - old:+.4g}"
+            old_s = "" if old is None else f"{old:.4g}"
+            table.add_row(name.split("::")[-1], key, old_s, f"{value:.4g}", delta)
+    print(table)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Callable, Optional
+
+import pytest
+
+# Prototype modules use flat imports (``from geometry import ...``); make them importable.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic import SceneSpec, SyntheticScene, render_scene  # noqa: E402
+
+
+# (width, height, pixels_per_mm): scale grows with resolution so the scene covers the same field of view
+RESOLUTIONS = {
+    "vga": (640, 480, 2.0),
+    "hd": (1280, 720, 4.0),
+    "fhd": (1920, 1080, 6.0),
+}
+
+BEND_ANGLES_DEG = (0.0, 30.0, 60.0)
+
+
+@pytest.fixture(scope="session", params=sorted(RESOLUTIONS), ids=lambda r: r)
+def scene(request) -> SyntheticScene:
+    w, h, ppm = RESOLUTIONS[request.param]
+    return render_scene(SceneSpec(width=w, height=h, pixels_per_mm=ppm, bend_deg=30.0, seed=1234))
+
+
+@pytest.fixture(scope="session", params=BEND_ANGLES_DEG, ids=lambda b: f"bend{int(b)}")
+def bent_scene(request) -> SyntheticScene:
+    w, h, ppm = RESOLUTIONS["hd"]
+    return render_scene(SceneSpec(width=w, height=h, pixels_per_mm=ppm, bend_deg=request.param, seed=1234))
+
+
+def _record_mean(benchmark, **derived: Callable[[float], float]) -> Optional[float]:
+    """Mean seconds per round, with each ``derived`` value of it stored in extra_info; None under --benchmark-disable."""
+    if not benchmark.stats:
+        return None
+    mean = benchmark.stats.stats.mean
+    benchmark.extra_info.update({name: fn(mean) for name, fn in derived.items()})
+    return mean
+
+
+@pytest.fixture
+def record_mean() -> Callable[..., Optional[float]]:
+    return _record_mean
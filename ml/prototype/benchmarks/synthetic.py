@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+# Deterministic synthetic scenes for benchmarking the capture pipeline.
+# A scene holds a printed ArUco card at a known scale and a curved, tube-shaped
+# ROI whose centerline is a circular arc of known length and bend angle.
+
+
+BACKGROUND_BGR = (70, 60, 40)  # dark, desaturated blue: outside the skin HSV range
+TUBE_BGR = (110, 150, 215)  # skin-like tone: hue ~14, inside segment_roi's range
+CARD_MARGIN_MM = 4.0
+
+
+@dataclass
+class SceneSpec:
+    width: int
+    height: int
+    pixels_per_mm: float
+    marker_mm: float = 20.0
+    arc_length_mm: float = 120.0
+    bend_deg: float = 30.0
+    thickness_mm: float = 30.0
+    marker_id: int = 7
+    noise_sigma: float = 2.0
+    seed: int = 0
+
+
+@dataclass
+class SyntheticScene:
+    spec: SceneSpec
+    image_bgr: np.ndarray
+    mask: np.ndarray
+    centerline_xy: np.ndarray  # (N, 2) float32, base to tip
+    marker_side_px: float
+
+    @property
+    def arc_length_px(self) -> float:
+        return self.spec.arc_length_mm * self.spec.pixels_per_mm
+
+    @property
+    def expected_max_curvature_deg(self) -> float:
+        # For a circular arc the tangent deviates most from the base-tip chord at
+        # the ends, by half of the total bend.
+        return self.spec.bend_deg / 2.0
+
+
+def _arc_centerline(length_px: float, bend_deg: float, n: int = 512) -> np.ndarray:
+    """Points along a circular arc starting at the origin heading +x, bending towards -y."""
+    s = np.linspace(0.0, length_px, n, dtype=np.float64)
+    theta = math.radians(bend_deg)
+    if abs(theta) < 1e-6:
+        return np.stack([s, np.zeros_like(s)], axis=1)
+    radius = length_px / theta
+    phi = s / radius
+    xs = radius * np.sin(phi)
+    ys = -radius * (1.0 - np.cos(phi))
+    return np.stack([xs, ys], axis=1)
+
+
+def _render_card(marker_id: int, marker_side_px: int, margin_px: int) -> np.ndarray:
+    dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
+    marker = cv2.aruco.generateImageMarker(dictionary, marker_id, marker_side_px)
+    side = marker_side_px + 2 * margin_px
+    card = np.full((side, side), 255, dtype=np.uint8)
+    card[margin_px:margin_px + marker_side_px, margin_px:margin_px + marker_side_px] = marker
+    return cv2.cvtColor(card, cv2.COLOR_GRAY2BGR)
+
+
+def render_scene(spec: SceneSpec) -> SyntheticScene:
+    """
+    Render a scene for ``spec``. The same spec always yields the same pixels.
+    """
+    h, w = spec.height, spec.width
+    image = np.empty((h, w, 3), dtype=np.uint8)
+    image[:] = BACKGROUND_BGR
+
+    # Calibration card in the top-left corner, axis-aligned
+    marker_side_px = int(round(spec.marker_mm * spec.pixels_per_mm))
+    margin_px = int(round(CARD_MARGIN_MM * spec.pixels_per_mm))
+    card = _render_card(spec.marker_id, marker_side_px, margin_px)
+    ch, cw = card.shape[:2]
+    ox, oy = int(0.04 * w), int(0.06 * h)
+    image[oy:oy + ch, ox:ox + cw] = card
+
+    # Tube: arc centerline centered in the free area to the right of the card
+    length_px = spec.arc_length_mm * spec.pixels_per_mm
+    thickness_px = max(3, int(round(spec.thickness_mm * spec.pixels_per_mm)))
+    centerline = _arc_centerline(length_px, spec.bend_deg)
+    lo, hi = centerline.min(axis=0), centerline.max(axis=0)
+    free_x0 = ox + cw
+    target = np.array([(free_x0 + w) / 2.0, h / 2.0])
+    centerline = centerline - (lo + hi) / 2.0 + target
+
+    mask = np.zeros((h, w), dtype=np.uint8)
+    pts = np.round(centerline).astype(np.int32).reshape(-1, 1, 2)
+    cv2.polylines(mask, [pts], False, 255, thickness=thickness_px, lineType=cv2.LINE_8)
+    image[mask > 0] = TUBE_BGR
+
+    if spec.noise_sigma > 0:
+        rng = np.random.default_rng(spec.seed)
+        noise = rng.normal(0.0, spec.noise_sigma, size=image.shape)
+        image = np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+    return SyntheticScene(
+        spec=spec,
+        image_bgr=image,
+        mask=mask,
+        centerline_xy=centerline.astype(np.float32),
+        marker_side_px=float(marker_side_px),
+    )
+
+
+def mask_iou(a: np.ndarray, b: np.ndarray) -> float:
+    fa = a > 0
+    fb = b > 0
+    union = np.count_nonzero(fa | fb)
+    if union == 0:
+        return 1.0
+    return float(np.count_nonzero(fa & fb)) / float(union)
+
+
+def centerline_distance_px(points_yx: np.ndarray, centerline_xy: np.ndarray) -> Tuple[float, float]:
+    """
+    Mean and max distance (px) from each (y, x) point to the nearest ground-truth centerline sample.
+    """
+    if len(points_yx) == 0:
+        return float("inf"), float("inf")
+    p = np.asarray(points_yx, dtype=np.float32)[:, ::-1]
+    d = np.sqrt(((p[:, None, :] - centerline_xy[None, :, :]) ** 2).sum(axis=2)).min(axis=1)
+    return float(d.mean()), float(d.max())
+
+
+def degrade(image_bgr: np.ndarray, gain: float = 1.0, blur_sigma: float = 0.0, noise_sigma: float = 0.0, seed: int = 0) -> np.ndarray:
+    """
+    Simulate a poor capture: scale brightness by ``gain`` (dim light), Gaussian blur (defocus or
+    motion) and additive sensor noise. Deterministic for a given ``seed``.
+    """
+    out = image_bgr.astype(np.float32) * gain
+    if blur_sigma > 0:
+        out = cv2.GaussianBlur(out, (0, 0), blur_sigma)
+    if noise_sigma > 0:
+        out += np.random.default_rng(seed).normal(0.0, noise_sigma, size=out.shape).astype(np.float32)
+    return np.clip(out, 0, 255).astype(np.uint8)
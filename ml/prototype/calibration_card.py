@@ -1,77 +1,234 @@
 from __future__ import annotations
 
+import json
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Tuple
+from typing import TYPE_CHECKING, List, Tuple
 
-import cv2
-import numpy as np
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 import typer
 
+if TYPE_CHECKING:
+    import numpy as np
+    from reportlab.pdfgen import canvas
+
 
 app = typer.Typer(add_completion=False)
 
 
-def _draw_aruco_grid(image: np.ndarray, dict_name: int, squares_x: int, squares_y: int, square_px: int, margin_px: int) -> np.ndarray:
-    aruco = cv2.aruco
-    dictionary = aruco.getPredefinedDictionary(dict_name)
-    board = aruco.CharucoBoard((squares_x, squares_y), square_px, int(square_px * 0.7), dictionary)
-    board_img = board.generateImage((squares_x * square_px + 2 * margin_px, squares_y * square_px + 2 * margin_px))
-    return board_img
+# cv2.aruco.DICT_4X4_50; spelled out so the CLI can be built without importing OpenCV
+DICT_4X4_50 = 0
+
+MM = 72.0 / 25.4  # points per millimetre
+PAGE_MARGIN = 36.0
+HEADER_H = 60.0
+FOOTER_H = 50.0
+CARD_GAP = 18.0
+LABEL_H = 14.0
+
+
+@dataclass
+class CardSpec:
+    """One printed ChArUco card; written to the manifest so detections can be traced to a device."""
+
+    device: int
+    dictionary: str
+    dictionary_id: int
+    marker_ids: List[int]
+    squares_x: int
+    squares_y: int
+    square_mm: float
+    marker_mm: float
+    page: int = 0
+
+
+def _resolve_dictionary(name: str) -> Tuple[str, int]:
+    """DICT_* name or its integer id -> (name, id)."""
+    import cv2
+
+    if name.lstrip("-").isdigit():
+        value = int(name)
+        names = [n for n in dir(cv2.aruco) if n.startswith("DICT_") and getattr(cv2.aruco, n) == value]
+        return (min(names, key=len) if names else f"DICT_{value}"), value
+    key = name if name.startswith("DICT_") else f"DICT_{name}"
+    if not hasattr(cv2.aruco, key.upper()):
+        raise typer.BadParameter(f"Unknown ArUco dictionary {name!r}, e.g. DICT_4X4_50 or DICT_5X5_100")
+    return key.upper(), int(getattr(cv2.aruco, key.upper()))
+
+
+def _card_size_pt(spec: CardSpec) -> Tuple[float, float]:
+    # One square of white margin around the board, as before
+    return (spec.squares_x + 2) * spec.square_mm * MM, (spec.squares_y + 2) * spec.square_mm * MM
+
+
+def _add_cell_runs(path, cells: np.ndarray, x0: float, top: float, cell: float) -> None:
+    """Add one rectangle per horizontal run of black (0) cells; rows run top to bottom."""
+    for r, row in enumerate(cells):
+        c = 0
+        n = len(row)
+        while c < n:
+            if row[c]:
+                c += 1
+                continue
+            start = c
+            while c < n and not row[c]:
+                c += 1
+            path.rect(x0 + start * cell, top - (r + 1) * cell, (c - start) * cell, cell)
+
+
+def draw_card(c: canvas.Canvas, spec: CardSpec, x: float, y: float) -> None:
+    """
+    Draw ``spec`` with its lower-left corner at (x, y) points. Chessboard squares and marker bits
+    are exact-size vector rectangles; every black cell on the card is filled as one path so
+    neighbouring cells print without hairline seams.
+    """
+    import cv2
+    import numpy as np
+
+    from aruco_scale import get_dictionary
+
+    dictionary = get_dictionary(spec.dictionary_id)
+    board = cv2.aruco.CharucoBoard(
+        (spec.squares_x, spec.squares_y), spec.square_mm, spec.marker_mm, dictionary, np.array(spec.marker_ids, dtype=np.int32)
+    )
+    sq = spec.square_mm * MM
+    card_w, card_h = _card_size_pt(spec)
+    left, top = x + sq, y + card_h - sq  # board's top-left corner; board coordinates grow right and down
+
+    path = c.beginPath()
+    # Black squares are the ones without a marker; marker object points are in mm from the board's top-left
+    corners = np.array(board.getObjPoints(), dtype=np.float64)[:, 0, :2] / spec.square_mm
+    marker_squares = {(int(cx), int(cy)) for cx, cy in corners}
+    for sy in range(spec.squares_y):
+        for sx in range(spec.squares_x):
+            if (sx, sy) not in marker_squares:
+                path.rect(left + sx * sq, top - (sy + 1) * sq, sq, sq)
+
+    bits = dictionary.markerSize + 2  # one cell of black border on each side
+    cell = spec.marker_mm * MM / bits
+    for marker_id, pts in zip(spec.marker_ids, board.getObjPoints()):
+        mx, my = float(pts[0][0]) * MM, float(pts[0][1]) * MM
+        cells = cv2.aruco.generateImageMarker(dictionary, marker_id, bits)
+        _add_cell_runs(path, cells, left + mx, top - my, cell)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawPath(path, stroke=0, fill=1)
+
+    # Cut line and label
+    c.setStrokeColorRGB(0.6, 0.6, 0.6)
+    c.setLineWidth(0.4)
+    c.rect(x, y, card_w, card_h, stroke=1, fill=0)
+    c.setStrokeColorRGB(0, 0, 0)
+    c.setFont("Helvetica", 7)
+    ids = spec.marker_ids
+    c.drawString(x, y - 9, f"Device {spec.device}  {spec.dictionary}  IDs {ids[0]}–{ids[-1]}  "
+                           f"square {spec.square_mm:g} mm  marker {spec.marker_mm:g} mm")
+
+
+def _draw_page_frame(c: canvas.Canvas, page_w: float, page_h: float) -> None:
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(PAGE_MARGIN, page_h - 54, "Calibration Card — Print at 100% scale (no fit-to-page)")
+    c.setFont("Helvetica", 10)
+    c.drawString(PAGE_MARGIN, page_h - 70, "Use in frame for accurate scaling. Keep flat and well-lit.")
+    # Print check: a 50 mm bar with 10 mm ticks
+    x, y = PAGE_MARGIN, 40
+    c.setLineWidth(1)
+    c.line(x, y, x + 50 * MM, y)
+    for i in range(6):
+        c.line(x + i * 10 * MM, y, x + i * 10 * MM, y + 5)
+    c.setFont("Helvetica", 8)
+    c.drawString(x + 50 * MM + 8, y, "Print check: this bar should measure exactly 50 mm")
+
+
+def layout_cards(specs: List[CardSpec], page_w: float, page_h: float) -> List[List[Tuple[CardSpec, float, float]]]:
+    """Place cards left to right, top to bottom, as many per page as fit; returns per-page (spec, x, y)."""
+    pages: List[List[Tuple[CardSpec, float, float]]] = [[]]
+    top, bottom = page_h - PAGE_MARGIN - HEADER_H, FOOTER_H + LABEL_H
+    x, row_top, row_h = PAGE_MARGIN, top, 0.0
+    for spec in specs:
+        w, h = _card_size_pt(spec)
+        if w > page_w - 2 * PAGE_MARGIN or h + LABEL_H > top - bottom:
+            raise typer.BadParameter(f"A {w / MM:.0f} x {h / MM:.0f} mm card does not fit on the page")
+        if x + w > page_w - PAGE_MARGIN:
+            x, row_top, row_h = PAGE_MARGIN, row_top - row_h - CARD_GAP, 0.0
+        if row_top - h - LABEL_H < bottom:
+            pages.append([])
+            x, row_top, row_h = PAGE_MARGIN, top, 0.0
+        spec.page = len(pages)
+        pages[-1].append((spec, x, row_top - h))
+        x += w + CARD_GAP
+        row_h = max(row_h, h + LABEL_H)
+    return pages
+
+
+def card_specs(
+    dictionaries: List[str], devices: int, first_id: int, squares_x: int, squares_y: int, square_mm: float, marker_ratio: float
+) -> List[CardSpec]:
+    """One card per (dictionary, device); device k gets the k-th consecutive block of marker IDs."""
+    from aruco_scale import get_dictionary
+
+    per_card = (squares_x * squares_y) // 2
+    specs = []
+    for name in dictionaries:
+        dict_name, dict_id = _resolve_dictionary(name)
+        available = len(get_dictionary(dict_id).bytesList)
+        needed = first_id + devices * per_card
+        if needed > available:
+            raise typer.BadParameter(
+                f"{dict_name} has {available} markers; {devices} card(s) of {per_card} starting at ID {first_id} need {needed}"
+            )
+        for k in range(devices):
+            start = first_id + k * per_card
+            specs.append(CardSpec(
+                device=k + 1,
+                dictionary=dict_name,
+                dictionary_id=dict_id,
+                marker_ids=list(range(start, start + per_card)),
+                squares_x=squares_x,
+                squares_y=squares_y,
+                square_mm=square_mm,
+                marker_mm=round(square_mm * marker_ratio, 3),
+            ))
+    return specs
 
 
 @app.command()
 def generate(
     out_pdf: Path = typer.Option(Path("calibration_card.pdf"), help="Output PDF path"),
-    dict_name: int = typer.Option(cv2.aruco.DICT_4X4_50, help="ArUco dictionary identifier"),
-    squares_x: int = typer.Option(6, help="Squares in X"),
-    squares_y: int = typer.Option(4, help="Squares in Y"),
+    dict_name: List[str] = typer.Option([str(DICT_4X4_50)], "--dict-name", "--dict", help="ArUco dictionary, by id or name (repeatable)"),
+    squares_x: int = typer.Option(6, min=2, help="Squares in X"),
+    squares_y: int = typer.Option(4, min=2, help="Squares in Y"),
     square_mm: float = typer.Option(10.0, help="Square size (mm)"),
+    marker_ratio: float = typer.Option(0.7, min=0.1, max=0.95, help="Marker side as a fraction of the square"),
+    cards: int = typer.Option(1, "--cards", "--devices", min=1, help="Cards per dictionary, each with its own block of marker IDs"),
+    first_id: int = typer.Option(0, min=0, help="First marker ID of the first card"),
+    page_size: str = typer.Option("letter", help="letter or a4"),
 ):
     """
     Generate a printable Charuco calibration card PDF.
     Print at 100% scale (no fit-to-page). Matte paper recommended.
     """
-    page_w, page_h = letter
-    c = canvas.Canvas(str(out_pdf), pagesize=letter)
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(36, page_h - 54, "Calibration Card — Print at 100% scale (no fit-to-page)")
-    c.setFont("Helvetica", 10)
-    c.drawString(36, page_h - 70, "Use in frame for accurate scaling. Keep flat and well-lit.")
-
-    # Compute pixel sizes for preview generation
-    square_px = 80
-    margin_px = 20
-    img = _draw_aruco_grid(np.zeros((10, 10), dtype=np.uint8), dict_name, squares_x, squares_y, square_px, margin_px)
-
-    # Save temporary PNG and place into PDF with mm-based sizing
-    tmp_png = Path("_cal_card_tmp.png")
-    cv2.imwrite(str(tmp_png), img)
-
-    total_w_mm = squares_x * square_mm + (2 * square_mm)  # add margins
-    total_h_mm = squares_y * square_mm + (2 * square_mm)
-    width_pt = total_w_mm * 72.0 / 25.4
-    height_pt = total_h_mm * 72.0 / 25.4
-
-    # Center on page
-    x = (page_w - width_pt) / 2
-    y = (page_h - height_pt) / 2 - 20
-    c.drawImage(str(tmp_png), x, y, width=width_pt, height=height_pt, preserveAspectRatio=True, anchor='sw')
-
-    c.setFont("Helvetica", 9)
-    c.drawString(36, 40, f"Square size: {square_mm:.1f} mm; Dictionary: {dict_name}")
-    c.showPage()
+    from reportlab.lib.pagesizes import A4, letter
+    from reportlab.pdfgen import canvas
+
+    sizes = {"letter": letter, "a4": A4}
+    if page_size.lower() not in sizes:
+        raise typer.BadParameter("--page-size must be letter or a4")
+    page_w, page_h = sizes[page_size.lower()]
+
+    specs = card_specs(dict_name, cards, first_id, squares_x, squares_y, square_mm, marker_ratio)
+    pages = layout_cards(specs, page_w, page_h)
+
+    c = canvas.Canvas(str(out_pdf), pagesize=(page_w, page_h), pageCompression=1)
+    for placed in pages:
+        _draw_page_frame(c, page_w, page_h)
+        for spec, x, y in placed:
+            draw_card(c, spec, x, y)
+        c.showPage()
     c.save()
 
-    try:
-        tmp_png.unlink()
-    except Exception:
-        pass
-
-    typer.echo(f"Saved calibration card PDF to {out_pdf}")
+    manifest = out_pdf.with_suffix(".cards.json")
+    manifest.write_text(json.dumps([asdict(s) for s in specs], indent=2), encoding="utf-8")
+    typer.echo(f"Saved {len(specs)} calibration card(s) on {len(pages)} page(s) to {out_pdf} (IDs: {manifest})")
 
 
 if __name__ == "__main__":
     app()
-
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+# Fixed ring of preallocated frame slots in one shared-memory block, for handing camera frames
+# to analysis and render stages (in this process or in worker processes) without copying.
+#
+# Layout of the block:
+#   control   int64[slots + 1, 2]: per slot (refcount, seq); last row (write cursor, next seq)
+#   frames    slots x frame_bytes, each slot 64-byte aligned
+#
+# The grabber claims a free slot (refcount 0), writes the frame into it once and publishes it,
+# getting a FrameHandle that holds one reference. Every extra consumer the handle is given to
+# takes a reference with retain() and drops it with release(); the slot is reused once the count
+# returns to zero. Handles carry the slot's sequence number, so a stale handle to a reused slot
+# is detected instead of silently reading a newer frame. Pickling a FrameRing (e.g. as a
+# Process argument) attaches the child to the same memory and lock.
+
+
+ALIGN = 64
+
+
+class FrameHandle(NamedTuple):
+    slot: int
+    seq: int
+
+
+class StaleFrameError(RuntimeError):
+    """The handle's slot has been reused for a newer frame."""
+
+
+class FrameRing:
+    def __init__(
+        self,
+        slots: int,
+        shape: Tuple[int, ...],
+        dtype: str | np.dtype = np.uint8,
+        name: Optional[str] = None,
+        lock=None,
+        mp_context=None,
+    ):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._stride = -(-frame_bytes // ALIGN) * ALIGN
+        self._header = -(-((slots + 1) * 2 * 8) // ALIGN) * ALIGN
+        # Only the creating process unlinks; a forked child inherits this object without pickling
+        self._owner_pid = os.getpid() if name is None else None
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=self._header + slots * self._stride)
+            # The lock must come from the same start-method context as the processes it's shared with
+            self._lock = (mp_context or mp).Lock()
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._lock = lock
+        self._control = np.ndarray((slots + 1, 2), dtype=np.int64, buffer=self._shm.buf)
+        self._frames = np.ndarray((slots, *self.shape), dtype=self.dtype, buffer=self._shm.buf, offset=self._header,
+                                  strides=(self._stride, *np.empty(self.shape, self.dtype).strides))
+        if self.owner:
+            self._control[:] = 0
+            self._control[:slots, 1] = -1
+        self.dropped = 0  # claim() calls that found every slot referenced (this process only)
+
+    @property
+    def owner(self) -> bool:
+        return self._owner_pid == os.getpid()
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __reduce__(self):
+        return _attach, (self.name, self.slots, self.shape, self.dtype.str, self._lock)
+
+    # Writing
+
+    def claim(self) -> Optional[int]:
+        """A free slot for the next frame, oldest first; None (and a counted drop) if all are in use."""
+        with self._lock:
+            cursor = int(self._control[self.slots, 0])
+            for i in range(self.slots):
+                slot = (cursor + i) % self.slots
+                if self._control[slot, 0] == 0:
+                    self._control[slot] = (1, -1)
+                    self._control[self.slots, 0] = (slot + 1) % self.slots
+                    return slot
+        self.dropped += 1
+        return None
+
+    def buffer(self, slot: int) -> np.ndarray:
+        """Writable view of a claimed slot, to decode or copy the frame into."""
+        return self._frames[slot]
+
+    def publish(self, slot: int) -> FrameHandle:
+        """Make a written slot readable; the returned handle owns the claim's reference."""
+        with self._lock:
+            seq = int(self._control[self.slots, 1])
+            self._control[self.slots, 1] = seq + 1
+            self._control[slot, 1] = seq
+        return FrameHandle(slot, seq)
+
+    def abandon(self, slot: int) -> None:
+        """Give back a claimed slot that was never published (e.g. the camera read failed)."""
+        with self._lock:
+            self._control[slot] = (0, -1)
+
+    # Reading
+
+    def _check(self, handle: FrameHandle) -> None:
+        if self._control[handle.slot, 1] != handle.seq or self._control[handle.slot, 0] <= 0:
+            raise StaleFrameError(f"slot {handle.slot} no longer holds frame {handle.seq}")
+
+    def retain(self, handle: FrameHandle) -> FrameHandle:
+        """Take another reference, for handing the frame to one more consumer."""
+        with self._lock:
+            self._check(handle)
+            self._control[handle.slot, 0] += 1
+        return handle
+
+    def release(self, handle: FrameHandle) -> None:
+        with self._lock:
+            self._check(handle)
+            self._control[handle.slot, 0] -= 1
+
+    def view(self, handle: FrameHandle) -> np.ndarray:
+        """Read-only, zero-copy view; valid while the caller holds a reference."""
+        self._check(handle)
+        v = self._frames[handle.slot]
+        v = v.view()
+        v.flags.writeable = False
+        return v
+
+    @contextmanager
+    def borrow(self, handle: FrameHandle) -> Iterator[np.ndarray]:
+        """Consume a reference that was retained for this reader: view it, release on exit."""
+        try:
+            yield self.view(handle)
+        finally:
+            self.release(handle)
+
+    def in_use(self) -> int:
+        with self._lock:
+            return int(np.count_nonzero(self._control[:self.slots, 0]))
+
+    # Lifetime
+
+    def close(self) -> None:
+        # Views into the block must go before the mapping can be closed
+        self._control = self._frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A view is still alive somewhere (e.g. in a traceback being propagated); the mapping
+            # is released along with it
+            pass
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self) -> "FrameRing":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _attach(name: str, slots: int, shape: Tuple[int, ...], dtype: str, lock) -> FrameRing:
+    return FrameRing(slots, shape, dtype, name=name, lock=lock)
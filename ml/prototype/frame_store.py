@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import typer
+from rich import print
+
+
+# Append-only, memory-mapped store for frames, masks, centerlines and other per-capture arrays.
+#
+# Layout of a store directory:
+#   index.jsonl        one JSON line per stored array: {"key", "field", "chunk", "offset", "shape", "dtype"}
+#                      (optionally "meta"); a later line for the same (key, field) replaces the earlier one
+#   chunk_00000.bin    raw array bytes, 64-byte aligned, rolled over at chunk_bytes
+#
+# Readers get zero-copy NumPy views into np.memmap'd chunks. Appending writes the array bytes once
+# and one index line, so adding masks or centerlines to existing frames never rewrites anything.
+
+
+INDEX_NAME = "index.jsonl"
+ALIGN = 64
+
+
+@dataclass(frozen=True)
+class ArrayRef:
+    chunk: int
+    offset: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64)) * np.dtype(self.dtype).itemsize
+
+
+class FrameStore:
+    def __init__(self, root: Path | str, chunk_bytes: int = 256 << 20, readonly: bool = False):
+        self.root = Path(root)
+        self.chunk_bytes = chunk_bytes
+        self.readonly = readonly
+        if not readonly:
+            self.root.mkdir(parents=True, exist_ok=True)
+        elif not (self.root / INDEX_NAME).exists():
+            raise FileNotFoundError(f"No frame store at {self.root}")
+        self._refs: Dict[str, Dict[str, ArrayRef]] = {}
+        self._meta: Dict[str, dict] = {}
+        self._maps: Dict[int, np.memmap] = {}
+        self._load_index()
+
+    # Index
+
+    def _load_index(self) -> None:
+        path = self.root / INDEX_NAME
+        if not path.exists():
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                self._apply(rec)
+
+    def _apply(self, rec: dict) -> None:
+        key = rec["key"]
+        if "field" in rec:
+            self._refs.setdefault(key, {})[rec["field"]] = ArrayRef(
+                rec["chunk"], rec["offset"], tuple(rec["shape"]), rec["dtype"]
+            )
+        else:
+            self._refs.setdefault(key, {})
+        if rec.get("meta"):
+            self._meta.setdefault(key, {}).update(rec["meta"])
+
+    def _append_index(self, records: List[dict]) -> None:
+        with open(self.root / INDEX_NAME, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+
+    # Writing
+
+    def _chunk_path(self, chunk: int) -> Path:
+        return self.root / f"chunk_{chunk:05d}.bin"
+
+    def _current_chunk(self) -> Tuple[int, int]:
+        chunks = sorted(self.root.glob("chunk_*.bin"))
+        if not chunks:
+            return 0, 0
+        last = chunks[-1]
+        return int(last.stem.split("_")[1]), last.stat().st_size
+
+    def put(self, key: str, meta: Optional[dict] = None, **arrays: np.ndarray) -> None:
+        """
+        Store ``arrays`` (e.g. frame=..., mask=..., centerline=...) under ``key``.
+        Existing fields of ``key`` that aren't passed are kept.
+        """
+        if self.readonly:
+            raise RuntimeError("FrameStore opened read-only")
+        records: List[dict] = []
+        chunk, size = self._current_chunk()
+        for field, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            if size > 0 and size + arr.nbytes > self.chunk_bytes:
+                chunk, size = chunk + 1, 0
+            offset = -(-size // ALIGN) * ALIGN
+            with open(self._chunk_path(chunk), "ab") as f:
+                if offset > size:
+                    f.write(b"\0" * (offset - size))
+                f.write(arr.data)
+            size = offset + arr.nbytes
+            records.append({
+                "key": key,
+                "field": field,
+                "chunk": chunk,
+                "offset": offset,
+                "shape": list(arr.shape),
+                "dtype": arr.dtype.str,
+            })
+        if meta:
+            if records:
+                records[-1]["meta"] = meta
+            else:
+                records.append({"key": key, "meta": meta})
+        if not records:
+            records.append({"key": key})
+        self._append_index(records)
+        for rec in records:
+            self._apply(rec)
+
+    # Reading
+
+    def _map(self, chunk: int, end: int) -> np.memmap:
+        mm = self._maps.get(chunk)
+        if mm is None or mm.size < end:
+            # (Re)map when a chunk has grown past what this reader last saw
+            mm = np.memmap(self._chunk_path(chunk), dtype=np.uint8, mode="r")
+            self._maps[chunk] = mm
+        return mm
+
+    def get(self, key: str, field: str) -> np.ndarray:
+        """Read-only, zero-copy view of one stored array."""
+        ref = self._refs[key][field]
+        if ref.nbytes == 0:
+            # Nothing to map (e.g. an empty centerline), and the chunk may still be an empty file
+            return np.empty(ref.shape, dtype=ref.dtype)
+        mm = self._map(ref.chunk, ref.offset + ref.nbytes)
+        return mm[ref.offset:ref.offset + ref.nbytes].view(ref.dtype).reshape(ref.shape)
+
+    def __getitem__(self, key: str) -> Dict[str, np.ndarray]:
+        return {field: self.get(key, field) for field in self._refs[key]}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._refs
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._refs)
+
+    def keys(self, field: Optional[str] = None) -> List[str]:
+        """Keys in insertion order, optionally only those that have ``field``."""
+        return [k for k, fields in self._refs.items() if field is None or field in fields]
+
+    def fields(self, key: str) -> List[str]:
+        return list(self._refs[key])
+
+    def meta(self, key: str) -> dict:
+        return dict(self._meta.get(key, {}))
+
+    def refresh(self) -> None:
+        """Pick up entries appended by other writers since this store was opened."""
+        self._refs.clear()
+        self._meta.clear()
+        self._load_index()
+
+    def compact(self) -> None:
+        """
+        Rewrite the store keeping only the latest array per (key, field).
+
+        The compacted chunks are moved in under numbers after the existing ones, then the new
+        index replaces the old one in a single rename, and only then are the old chunks deleted.
+        A crash at any point leaves one complete store (plus unreferenced chunks at worst).
+        """
+        if self.readonly:
+            raise RuntimeError("FrameStore opened read-only")
+        tmp = self.root.with_name(self.root.name + ".compact")
+        if tmp.exists():
+            shutil.rmtree(tmp)  # left over from an interrupted compaction
+        out = FrameStore(tmp, chunk_bytes=self.chunk_bytes)
+        for key in self.keys():
+            out.put(key, meta=self.meta(key) or None, **self[key])
+
+        old_chunks = sorted(self.root.glob("chunk_*.bin"))
+        base = int(old_chunks[-1].stem.split("_")[1]) + 1 if old_chunks else 0
+        for p in sorted(tmp.glob("chunk_*.bin")):
+            os.replace(p, self._chunk_path(base + int(p.stem.split("_")[1])))
+        index_tmp = self.root / (INDEX_NAME + ".tmp")
+        with open(tmp / INDEX_NAME, "r", encoding="utf-8") as src, open(index_tmp, "w", encoding="utf-8") as dst:
+            for line in src:
+                rec = json.loads(line)
+                if "chunk" in rec:
+                    rec["chunk"] += base
+                dst.write(json.dumps(rec, separators=(",", ":")) + "\n")
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(index_tmp, self.root / INDEX_NAME)
+
+        self._maps.clear()
+        for p in old_chunks:
+            p.unlink()
+        shutil.rmtree(tmp)
+        self.refresh()
+
+
+app = typer.Typer(add_completion=False)
+
+
+@app.command("import")
+def import_images(
+    store: Path = typer.Option(..., help="Store directory (created if missing)"),
+    images_dir: Path = typer.Option(..., exists=True, file_okay=False, help="Directory of capture PNG/JPG files"),
+    masks_dir: Optional[Path] = typer.Option(None, exists=True, file_okay=False, help="Optional masks with matching names"),
+):
+    """
+    Decode a directory of captures (and masks) once and pack them into a frame store.
+    """
+    import cv2
+
+    fs = FrameStore(store)
+    paths = sorted(images_dir.glob("*.png")) + sorted(images_dir.glob("*.jpg"))
+    added = 0
+    for p in paths:
+        if p.stem in fs:
+            continue
+        frame = cv2.imread(str(p))
+        if frame is None:
+            print(f"[yellow]Skipping unreadable {p.name}")
+            continue
+        arrays = {"frame": frame}
+        if masks_dir is not None:
+            mask = cv2.imread(str(masks_dir / p.name), cv2.IMREAD_GRAYSCALE)
+            if mask is not None:
+                arrays["mask"] = mask
+        fs.put(p.stem, meta={"source": p.name}, **arrays)
+        added += 1
+    print(f"[green]Added {added} captures to {store} ({len(fs)} total)")
+
+
+@app.command()
+def analyze(
+    store: Path = typer.Option(..., exists=True, file_okay=False, help="Store directory"),
+    marker_mm: float = typer.Option(20.0, help="Reference marker side length in millimeters"),
+    out_jsonl: Optional[Path] = typer.Option(None, help="Optional metrics JSONL output"),
+    save_arrays: bool = typer.Option(True, help="Write masks and centerlines back into the store"),
+    aruco_preset: str = typer.Option("default", help="ArUco detector preset: default, fast, accurate, low-light"),
+    centerline: str = typer.Option("contour", help="Centerline method: contour (outline midline) or skeleton"),
+):
+    """
+    Batch re-analysis of every stored frame without re-decoding images.
+    """
+    import time
+    from dataclasses import asdict
+
+    from aruco_scale import detect_aruco_scale
+    from geometry import CENTERLINE_METHODS, compute_metrics
+    from segmentation import segment_roi_contour
+
+    if centerline not in CENTERLINE_METHODS:
+        raise typer.BadParameter(f"--centerline must be one of {', '.join(CENTERLINE_METHODS)}")
+    fs = FrameStore(store)
+    keys = fs.keys("frame")
+    start = time.perf_counter()
+    out = open(out_jsonl, "w", encoding="utf-8") if out_jsonl is not None else None
+    try:
+        for key in keys:
+            frame = fs.get(key, "frame")
+            scale = detect_aruco_scale(frame, marker_length_mm=marker_mm, preset=aruco_preset, draw_debug=False)
+            mask, contour, _ = segment_roi_contour(frame)
+            metrics, _, path = compute_metrics(mask, pixels_per_mm=scale.pixels_per_mm, method=centerline, contour=contour)
+            result = {
+                "key": key,
+                "pixels_per_mm": scale.pixels_per_mm,
+                "detected_markers": scale.detected_markers,
+                "metrics": asdict(metrics),
+            }
+            if save_arrays:
+                points = np.asarray(path, dtype=np.float32).reshape(-1, 2)
+                fs.put(key, meta={"metrics": result["metrics"]}, mask=mask, centerline=points)
+            if out is not None:
+                out.write(json.dumps(result) + "\n")
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - start
+    rate = len(keys) / elapsed if elapsed > 0 else 0.0
+    print(f"[green]Analyzed {len(keys)} frames in {elapsed:.2f}s ({rate:.1f} frames/s)")
+
+
+@app.command()
+def info(store: Path = typer.Option(..., exists=True, file_okay=False, help="Store directory")):
+    """
+    Summarize a store: captures, fields and on-disk size.
+    """
+    fs = FrameStore(store, readonly=True)
+    counts: Dict[str, int] = {}
+    for key in fs:
+        for field in fs.fields(key):
+            counts[field] = counts.get(field, 0) + 1
+    size = sum(p.stat().st_size for p in store.glob("chunk_*.bin"))
+    print({"captures": len(fs), "fields": counts, "chunk_bytes_on_disk": size})
+
+
+@app.command()
+def compact(store: Path = typer.Option(..., exists=True, file_okay=False, help="Store directory")):
+    """
+    Drop superseded arrays (e.g. masks replaced by a re-analysis) and rewrite the chunks.
+    """
+    FrameStore(store).compact()
+    print(f"[green]Compacted {store}")
+
+
+if __name__ == "__main__":
+    app()
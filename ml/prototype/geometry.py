@@ -1,12 +1,29 @@
 from __future__ import annotations
 
+import math
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
 
 
+# Two ways to get from a mask to an ordered centerline:
+#   skeleton   thin the mask to a 1 px skeleton and walk it from one endpoint; cost grows with the
+#              mask area (one erode/dilate pass per pixel of half-width), and spurs or gaps in the
+#              skeleton cut the walk short
+#   contour    work on the outline polygon only: the two extremal contour points are the ends, the
+#              contour between them gives two sides, and the centerline is the midpoint of the
+#              sides matched by arc-length fraction. Cost is linear in the contour length.
+# Matching by fraction assumes the subject is a tube of roughly constant width whose sides run
+# parallel. Around the rounded ends the two sides are not opposite each other, so each side's end
+# cap (the points within sqrt(2) half-widths of either end) is dropped before matching. The body's
+# first and last matched pairs then sit across the cap centers, and the centerline runs between
+# them, as the skeleton does.
+
+CENTERLINE_METHODS = ("contour", "skeleton")
+
+
 @dataclass
 class Metrics:
     arc_length_mm: float
@@ -100,7 +117,88 @@ def _extract_centerline_points(skeleton: np.ndarray) -> List[Tuple[int, int]]:
     return path
 
 
-def _polyline_length(points: List[Tuple[int, int]]) -> float:
+def _arc_length(xy: np.ndarray) -> float:
+    return float(np.linalg.norm(np.diff(xy, axis=0), axis=1).sum())
+
+
+def _resample(xy: np.ndarray, n: int) -> np.ndarray:
+    """``n`` points spaced evenly by arc length along the polyline ``xy`` (k, 2)."""
+    seg = np.linalg.norm(np.diff(xy, axis=0), axis=1)
+    s = np.concatenate(([0.0], np.cumsum(seg)))
+    t = np.linspace(0.0, s[-1], n)
+    return np.stack([np.interp(t, s, xy[:, 0]), np.interp(t, s, xy[:, 1])], axis=1)
+
+
+def _smooth_polyline(xy: np.ndarray, window: int) -> np.ndarray:
+    """
+    Box-filter an open polyline without pulling its ends inwards.
+
+    The ends are extended by point reflection (2 * end - mirrored neighbours), which keeps the end
+    points and their tangent direction where they were; zero or edge padding bends both.
+    """
+    half = window // 2
+    if half < 1 or len(xy) <= half:
+        return xy
+    ext = np.concatenate((2 * xy[0] - xy[1:half + 1][::-1], xy, 2 * xy[-1] - xy[-half - 1:-1][::-1]))
+    kernel = np.ones(2 * half + 1) / (2 * half + 1)
+    return np.stack([np.convolve(ext[:, i], kernel, mode="valid") for i in range(xy.shape[1])], axis=1)
+
+
+def largest_contour(mask: np.ndarray) -> Optional[np.ndarray]:
+    """Largest external contour of a binary mask, every boundary pixel kept; None if empty."""
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    if not contours:
+        return None
+    return max(contours, key=cv2.contourArea)
+
+
+def contour_centerline(contour: np.ndarray) -> List[Tuple[float, float]]:
+    """
+    Ordered centerline (y, x) of an elongated shape from its outline, at roughly 1 px spacing.
+
+    ``contour`` is an OpenCV contour (n, 1, 2) of x, y points. Starts at the end with the smaller
+    (y, x), like the skeleton walk. Returns an empty list for degenerate contours.
+    """
+    p = contour.reshape(-1, 2).astype(np.float64)
+    if len(p) < 8:
+        return []
+    # Ends: the point farthest from the centroid, then the point farthest from that one
+    a = int(np.argmax(((p - p.mean(axis=0)) ** 2).sum(axis=1)))
+    b = int(np.argmax(((p - p[a]) ** 2).sum(axis=1)))
+    i, j = sorted((a, b))
+    if j - i < 2 or len(p) - (j - i) < 2:
+        return []
+    side1 = p[i:j + 1]
+    side2 = np.concatenate((p[j:], p[:i + 1]))[::-1]  # also from p[i] to p[j]
+
+    # Half-width from a first, cap-included matching; the middle half is clear of the caps
+    n = max(8, int(max(_arc_length(side1), _arc_length(side2))))
+    half_width = np.linalg.norm(_resample(side1, n) - _resample(side2, n), axis=1) / 2
+    r = float(np.median(half_width[n // 4:3 * n // 4]))
+
+    ends = p[[i, j]]
+    cap = r * math.sqrt(2)
+
+    def body(side: np.ndarray) -> np.ndarray:
+        d = np.linalg.norm(side[:, None, :] - ends[None, :, :], axis=2).min(axis=1)
+        keep = np.flatnonzero(d >= cap)
+        return side[keep[0]:keep[-1] + 1] if len(keep) >= 2 else side
+
+    body1, body2 = body(side1), body(side2)
+    n = max(2, int(max(_arc_length(body1), _arc_length(body2))) + 1)
+    mid = (_resample(body1, n) + _resample(body2, n)) / 2
+    mid = _resample(mid, max(2, int(round(_arc_length(mid))) + 1))
+    # Pixel-grid stair steps on the outline survive the averaging; smoothing over a quarter of the
+    # half-width removes them without rounding off bends
+    mid = _smooth_polyline(mid, int(r / 4) | 1)
+
+    yx = mid[:, ::-1]
+    if tuple(yx[-1]) < tuple(yx[0]):
+        yx = yx[::-1]
+    return [(float(y), float(x)) for y, x in yx]
+
+
+def _polyline_length(points: Sequence[Tuple[float, float]]) -> float:
     if len(points) < 2:
         return 0.0
     total = 0.0
@@ -109,7 +207,7 @@ def _polyline_length(points: List[Tuple[int, int]]) -> float:
     return total
 
 
-def _max_curvature_angle(points: List[Tuple[int, int]]) -> Tuple[float, int]:
+def _max_curvature_angle(points: Sequence[Tuple[float, float]]) -> Tuple[float, int]:
     """
     Estimate maximum curvature angle along the centerline using local tangent vectors.
     Returns (max_angle_deg, index_of_hinge).
@@ -117,11 +215,9 @@ def _max_curvature_angle(points: List[Tuple[int, int]]) -> Tuple[float, int]:
     if len(points) < 5:
         return 0.0, 0
 
-    pts = np.array(points, dtype=np.float32)
+    pts = np.array(points, dtype=np.float64)
     # Smooth with a small window
-    kernel = np.ones(5, dtype=np.float32) / 5.0
-    ys = np.convolve(pts[:, 0], kernel, mode='same')
-    xs = np.convolve(pts[:, 1], kernel, mode='same')
+    ys, xs = _smooth_polyline(pts, 5).T
 
     # Compute tangent angles
     dy = np.gradient(ys)
@@ -142,21 +238,33 @@ def _max_curvature_angle(points: List[Tuple[int, int]]) -> Tuple[float, int]:
 def compute_metrics(
     mask: np.ndarray,
     pixels_per_mm: float | None,
-) -> Tuple[Metrics, np.ndarray, List[Tuple[int, int]]]:
+    method: str = "contour",
+    contour: Optional[np.ndarray] = None,
+) -> Tuple[Metrics, np.ndarray, List[Tuple[float, float]]]:
     """
     Compute curvature metrics from a binary mask and optional scale.
 
-    Returns metrics, a debug image, and the centerline points.
+    ``method`` picks how the centerline is found (see CENTERLINE_METHODS); the contour method can
+    reuse a ``contour`` the caller already has for this mask and falls back to the skeleton if the
+    outline gives no centerline. Returns metrics, a debug image, and the centerline points (y, x).
     """
+    if method not in CENTERLINE_METHODS:
+        raise ValueError(f"Unknown centerline method {method!r}; expected one of {CENTERLINE_METHODS}")
     if mask.dtype != np.uint8:
         mask = mask.astype(np.uint8)
-    skel = _skeletonize(mask)
-    path = _extract_centerline_points(skel)
+    path: List[Tuple[float, float]] = []
+    if method == "contour":
+        if contour is None:
+            contour = largest_contour(mask)
+        if contour is not None:
+            path = contour_centerline(contour)
+    if not path:
+        path = _extract_centerline_points(_skeletonize(mask))
 
     h, w = mask.shape[:2]
     debug = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
     for (y, x) in path:
-        cv2.circle(debug, (x, y), 1, (0, 0, 255), -1)
+        cv2.circle(debug, (int(round(x)), int(round(y))), 1, (0, 0, 255), -1)
 
     px_per_mm = pixels_per_mm if pixels_per_mm and pixels_per_mm > 0 else None
 
@@ -189,12 +297,12 @@ def compute_metrics(
 
     # Draw annotations
     if len(path) >= 2:
-        base = (path[0][1], path[0][0])
-        tip = (path[-1][1], path[-1][0])
+        base = (int(round(path[0][1])), int(round(path[0][0])))
+        tip = (int(round(path[-1][1])), int(round(path[-1][0])))
         cv2.line(debug, base, tip, (255, 0, 0), 1)
         if 0 <= hinge_idx < len(path):
             hr = path[hinge_idx]
-            cv2.circle(debug, (hr[1], hr[0]), 4, (0, 255, 255), -1)
+            cv2.circle(debug, (int(round(hr[1])), int(round(hr[0]))), 4, (0, 255, 255), -1)
 
     return metrics, debug, path
 
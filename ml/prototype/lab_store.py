@@ -0,0 +1,621 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+# Storage backends for lab_stub_cli's sandbox orders and results.
+#
+#   SqliteStore    one SQLite file in WAL mode, indexed on userId, orderId, status and createdAt;
+#                  status changes and result inserts commit together or not at all
+#   JsonTreeStore  the original layout, one pretty-printed JSON file per order and per result
+#                  under orders/ and results/; every listing opens every file
+#
+# Documents keep the camelCase keys the CLI has always written; the indexed fields are copied
+# into columns next to the full JSON document. Listings are keyset-paginated on
+# (createdAt, id): pass the returned cursor back to get the next page.
+#
+# Every state change also appends to an event log in the same write: order_created,
+# order_updated, order_completed and result_final, each with a monotonically increasing offset
+# that is never reused, even after compaction. Consumers read events after an offset and commit
+# the last one they processed under a name; compaction drops events every registered consumer has
+# committed, plus anything beyond an optional size cap.
+
+
+def _now_iso() -> str:
+    return f"{datetime.utcnow().isoformat()}Z"
+
+
+@dataclass
+class Page:
+    items: List[dict]
+    next_cursor: Optional[str]
+
+
+def _encode_cursor(doc: dict, id_key: str) -> str:
+    return f"{doc['createdAt']}|{doc[id_key]}"
+
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    if not cursor:
+        return None
+    created_at, sep, item_id = cursor.rpartition("|")
+    if not sep:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return created_at, item_id
+
+
+@dataclass
+class Event:
+    offset: int
+    type: str
+    order_id: str
+    user_id: Optional[str]
+    at: str
+    data: dict
+
+
+class LabStore(ABC):
+    """Orders and results for the lab sandbox."""
+
+    @abstractmethod
+    def put_order(self, order: dict) -> None:
+        """Insert or replace an order document."""
+
+    @abstractmethod
+    def get_order(self, order_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def list_orders(
+        self,
+        user_id: Optional[str] = None,
+        status: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        """Orders by (createdAt, orderId); ``created_from`` inclusive, ``created_to`` exclusive (ISO strings)."""
+
+    @abstractmethod
+    def complete_order(self, order_id: str, result: dict, completed_at: str) -> dict:
+        """
+        Store ``result`` and mark the order completed as one atomic change; returns the updated
+        order. Raises KeyError if the order does not exist.
+        """
+
+    def complete_orders(self, completions: Sequence[Tuple[str, dict, str]]) -> List[str]:
+        """
+        Batch form of complete_order for (order_id, result, completed_at) triples. Orders that are
+        missing or already completed are skipped, so overlapping batch runs never complete an order
+        twice. Returns the ids of the orders completed, in input order.
+        """
+        done: List[str] = []
+        for order_id, result, completed_at in completions:
+            order = self.get_order(order_id)
+            if order is None or order.get("status") == "completed":
+                continue
+            self.complete_order(order_id, result, completed_at)
+            done.append(order_id)
+        return done
+
+    @abstractmethod
+    def get_result(self, result_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def list_results(
+        self,
+        order_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        """Results by (createdAt, resultId), optionally for one order or one user's orders."""
+
+    @abstractmethod
+    def read_events(self, after: int = 0, limit: int = 1000, types: Optional[Sequence[str]] = None) -> List[Event]:
+        """Events with offset > ``after`` in offset order, optionally only the given types."""
+
+    @abstractmethod
+    def first_event_offset(self) -> Optional[int]:
+        """Oldest retained offset; a consumer whose offset + 1 is below it has missed compacted events."""
+
+    @abstractmethod
+    def consumer_offset(self, name: str) -> int:
+        """Last offset committed by consumer ``name`` (0 if it never committed)."""
+
+    @abstractmethod
+    def commit_offset(self, name: str, offset: int) -> None:
+        """Record that consumer ``name`` has processed every event up to ``offset``. Never moves backwards."""
+
+    @abstractmethod
+    def compact_events(self, max_events: Optional[int] = None) -> int:
+        """
+        Drop events every registered consumer has committed and, if ``max_events`` is set, all but the
+        newest ``max_events``. With no registered consumers only the size cap applies. Returns the
+        number of events removed.
+        """
+
+    def poll(self, consumer: str, limit: int = 1000, types: Optional[Sequence[str]] = None) -> List[Event]:
+        """Events after ``consumer``'s committed offset. Commit the last offset once they are handled."""
+        return self.read_events(self.consumer_offset(consumer), limit=limit, types=types)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "LabStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id     TEXT PRIMARY KEY,
+    user_id      TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    created_at   TEXT NOT NULL,
+    completed_at TEXT,
+    doc          TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_user_created ON orders (user_id, created_at, order_id);
+CREATE INDEX IF NOT EXISTS orders_status_created ON orders (status, created_at, order_id);
+CREATE INDEX IF NOT EXISTS orders_created ON orders (created_at, order_id);
+
+CREATE TABLE IF NOT EXISTS results (
+    result_id  TEXT PRIMARY KEY,
+    order_id   TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    doc        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_order ON results (order_id, created_at, result_id);
+CREATE INDEX IF NOT EXISTS results_created ON results (created_at, result_id);
+
+-- AUTOINCREMENT: offsets are never reused, even when compaction empties the table
+CREATE TABLE IF NOT EXISTS events (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    type     TEXT NOT NULL,
+    order_id TEXT NOT NULL,
+    user_id  TEXT,
+    at       TEXT NOT NULL,
+    data     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS consumers (
+    name       TEXT PRIMARY KEY,
+    seq        INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+_INSERT_EVENT = "INSERT INTO events (type, order_id, user_id, at, data) VALUES (?, ?, ?, ?, ?)"
+
+
+def _put_events(order: dict, previous: Optional[Tuple[str, str]], doc: str, at: str) -> List[tuple]:
+    """Event rows for writing ``order`` (serialized as ``doc``) over ``previous`` (status, doc), if any."""
+    status = order.get("status", "sent")
+    if previous is None:
+        return [("order_created", order["orderId"], order["userId"], at, json.dumps({"status": status}))]
+    if previous[1] == doc:
+        return []
+    data = {"status": status} if previous[0] == status else {"status": status, "previousStatus": previous[0]}
+    return [("order_updated", order["orderId"], order["userId"], at, json.dumps(data))]
+
+
+def _completion_events(order: dict, previous_status: str, result: dict, at: str) -> List[tuple]:
+    order_id, user_id = order["orderId"], order.get("userId")
+    return [
+        ("result_final", order_id, user_id, at, json.dumps({"resultId": result["resultId"]})),
+        ("order_completed", order_id, user_id, at, json.dumps(
+            {"resultId": result["resultId"], "completedAt": order["completedAt"], "previousStatus": previous_status}
+        )),
+    ]
+
+
+def _order_row(order: dict) -> tuple:
+    return (
+        order["orderId"],
+        order["userId"],
+        order.get("status", "sent"),
+        order["createdAt"],
+        order.get("completedAt"),
+        json.dumps(order),
+    )
+
+
+def _result_row(result: dict) -> tuple:
+    return (result["resultId"], result["orderId"], result.get("status", "final"), result["createdAt"], json.dumps(result))
+
+
+class SqliteStore(LabStore):
+    def __init__(self, path: Path | str, check_same_thread: bool = True):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE (see _tx)
+        self.conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None, check_same_thread=check_same_thread)
+        # WAL lets readers (list/get from another process) run while a writer commits
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def _tx(self) -> "_Transaction":
+        return _Transaction(self.conn)
+
+    def _existing(self, table: str, key: str, columns: str, ids: Sequence[str]) -> dict:
+        """{id: row} for the ids present in ``table``, queried in chunks under SQLite's parameter limit."""
+        found = {}
+        for i in range(0, len(ids), 500):
+            part = list(ids[i:i + 500])
+            marks = ",".join("?" * len(part))
+            for row in self.conn.execute(f"SELECT {key}, {columns} FROM {table} WHERE {key} IN ({marks})", part):
+                found[row[0]] = row[1:]
+        return found
+
+    def put_order(self, order: dict) -> None:
+        self.put_orders([order])
+
+    def put_orders(self, orders: Iterable[dict]) -> int:
+        """Insert or replace many orders in one transaction; unchanged documents log no event."""
+        orders = list(orders)
+        rows = [_order_row(o) for o in orders]
+        at = _now_iso()
+        with self._tx():
+            previous = self._existing("orders", "order_id", "status, doc", [o["orderId"] for o in orders])
+            events = [e for o, r in zip(orders, rows) for e in _put_events(o, previous.get(o["orderId"]), r[-1], at)]
+            self.conn.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany(_INSERT_EVENT, events)
+        return len(rows)
+
+    def put_results(self, results: Iterable[dict]) -> int:
+        """Insert or replace many results in one transaction (no order status change); new ones log result_final."""
+        rows = [_result_row(r) for r in results]
+        at = _now_iso()
+        with self._tx():
+            seen = self._existing("results", "result_id", "order_id", [r[0] for r in rows])
+            self.conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.executemany(
+                "INSERT INTO events (type, order_id, user_id, at, data) "
+                "VALUES ('result_final', ?, (SELECT user_id FROM orders WHERE order_id = ?), ?, ?)",
+                [(r[1], r[1], at, json.dumps({"resultId": r[0]})) for r in rows if r[0] not in seen],
+            )
+        return len(rows)
+
+    def get_order(self, order_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT doc FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _page(self, sql: str, params: list, id_col: str, id_key: str, limit: int, cursor: Optional[str], where: List[str]) -> Page:
+        after = _decode_cursor(cursor)
+        if after is not None:
+            where.append(f"(created_at, {id_col}) > (?, ?)")
+            params.extend(after)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY created_at, {id_col} LIMIT ?"
+        # One extra row tells whether another page exists
+        params.append(limit + 1)
+        items = [json.loads(doc) for (doc,) in self.conn.execute(sql, params)]
+        more = len(items) > limit
+        items = items[:limit]
+        return Page(items, _encode_cursor(items[-1], id_key) if more else None)
+
+    def list_orders(
+        self,
+        user_id: Optional[str] = None,
+        status: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        where: List[str] = []
+        params: list = []
+        for clause, value in (("user_id = ?", user_id), ("status = ?", status), ("created_at >= ?", created_from), ("created_at < ?", created_to)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        return self._page("SELECT doc FROM orders", params, "order_id", "orderId", limit, cursor, where)
+
+    def complete_order(self, order_id: str, result: dict, completed_at: str) -> dict:
+        with self._tx():
+            row = self.conn.execute("SELECT doc FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+            if row is None:
+                raise KeyError(order_id)
+            order = json.loads(row[0])
+            previous_status = order.get("status", "sent")
+            order["status"] = "completed"
+            order["completedAt"] = completed_at
+            self.conn.execute("INSERT INTO results VALUES (?, ?, ?, ?, ?)", _result_row(result))
+            self.conn.execute(
+                "UPDATE orders SET status = ?, completed_at = ?, doc = ? WHERE order_id = ?",
+                (order["status"], completed_at, json.dumps(order), order_id),
+            )
+            self.conn.executemany(_INSERT_EVENT, _completion_events(order, previous_status, result, _now_iso()))
+        return order
+
+    def complete_orders(self, completions: Sequence[Tuple[str, dict, str]]) -> List[str]:
+        if not completions:
+            return []
+        by_id = {order_id: (result, completed_at) for order_id, result, completed_at in completions}
+        result_rows, order_rows, events = [], [], []
+        at = _now_iso()
+        with self._tx():
+            for order_id, (status, doc) in self._existing("orders", "order_id", "status, doc", list(by_id)).items():
+                if status == "completed":
+                    continue
+                result, completed_at = by_id[order_id]
+                order = json.loads(doc)
+                order["status"] = "completed"
+                order["completedAt"] = completed_at
+                result_rows.append(_result_row(result))
+                order_rows.append(("completed", completed_at, json.dumps(order), order_id))
+                events.extend(_completion_events(order, status, result, at))
+            self.conn.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?)", result_rows)
+            self.conn.executemany("UPDATE orders SET status = ?, completed_at = ?, doc = ? WHERE order_id = ?", order_rows)
+            self.conn.executemany(_INSERT_EVENT, events)
+        completed = {row[-1] for row in order_rows}
+        return [order_id for order_id in by_id if order_id in completed]
+
+    def get_result(self, result_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT doc FROM results WHERE result_id = ?", (result_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_results(
+        self,
+        order_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        where: List[str] = []
+        params: list = []
+        if order_id is not None:
+            where.append("order_id = ?")
+            params.append(order_id)
+        if user_id is not None:
+            where.append("order_id IN (SELECT order_id FROM orders WHERE user_id = ?)")
+            params.append(user_id)
+        return self._page("SELECT doc FROM results", params, "result_id", "resultId", limit, cursor, where)
+
+    def read_events(self, after: int = 0, limit: int = 1000, types: Optional[Sequence[str]] = None) -> List[Event]:
+        sql = "SELECT seq, type, order_id, user_id, at, data FROM events WHERE seq > ?"
+        params: list = [after]
+        if types:
+            sql += f" AND type IN ({','.join('?' * len(types))})"
+            params.extend(types)
+        sql += " ORDER BY seq LIMIT ?"
+        params.append(limit)
+        return [Event(seq, t, o, u, at, json.loads(d)) for seq, t, o, u, at, d in self.conn.execute(sql, params)]
+
+    def first_event_offset(self) -> Optional[int]:
+        return self.conn.execute("SELECT MIN(seq) FROM events").fetchone()[0]
+
+    def consumer_offset(self, name: str) -> int:
+        row = self.conn.execute("SELECT seq FROM consumers WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def commit_offset(self, name: str, offset: int) -> None:
+        with self._tx():
+            self.conn.execute(
+                "INSERT INTO consumers VALUES (?, ?, ?) ON CONFLICT (name) DO UPDATE "
+                "SET seq = MAX(seq, excluded.seq), updated_at = excluded.updated_at",
+                (name, offset, _now_iso()),
+            )
+
+    def compact_events(self, max_events: Optional[int] = None) -> int:
+        with self._tx():
+            before = self.conn.total_changes
+            floor = self.conn.execute("SELECT MIN(seq) FROM consumers").fetchone()[0]
+            if floor is not None:
+                self.conn.execute("DELETE FROM events WHERE seq <= ?", (floor,))
+            if max_events is not None:
+                self.conn.execute(
+                    "DELETE FROM events WHERE seq <= (SELECT MAX(seq) FROM events) - ?", (max_events,)
+                )
+            removed = self.conn.total_changes - before
+        return removed
+
+    def counts(self) -> Tuple[int, int]:
+        orders = self.conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        results = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return orders, results
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error. Immediate takes the write lock up front."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+
+
+class JsonTreeStore(LabStore):
+    """
+    The original one-file-per-document layout. Listing reads and sorts every file. Events go to
+    events.jsonl; the last offset and consumer offsets live in events_state.json.
+    """
+
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+        self.orders_dir = self.root / "orders"
+        self.results_dir = self.root / "results"
+        self.events_path = self.root / "events.jsonl"
+        self.state_path = self.root / "events_state.json"
+        self.orders_dir.mkdir(parents=True, exist_ok=True)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+
+    def _state(self) -> dict:
+        return self._read(self.state_path) or {"lastOffset": 0, "consumers": {}}
+
+    def _append_events(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        state = self._state()
+        with self.events_path.open("a", encoding="utf-8") as f:
+            for type_, order_id, user_id, at, data in rows:
+                state["lastOffset"] += 1
+                event = Event(state["lastOffset"], type_, order_id, user_id, at, json.loads(data))
+                f.write(json.dumps(asdict(event)) + "\n")
+        self.state_path.write_text(json.dumps(state), encoding="utf-8")
+
+    def _iter_events(self) -> Iterable[Event]:
+        if not self.events_path.exists():
+            return
+        with self.events_path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield Event(**json.loads(line))
+
+    @staticmethod
+    def _read(path: Path) -> Optional[dict]:
+        return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+
+    def iter_orders(self) -> Iterable[dict]:
+        for p in sorted(self.orders_dir.glob("*.json")):
+            yield json.loads(p.read_text(encoding="utf-8"))
+
+    def iter_results(self) -> Iterable[dict]:
+        for p in sorted(self.results_dir.glob("*.json")):
+            yield json.loads(p.read_text(encoding="utf-8"))
+
+    def put_order(self, order: dict) -> None:
+        path = self.orders_dir / f"{order['orderId']}.json"
+        old = self._read(path)
+        previous = None if old is None else (old.get("status", "sent"), json.dumps(old))
+        events = _put_events(order, previous, json.dumps(order), _now_iso())
+        path.write_text(json.dumps(order, indent=2), encoding="utf-8")
+        self._append_events(events)
+
+    def get_order(self, order_id: str) -> Optional[dict]:
+        return self._read(self.orders_dir / f"{order_id}.json")
+
+    @staticmethod
+    def _page(docs: List[dict], id_key: str, limit: int, cursor: Optional[str]) -> Page:
+        docs.sort(key=lambda d: (d["createdAt"], d[id_key]))
+        after = _decode_cursor(cursor)
+        if after is not None:
+            docs = [d for d in docs if (d["createdAt"], d[id_key]) > after]
+        more = len(docs) > limit
+        docs = docs[:limit]
+        return Page(docs, _encode_cursor(docs[-1], id_key) if more else None)
+
+    def list_orders(
+        self,
+        user_id: Optional[str] = None,
+        status: Optional[str] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        docs = [
+            o for o in self.iter_orders()
+            if (user_id is None or o.get("userId") == user_id)
+            and (status is None or o.get("status") == status)
+            and (created_from is None or o["createdAt"] >= created_from)
+            and (created_to is None or o["createdAt"] < created_to)
+        ]
+        return self._page(docs, "orderId", limit, cursor)
+
+    def complete_order(self, order_id: str, result: dict, completed_at: str) -> dict:
+        order = self.get_order(order_id)
+        if order is None:
+            raise KeyError(order_id)
+        # Not atomic: the result, the order and the event log are written one after the other
+        (self.results_dir / f"{result['resultId']}.json").write_text(json.dumps(result, indent=2), encoding="utf-8")
+        previous_status = order.get("status", "sent")
+        order["status"] = "completed"
+        order["completedAt"] = completed_at
+        (self.orders_dir / f"{order_id}.json").write_text(json.dumps(order, indent=2), encoding="utf-8")
+        self._append_events(_completion_events(order, previous_status, result, _now_iso()))
+        return order
+
+    def get_result(self, result_id: str) -> Optional[dict]:
+        return self._read(self.results_dir / f"{result_id}.json")
+
+    def list_results(
+        self,
+        order_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        order_ids = None
+        if user_id is not None:
+            order_ids = {o["orderId"] for o in self.iter_orders() if o.get("userId") == user_id}
+        docs = [
+            r for r in self.iter_results()
+            if (order_id is None or r.get("orderId") == order_id)
+            and (order_ids is None or r.get("orderId") in order_ids)
+        ]
+        return self._page(docs, "resultId", limit, cursor)
+
+    def read_events(self, after: int = 0, limit: int = 1000, types: Optional[Sequence[str]] = None) -> List[Event]:
+        out: List[Event] = []
+        for e in self._iter_events():
+            if e.offset > after and (not types or e.type in types):
+                out.append(e)
+                if len(out) >= limit:
+                    break
+        return out
+
+    def first_event_offset(self) -> Optional[int]:
+        return next((e.offset for e in self._iter_events()), None)
+
+    def consumer_offset(self, name: str) -> int:
+        return self._state()["consumers"].get(name, 0)
+
+    def commit_offset(self, name: str, offset: int) -> None:
+        state = self._state()
+        state["consumers"][name] = max(offset, state["consumers"].get(name, 0))
+        self.state_path.write_text(json.dumps(state), encoding="utf-8")
+
+    def compact_events(self, max_events: Optional[int] = None) -> int:
+        state = self._state()
+        floor = min(state["consumers"].values(), default=0)
+        if max_events is not None:
+            floor = max(floor, state["lastOffset"] - max_events)
+        kept = [e for e in self._iter_events() if e.offset > floor]
+        removed = sum(1 for _ in self._iter_events()) - len(kept)
+        if removed:
+            tmp = self.events_path.with_suffix(".jsonl.tmp")
+            tmp.write_text("".join(json.dumps(asdict(e)) + "\n" for e in kept), encoding="utf-8")
+            tmp.replace(self.events_path)
+        return removed
+
+
+def migrate_json_tree(src: JsonTreeStore, dst: SqliteStore, batch_size: int = 5000) -> Tuple[int, int]:
+    """
+    Copy every order and result from a JSON tree into SQLite, in batches of one transaction each.
+    Re-running is safe: documents are keyed by id and replaced. Returns (orders, results) copied.
+    """
+    counts = []
+    for docs, put in ((src.iter_orders(), dst.put_orders), (src.iter_results(), dst.put_results)):
+        total = 0
+        batch: List[dict] = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                total += put(batch)
+                batch = []
+        if batch:
+            total += put(batch)
+        counts.append(total)
+    return counts[0], counts[1]
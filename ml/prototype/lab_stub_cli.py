@@ -1,30 +1,60 @@
 from __future__ import annotations
 
 import json
+import math
+import os
+import random
+import statistics
+import time
 import uuid
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 import typer
 from rich import print
 
+from lab_store import JsonTreeStore, LabStore, Page, SqliteStore, migrate_json_tree
+
 
 DATA_ROOT = Path(__file__).parent / "lab_stub_data"
-ORDERS_DIR = DATA_ROOT / "orders"
-RESULTS_DIR = DATA_ROOT / "results"
+DB_PATH = DATA_ROOT / "lab.sqlite"
+BACKENDS = ("sqlite", "json")
 
 
 app = typer.Typer(add_completion=False)
+_backend = {"name": os.environ.get("LAB_STORE", "sqlite"), "root": DATA_ROOT}
+
+
+@app.callback()
+def _select_backend(
+    backend: str = typer.Option(_backend["name"], help="Storage: sqlite (lab.sqlite, indexed) or json (one file per document); env LAB_STORE"),
+    data_root: Path = typer.Option(DATA_ROOT, help="Directory holding lab.sqlite and/or the orders/ and results/ JSON tree"),
+):
+    if backend not in BACKENDS:
+        raise typer.BadParameter(f"--backend must be one of {', '.join(BACKENDS)}")
+    _backend.update(name=backend, root=data_root)
 
 
 def _now_iso() -> str:
     return f"{datetime.utcnow().isoformat()}Z"
 
 
-def _ensure_dirs() -> None:
-    ORDERS_DIR.mkdir(parents=True, exist_ok=True)
-    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+def _open_store() -> LabStore:
+    root = _backend["root"]
+    if _backend["name"] == "json":
+        return JsonTreeStore(root)
+    return SqliteStore(root / DB_PATH.name)
+
+
+def _print_page(page: Page, id_key: str) -> None:
+    for doc in page.items:
+        print(f"{doc[id_key]}  {doc['createdAt']}  {doc.get('status', '')}")
+    if page.next_cursor:
+        print(f"[dim]next page: --cursor '{page.next_cursor}'")
 
 
 @app.command()
@@ -37,7 +67,6 @@ def create_order(
     """
     Create a sandbox lab order and persist it locally.
     """
-    _ensure_dirs()
     order_id = f"ord_{uuid.uuid4().hex[:12]}"
     parts = facility.split(":")
     facility_obj = {
@@ -53,48 +82,65 @@ def create_order(
         "status": "sent",
         "createdAt": _now_iso(),
     }
-    path = out if out else ORDERS_DIR / f"{order_id}.json"
-    path.write_text(json.dumps(order, indent=2), encoding="utf-8")
-    print(f"[green]Created order {order_id} at {path}")
+    with _open_store() as store:
+        store.put_order(order)
+    if out:
+        out.write_text(json.dumps(order, indent=2), encoding="utf-8")
+    print(f"[green]Created order {order_id}" + (f" (copy at {out})" if out else ""))
 
 
 @app.command()
-def list_orders():
-    _ensure_dirs()
-    for p in sorted(ORDERS_DIR.glob("*.json")):
-        print(p.name)
+def list_orders(
+    user_id: Optional[str] = typer.Option(None, help="Only this user's orders"),
+    status: Optional[str] = typer.Option(None, help="Only orders with this status, e.g. sent or completed"),
+    created_from: Optional[str] = typer.Option(None, help="createdAt >= this ISO timestamp"),
+    created_to: Optional[str] = typer.Option(None, help="createdAt < this ISO timestamp"),
+    limit: int = typer.Option(50, min=1, help="Page size"),
+    cursor: Optional[str] = typer.Option(None, help="Resume after the cursor printed by the previous page"),
+):
+    """
+    List orders oldest first, one page at a time.
+    """
+    with _open_store() as store:
+        page = store.list_orders(user_id=user_id, status=status, created_from=created_from, created_to=created_to, limit=limit, cursor=cursor)
+    _print_page(page, "orderId")
 
 
 @app.command()
 def get_order(order_id: str):
-    _ensure_dirs()
-    p = ORDERS_DIR / f"{order_id}.json"
-    if not p.exists():
+    with _open_store() as store:
+        order = store.get_order(order_id)
+    if order is None:
         raise typer.BadParameter("Order not found")
-    print(json.loads(p.read_text(encoding="utf-8")))
+    print(order)
+
+
+# Demo analytes per panel code: exact codes first, then prefixes. ``None`` as the analyte code
+# means "report under the panel's own code"; anything unmatched is reported as unknown.
+_PANEL_EXACT = {
+    "HIV_AGAB_4TH_GEN": ((None, "nonreactive", "56888-1"),),
+    "HIV_RNA_PCR": ((None, "not detected", "25835-0"),),
+    "SYPHILIS_RPR_TPPA": ((None, "nonreactive", "20507-0"),),
+}
+_PANEL_PREFIXES = (
+    ("CG_NAAT", ((None, "negative", "43305-2"),)),
+    ("HBV_PANEL", (("HBsAg", "nonreactive", "5196-1"), ("anti-HBs", "nonreactive", "22322-2"), ("anti-HBc", "nonreactive", "22321-4"))),
+    ("HCV_AB", ((None, "nonreactive", "13955-0"),)),
+)
+_INTERPRETATION = "See individual analytes. Follow guideline-based retesting windows if recent exposure."
+
+
+@lru_cache(maxsize=None)
+def _panel_template(code: str) -> Tuple[dict, ...]:
+    rows = _PANEL_EXACT.get(code)
+    if rows is None:
+        rows = next((r for prefix, r in _PANEL_PREFIXES if code.startswith(prefix)), ((None, "unknown", ""),))
+    return tuple({"code": analyte or code, "value": value, "loinc": loinc} for analyte, value, loinc in rows)
 
 
 def _demo_result_for_panels(panel_codes: List[str]) -> dict:
-    analytes = []
-    for code in panel_codes:
-        if code.startswith("CG_NAAT"):
-            analytes.append({"code": code, "value": "negative", "loinc": "43305-2"})
-        elif code == "HIV_AGAB_4TH_GEN":
-            analytes.append({"code": code, "value": "nonreactive", "loinc": "56888-1"})
-        elif code == "HIV_RNA_PCR":
-            analytes.append({"code": code, "value": "not detected", "loinc": "25835-0"})
-        elif code == "SYPHILIS_RPR_TPPA":
-            analytes.append({"code": code, "value": "nonreactive", "loinc": "20507-0"})
-        elif code.startswith("HBV_PANEL"):
-            analytes.append({"code": "HBsAg", "value": "nonreactive", "loinc": "5196-1"})
-            analytes.append({"code": "anti-HBs", "value": "nonreactive", "loinc": "22322-2"})
-            analytes.append({"code": "anti-HBc", "value": "nonreactive", "loinc": "22321-4"})
-        elif code.startswith("HCV_AB"):
-            analytes.append({"code": code, "value": "nonreactive", "loinc": "13955-0"})
-        else:
-            analytes.append({"code": code, "value": "unknown", "loinc": ""})
-    interpretation = "See individual analytes. Follow guideline-based retesting windows if recent exposure."
-    return {"analytes": analytes, "interpretation": interpretation}
+    analytes = [dict(a) for code in panel_codes for a in _panel_template(code)]
+    return {"analytes": analytes, "interpretation": _INTERPRETATION}
 
 
 @app.command()
@@ -102,44 +148,211 @@ def simulate_result(order_id: str = typer.Option(..., help="Order to complete"))
     """
     Simulate a lab result for a given order. Updates order status and writes a DiagnosticReport-like JSON.
     """
-    _ensure_dirs()
-    p = ORDERS_DIR / f"{order_id}.json"
-    if not p.exists():
-        raise typer.BadParameter("Order not found")
-    order = json.loads(p.read_text(encoding="utf-8"))
+    with _open_store() as store:
+        order = store.get_order(order_id)
+        if order is None:
+            raise typer.BadParameter("Order not found")
 
-    result_id = f"res_{uuid.uuid4().hex[:12]}"
-    body = _demo_result_for_panels(order.get("panelCodes", []))
-    report = {
-        "resultId": result_id,
-        "orderId": order_id,
-        "createdAt": _now_iso(),
-        "report": body,
-        "status": "final",
-    }
-    rp = RESULTS_DIR / f"{result_id}.json"
-    rp.write_text(json.dumps(report, indent=2), encoding="utf-8")
-
-    order["status"] = "completed"
-    order["completedAt"] = _now_iso()
-    p.write_text(json.dumps(order, indent=2), encoding="utf-8")
+        result_id = f"res_{uuid.uuid4().hex[:12]}"
+        body = _demo_result_for_panels(order.get("panelCodes", []))
+        now = _now_iso()
+        report = {
+            "resultId": result_id,
+            "orderId": order_id,
+            "createdAt": now,
+            "report": body,
+            "status": "final",
+        }
+        store.complete_order(order_id, report, completed_at=now)
     print(f"[green]Created result {result_id} for {order_id}")
 
 
+# Turnaround-time distributions for simulate-batch, in hours after the order's createdAt
+TURNAROUND = {
+    "fixed": (1, lambda rng, h: h),
+    "uniform": (2, lambda rng, lo, hi: rng.uniform(lo, hi)),
+    "exp": (1, lambda rng, mean: rng.expovariate(1.0 / mean)),
+    "lognormal": (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma)),
+}
+
+
+def _parse_turnaround(spec: str) -> Optional[Callable[[random.Random], float]]:
+    """"now" (results stamped when simulated) or "<name>:<p1>[,<p2>]", e.g. lognormal:24,0.6."""
+    if spec == "now":
+        return None
+    name, _, args = spec.partition(":")
+    if name not in TURNAROUND:
+        raise typer.BadParameter(f"Unknown turnaround distribution {name!r}; choose now or one of {', '.join(TURNAROUND)}")
+    arity, sample = TURNAROUND[name]
+    try:
+        params = [float(a) for a in args.split(",")] if args else []
+    except ValueError as e:
+        raise typer.BadParameter(f"Turnaround parameters must be numbers, got {args!r}") from e
+    if len(params) != arity or any(p < 0 for p in params):
+        raise typer.BadParameter(f"{name} takes {arity} non-negative parameter(s), got {args!r}")
+    return lambda rng: max(0.0, sample(rng, *params))
+
+
+def _simulate_chunk(
+    orders: List[dict], turnaround: Optional[Callable[[random.Random], float]], seed: Optional[int]
+) -> Tuple[list, Dict[str, float]]:
+    """Build (order_id, result, completed_at) triples and the turnaround hours by order id for a chunk of orders."""
+    rng = random.Random(seed)
+    now = _now_iso()
+    completions, hours = [], {}
+    for order in orders:
+        if turnaround is None:
+            stamp = now
+        else:
+            h = turnaround(rng)
+            hours[order["orderId"]] = h
+            created = datetime.fromisoformat(order["createdAt"].rstrip("Z"))
+            stamp = f"{(created + timedelta(hours=h)).isoformat()}Z"
+        result = {
+            "resultId": f"res_{uuid.uuid4().hex[:12]}",
+            "orderId": order["orderId"],
+            "createdAt": stamp,
+            "report": _demo_result_for_panels(order.get("panelCodes", [])),
+            "status": "final",
+        }
+        completions.append((order["orderId"], result, stamp))
+    return completions, hours
+
+
 @app.command()
-def list_results():
-    _ensure_dirs()
-    for p in sorted(RESULTS_DIR.glob("*.json")):
-        print(p.name)
+def simulate_batch(
+    status: str = typer.Option("sent", help="Only orders with this status"),
+    user_id: Optional[str] = typer.Option(None, help="Only this user's orders"),
+    created_from: Optional[str] = typer.Option(None, help="createdAt >= this ISO timestamp"),
+    created_to: Optional[str] = typer.Option(None, help="createdAt < this ISO timestamp"),
+    max_orders: int = typer.Option(0, min=0, help="Stop after this many orders (0 = all matching)"),
+    batch_size: int = typer.Option(500, min=1, help="Orders per write transaction"),
+    workers: int = typer.Option(4, min=1, help="Threads building results; at most 2x this many batches are in flight"),
+    turnaround: str = typer.Option("now", help="Result time: now, fixed:H, uniform:A,B, exp:MEAN or lognormal:MEDIAN,SIGMA (hours)"),
+    seed: Optional[int] = typer.Option(None, help="Seed for turnaround sampling"),
+):
+    """
+    Simulate results for every order matching a filter. Batches of orders are built on a thread
+    pool while completed batches are written, one transaction per batch; reports orders/s.
+    """
+    sampler = _parse_turnaround(turnaround)
+    t0 = time.perf_counter()
+    done = scanned = 0
+    hours: List[float] = []
+    with _open_store() as store, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+
+        def drain_one() -> None:
+            nonlocal done
+            completions, h = pending.popleft().result()
+            # An overlapping run may have completed some of these first; only count what was written
+            completed = store.complete_orders(completions)
+            done += len(completed)
+            hours.extend(h[order_id] for order_id in completed if order_id in h)
+
+        cursor = None
+        while True:
+            limit = batch_size if not max_orders else min(batch_size, max_orders - scanned)
+            if limit <= 0:
+                break
+            # Completed orders drop out of a status filter, but the keyset cursor is unaffected
+            page = store.list_orders(user_id=user_id, status=status, created_from=created_from, created_to=created_to, limit=limit, cursor=cursor)
+            if not page.items:
+                break
+            scanned += len(page.items)
+            chunk_seed = None if seed is None else seed + scanned
+            pending.append(pool.submit(_simulate_chunk, page.items, sampler, chunk_seed))
+            # Bounded in-flight work: write the oldest batch before reading further
+            while len(pending) >= 2 * workers:
+                drain_one()
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        while pending:
+            drain_one()
+    elapsed = time.perf_counter() - t0
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"[green]Completed {done} of {scanned} matching orders in {elapsed:.2f}s ({rate:.0f} orders/s)")
+    if len(hours) >= 2:
+        q = statistics.quantiles(hours, n=10)
+        print(f"Turnaround hours: mean {statistics.fmean(hours):.1f}, p50 {statistics.median(hours):.1f}, p90 {q[-1]:.1f}, max {max(hours):.1f}")
+
+
+@app.command()
+def list_results(
+    order_id: Optional[str] = typer.Option(None, help="Only results for this order"),
+    user_id: Optional[str] = typer.Option(None, help="Only results for this user's orders"),
+    limit: int = typer.Option(50, min=1, help="Page size"),
+    cursor: Optional[str] = typer.Option(None, help="Resume after the cursor printed by the previous page"),
+):
+    """
+    List results oldest first, one page at a time.
+    """
+    with _open_store() as store:
+        page = store.list_results(order_id=order_id, user_id=user_id, limit=limit, cursor=cursor)
+    _print_page(page, "resultId")
 
 
 @app.command()
 def get_result(result_id: str):
-    _ensure_dirs()
-    p = RESULTS_DIR / f"{result_id}.json"
-    if not p.exists():
+    with _open_store() as store:
+        result = store.get_result(result_id)
+    if result is None:
         raise typer.BadParameter("Result not found")
-    print(json.loads(p.read_text(encoding="utf-8")))
+    print(result)
+
+
+@app.command()
+def events(
+    after: Optional[int] = typer.Option(None, help="Show events after this offset"),
+    consumer: Optional[str] = typer.Option(None, help="Resume from this consumer's committed offset and commit what is shown"),
+    types: List[str] = typer.Option([], "--type", help="Only these event types, e.g. --type order_completed (repeatable)"),
+    limit: int = typer.Option(100, min=1, help="Maximum events to show"),
+):
+    """
+    Read the order/result change feed. With --consumer, each call picks up where the last one stopped.
+    """
+    with _open_store() as store:
+        start = after if after is not None else (store.consumer_offset(consumer) if consumer else 0)
+        first = store.first_event_offset()
+        if first is not None and start + 1 < first:
+            print(f"[yellow]Events {start + 1}..{first - 1} were compacted away; resuming at {first}")
+        batch = store.read_events(start, limit=limit, types=types or None)
+        for e in batch:
+            print(f"{e.offset}  {e.type}  {e.order_id}  {e.at}  {json.dumps(e.data)}")
+        if consumer and batch:
+            store.commit_offset(consumer, batch[-1].offset)
+            print(f"[dim]{consumer} committed offset {batch[-1].offset}")
+
+
+@app.command()
+def compact_events(
+    max_events: Optional[int] = typer.Option(None, min=0, help="Also keep at most this many of the newest events"),
+):
+    """
+    Drop events that every consumer has already committed (and any beyond --max-events).
+    """
+    with _open_store() as store:
+        removed = store.compact_events(max_events=max_events)
+        first = store.first_event_offset()
+    print(f"[green]Removed {removed} events" + (f"; oldest retained offset {first}" if first is not None else "; log is empty"))
+
+
+@app.command()
+def migrate(
+    src: Path = typer.Option(DATA_ROOT, help="Directory with the legacy orders/ and results/ JSON files"),
+    db: Optional[Path] = typer.Option(None, help="SQLite file to fill (default: lab.sqlite under --data-root)"),
+):
+    """
+    Copy a JSON-tree sandbox into SQLite. Safe to re-run; the JSON files are left untouched.
+    """
+    if not (src / "orders").is_dir() and not (src / "results").is_dir():
+        raise typer.BadParameter(f"No orders/ or results/ under {src}")
+    with SqliteStore(db or _backend["root"] / DB_PATH.name) as store:
+        n_orders, n_results = migrate_json_tree(JsonTreeStore(src), store)
+        total_orders, total_results = store.counts()
+    print(f"[green]Migrated {n_orders} orders and {n_results} results into {store.path} "
+          f"({total_orders} orders, {total_results} results in total)")
 
 
 if __name__ == "__main__":
@@ -2,20 +2,24 @@ from __future__ import annotations
 
 import json
 import time
-from dataclasses import asdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Deque, Optional, Tuple
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 
 import cv2
 import numpy as np
 import typer
-from collections import deque
+from collections import Counter, defaultdict, deque
 from rich import print
 
-from aruco_scale import detect_aruco_scale
+from aruco_scale import ArucoScaleResult, detect_aruco_scale
+from frame_ring import FrameHandle, FrameRing
+from frame_store import FrameStore
 from geometry import compute_metrics
-from segmentation import segment_roi
+from motion import RoiTracker, TrackResult
+from segmentation import segment_roi_contour
 
 
 app = typer.Typer(add_completion=False)
@@ -42,6 +46,14 @@ def _stability_score(prev_gray: Optional[np.ndarray], gray: np.ndarray) -> Tuple
     return score, ok
 
 
+def _flow_stability_score(motion_px: float, frame_diag_px: float) -> Tuple[float, bool]:
+    # Tracked motion of marker and ROI points since the previous frame, relative to the frame size
+    # (about 2 px per frame at 720p counts as steady)
+    score = max(0.0, min(1.0, 1.0 - motion_px / (0.005 * frame_diag_px)))
+    ok = motion_px < 0.0015 * frame_diag_px
+    return score, ok
+
+
 def _marker_distance_score(side_px: Optional[float], frame_diag_px: float) -> Tuple[float, bool]:
     if side_px is None or side_px <= 0:
         return 0.0, False
@@ -65,168 +77,451 @@ def _roi_area_score(mask: np.ndarray) -> Tuple[float, bool]:
     return score, ok
 
 
+# Quality checks, cheapest first. A frame that fails one can't be auto-captured, so by default the
+# rest are skipped: brightness and stability are one pass over the gray image, the marker check
+# runs ArUco detection, and framing needs the full segmentation.
+CHEAP_CHECKS = ("brightness", "stability")
+HEAVY_CHECKS = ("marker", "framing")
+WEIGHTS = {"brightness": 0.25, "stability": 0.25, "distance": 0.25, "roi": 0.25}
+
+
+@dataclass
+class FrameQuality:
+    scores: Dict[str, float] = field(default_factory=dict)  # keys of WEIGHTS that were computed
+    ok: Dict[str, bool] = field(default_factory=dict)
+    scale: Optional[ArucoScaleResult] = None
+    mask: Optional[np.ndarray] = None
+    contour: Optional[np.ndarray] = None  # outline the mask was filled from, when segmented
+    propagated: bool = False  # mask carried over by the tracker rather than segmented
+    motion: Optional[TrackResult] = None
+    failed: Optional[str] = None  # first check that failed
+
+    @property
+    def score(self) -> float:
+        # Components that weren't computed count as zero
+        return sum(w * self.scores.get(k, 0.0) for k, w in WEIGHTS.items())
+
+    @property
+    def good_score(self) -> int:
+        return int(100 * self.score)
+
+    @property
+    def all_ok(self) -> bool:
+        return len(self.ok) == 5 and all(self.ok.values())
+
+
+@dataclass
+class LoopStats:
+    frames: int = 0
+    analyzed: int = 0  # frames that got the heavy checks
+    seconds: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    runs: Counter = field(default_factory=Counter)
+    failed_at: Counter = field(default_factory=Counter)
+    segmented: int = 0
+    propagated: int = 0
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - t0
+            self.runs[stage] += 1
+
+    def work_ms_per_frame(self) -> float:
+        return 1000.0 * sum(self.seconds.values()) / max(self.frames, 1)
+
+    def report(self) -> List[str]:
+        lines = [
+            f"{self.frames} frames, heavy checks on {self.analyzed} ({100.0 * self.analyzed / max(self.frames, 1):.0f}%), "
+            f"average work {self.work_ms_per_frame():.1f} ms/frame",
+            f"ROI segmented on {self.segmented} frames, propagated by tracking on {self.propagated}",
+        ]
+        for stage in ("gray", *CHEAP_CHECKS, *HEAVY_CHECKS, "render"):
+            n = self.runs[stage]
+            if n:
+                lines.append(
+                    f"  {stage:<10} {n:>6} runs  {1000.0 * self.seconds[stage] / n:7.2f} ms/run  "
+                    f"{1000.0 * self.seconds[stage] / max(self.frames, 1):7.2f} ms/frame  failed {self.failed_at[stage]}"
+                )
+        return lines
+
+
+class AnalysisPacer:
+    """
+    Decides which frames get the heavy checks. The loop may use ``budget`` of real time; each frame
+    earns that share of the time since the previous one, minus the cheap work already done on it,
+    as credit, and a heavy pass spends its measured cost. When analysis is cheap (or exits early)
+    every frame is analyzed; when it's expensive the rate drops to what the CPU can keep up with
+    instead of the camera stream falling behind.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.credit = 0.0
+        self._last: Optional[float] = None
+
+    def tick(self, now: float, overhead: float) -> None:
+        if self._last is not None:
+            earned = self.budget * (now - self._last) - overhead
+            # No saving up across idle stretches: at most one frame's worth in hand
+            self.credit = min(self.credit + earned, max(earned, 0.0))
+        self._last = now
+
+    def due(self) -> bool:
+        return self.credit >= 0.0
+
+    def spend(self, seconds: float) -> None:
+        self.credit -= seconds
+
+
+def cheap_checks(
+    q: FrameQuality, gray: np.ndarray, prev_gray: Optional[np.ndarray], stats: LoopStats, gated: bool = True,
+    tracker: Optional[RoiTracker] = None,
+) -> bool:
+    """
+    Brightness and stability; False as soon as one fails (with ``gated``). With a ``tracker``
+    that has points to follow, stability is the tracked motion of the marker and ROI instead of
+    the whole-frame difference.
+    """
+    with stats.timed("brightness"):
+        q.scores["brightness"], q.ok["brightness"] = _brightness_score(gray)
+    if gated and not q.ok["brightness"]:
+        if tracker is not None:
+            # The tracker has to see every frame; start again once the light is back
+            tracker.clear()
+        q.failed = "brightness"
+        return False
+    with stats.timed("stability"):
+        motion_px = None
+        if tracker is not None and tracker.active:
+            q.motion = tracker.track(gray)
+            motion_px = q.motion.motion_px
+        if motion_px is not None:
+            q.scores["stability"], q.ok["stability"] = _flow_stability_score(motion_px, float(np.hypot(*gray.shape)))
+        else:
+            q.scores["stability"], q.ok["stability"] = _stability_score(prev_gray, gray)
+    if gated and not q.ok["stability"]:
+        q.failed = "stability"
+        return False
+    return True
+
+
+def heavy_checks(
+    q: FrameQuality, frame: np.ndarray, gray: np.ndarray, marker_mm: float, diag: float, stats: LoopStats,
+    gated: bool = True, tracker: Optional[RoiTracker] = None,
+) -> bool:
+    """
+    Marker detection and distance, then segmentation and framing; stops at the first failure (with
+    ``gated``). With a ``tracker`` that is confident in its propagated ROI, that mask stands in for
+    segmentation; otherwise the frame is segmented and the tracker re-seeded from it. ``tracker``
+    must already have tracked into this frame (cheap_checks does that).
+    """
+    with stats.timed("marker"):
+        q.scale = detect_aruco_scale(frame, marker_length_mm=marker_mm, draw_debug=False, gray=gray)
+        q.scores["distance"], q.ok["distance"] = _marker_distance_score(q.scale.mean_marker_side_px, diag)
+        q.ok["marker"] = q.scale.detected_markers > 0
+        if tracker is not None and tracker.active:
+            tracker.set_markers(q.scale.corners)
+    if gated and not (q.ok["marker"] and q.ok["distance"]):
+        q.failed = "marker"
+        return False
+    with stats.timed("framing"):
+        if tracker is not None and tracker.confident:
+            q.mask = tracker.mask(gray.shape)
+            q.propagated = True
+            stats.propagated += 1
+        else:
+            q.mask, q.contour, _ = segment_roi_contour(frame)
+            stats.segmented += 1
+            if tracker is not None:
+                # A centerline carried so far stays valid if tracking held up to this frame
+                tracker.reset(gray, q.mask, q.scale.corners, centerline=tracker.centerline if tracker.tracking else None)
+        q.scores["roi"], q.ok["roi"] = _roi_area_score(q.mask)
+    if gated and not q.ok["roi"]:
+        q.failed = "framing"
+        return False
+    return True
+
+
+def _follow(points_xy: np.ndarray, transforms: List[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+    """Apply frame-to-frame 2x3 transforms in order; None if the chain is broken."""
+    for m in transforms:
+        if m is None:
+            return None
+        points_xy = cv2.transform(points_xy.reshape(-1, 1, 2), m).reshape(-1, 2)
+    return points_xy
+
+
+def _grab(cap: cv2.VideoCapture, ring: FrameRing) -> Optional[FrameHandle]:
+    """Decode the next camera frame straight into a free ring slot; None when the stream ends."""
+    slot = ring.claim()
+    if slot is None:
+        raise RuntimeError(f"All {ring.slots} frame slots are still referenced; a handle was not released")
+    buf = ring.buffer(slot)
+    ok, out = cap.read(buf)
+    if not ok:
+        ring.abandon(slot)
+        return None
+    if not np.may_share_memory(out, buf):
+        # The backend allocated its own image (size or type differs from the slot)
+        if out.shape != buf.shape:
+            ring.abandon(slot)
+            raise RuntimeError(f"Camera frame size changed from {buf.shape} to {out.shape}")
+        np.copyto(buf, out)
+    return ring.publish(slot)
+
+
 @app.command()
 def live(
     marker_mm: float = typer.Option(20.0, help="Calibration marker side length in millimeters"),
     burst_frames: int = typer.Option(6, min=3, max=12, help="Frames to capture in a burst"),
     threshold: int = typer.Option(85, help="Good shot score threshold (0-100)"),
-    consecutive: int = typer.Option(10, help="Consecutive frames above threshold before capture"),
+    consecutive: int = typer.Option(10, help="Consecutive analyzed frames above threshold before capture"),
     camera_index: int = typer.Option(0, help="OpenCV camera index"),
     out_dir: Path = typer.Option(Path("captures"), help="Output directory for captures and results"),
+    store: Optional[Path] = typer.Option(None, help="Also append frame, mask and centerline to this frame store"),
+    gate: bool = typer.Option(True, "--gate/--no-gate", help="Skip the remaining checks once a cheaper one fails"),
+    cpu_budget: float = typer.Option(0.8, min=0.05, max=1.0, help="Share of real time the loop may spend on analysis"),
+    track: bool = typer.Option(True, "--track/--no-track", help="Optical-flow stability and ROI propagation between segmentations"),
 ):
     """
     Live capture with overlays and auto-capture based on quality thresholds.
     Saves a burst of frames and analyzes the best frame to produce overlay and JSON metrics.
+    Checks run cheapest first and stop at the first failure; marker detection and segmentation
+    run on as many frames as --cpu-budget allows. With --track, stability is measured by optical
+    flow on the marker and ROI, and the segmented ROI is propagated until tracking confidence drops.
+    Per-stage timings are printed on exit.
     """
     out_dir.mkdir(parents=True, exist_ok=True)
+    frame_store = FrameStore(store) if store is not None else None
     cap = cv2.VideoCapture(camera_index)
     if not cap.isOpened():
         raise RuntimeError("Could not open camera")
 
+    # The first frame fixes the frame size; every later frame is decoded into a preallocated slot
+    # of a shared-memory ring and read through zero-copy views. Slots: the live frame, a burst,
+    # and headroom for handing frames to another stage.
+    ok, first = cap.read()
+    if not ok:
+        cap.release()
+        raise RuntimeError("Could not read from camera")
+    ring = FrameRing(burst_frames + 4, first.shape)
+    h, w = first.shape[:2]
+    diag = float(np.hypot(h, w))
+    # Per-frame working images, reused across iterations
+    display = np.empty_like(first)
+    blend = np.empty_like(first)
+    green = np.zeros_like(first)
+    green[:] = (0, 255, 0)
+    gray, prev_gray_buf, burst_gray = (np.empty((h, w), dtype=np.uint8) for _ in range(3))
+    del first
+
     prev_gray: Optional[np.ndarray] = None
+    stats, burst_stats = LoopStats(), LoopStats()
+    pacer = AnalysisPacer(cpu_budget)
+    tracker = RoiTracker() if track else None
+    overhead = 0.0
+    shown = FrameQuality()
     above_counter = 0
     font = cv2.FONT_HERSHEY_SIMPLEX
     last_capture_time = 0.0
+    frame = best_frame = None
+    burst: list = []
 
     print("[bold]Starting live view. Press 'q' to quit.[/bold]")
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            break
-
-        display = frame.copy()
-        h, w = display.shape[:2]
-        diag = float(np.hypot(h, w))
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-        # Scale detection
-        scale = detect_aruco_scale(frame, marker_length_mm=marker_mm)
-        px_per_mm = scale.pixels_per_mm
-        mean_side_px = scale.mean_marker_side_px
-
-        # Segmentation (placeholder)
-        mask, seg_debug = segment_roi(frame)
-
-        # Quality components
-        b_score, b_ok = _brightness_score(gray)
-        s_score, s_ok = _stability_score(prev_gray, gray)
-        d_score, d_ok = _marker_distance_score(mean_side_px, diag)
-        r_score, r_ok = _roi_area_score(mask)
-
-        comps = [b_score, s_score, d_score, r_score]
-        weights = [0.25, 0.25, 0.25, 0.25]
-        good_score = int(100 * sum(w * c for w, c in zip(weights, comps)))
-        all_ok = b_ok and s_ok and d_ok and r_ok and (scale.detected_markers > 0)
-
-        # Draw overlays
-        # Blend segmentation mask
-        overlay = display.copy()
-        overlay[mask > 0] = (0, 255, 0)
-        display = cv2.addWeighted(display, 0.7, overlay, 0.3, 0)
-        # Draw ArUco markers
-        display = scale.debug_image_bgr
-
-        # HUD text
-        y0 = 24
-        dy = 22
-        hud = [
-            f"Good score: {good_score}",
-            f"Lighting: {'OK' if b_ok else 'Fix'}",
-            f"Stability: {'OK' if s_ok else 'Hold steady'}",
-            f"Marker: {'OK' if scale.detected_markers>0 else 'Show card'}",
-            f"Distance: {'OK' if d_ok else 'Adjust'}",
-            f"Framing: {'OK' if r_ok else 'Reframe'}",
-        ]
-        for i, t in enumerate(hud):
-            cv2.putText(display, t, (10, y0 + i * dy), font, 0.6, (0, 255, 0), 2, cv2.LINE_AA)
-
-        # Auto-capture logic
-        if all_ok and good_score >= threshold:
-            above_counter += 1
-        else:
-            above_counter = 0
-
-        cv2.putText(
-            display,
-            f"Hold steady... {above_counter}/{consecutive}",
-            (10, h - 20),
-            font,
-            0.7,
-            (0, 255, 255) if above_counter < consecutive else (0, 165, 255),
-            2,
-            cv2.LINE_AA,
-        )
-
-        now = time.time()
-        if above_counter >= consecutive and now - last_capture_time > 2.0:
-            last_capture_time = now
-            # Capture burst
-            frames = []
-            qualities = []
-            for _ in range(burst_frames):
-                ok2, f2 = cap.read()
-                if not ok2:
-                    break
-                g2 = cv2.cvtColor(f2, cv2.COLOR_BGR2GRAY)
-                b2, _ = _brightness_score(g2)
-                s2, _ = _stability_score(gray, g2)
-                mask2, _ = segment_roi(f2)
-                r2, _ = _roi_area_score(mask2)
-                scale2 = detect_aruco_scale(f2, marker_length_mm=marker_mm)
-                d2, _ = _marker_distance_score(scale2.mean_marker_side_px, diag)
-                score2 = sum(w * s for w, s in zip(weights, [b2, s2, d2, r2]))
-                frames.append((f2, scale2, mask2))
-                qualities.append(score2)
-                time.sleep(0.03)
-
-            if frames:
-                best_idx = int(np.argmax(qualities))
-                best_frame, best_scale, best_mask = frames[best_idx]
-                # Analyze best frame
-                m, geom_debug, path = compute_metrics(best_mask, best_scale.pixels_per_mm)
-                result_overlay = best_frame.copy()
-                gh, gw = geom_debug.shape[:2]
-                result_overlay[0:gh, 0:gw] = geom_debug
-                # Annotations
-                y = 28
-                for t in [
-                    f"px/mm: {best_scale.pixels_per_mm:.3f}" if best_scale.pixels_per_mm else "px/mm: N/A",
-                    f"Arc length (mm): {m.arc_length_mm:.1f}",
-                    f"Straight length (mm): {m.length_mm:.1f}",
-                    f"Max curvature (deg): {m.max_curvature_deg:.1f}",
-                    f"Hinge loc (0-1): {m.hinge_location_ratio:.2f}",
-                ]:
-                    cv2.putText(result_overlay, t, (10, y), font, 0.7, (0, 255, 0), 2, cv2.LINE_AA)
-                    y += 26
-
-                ts = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
-                out_img = out_dir / f"capture_{ts}.png"
-                out_json = out_dir / f"metrics_{ts}.json"
-                cv2.imwrite(str(out_img), result_overlay)
-                with open(out_json, "w", encoding="utf-8") as f:
-                    json.dump(
-                        {
-                            "pixels_per_mm": best_scale.pixels_per_mm,
-                            "detected_markers": best_scale.detected_markers,
-                            "metrics": asdict(m),
-                        },
-                        f,
-                        indent=2,
-                    )
-
+    try:
+        while True:
+            handle = _grab(cap, ring)
+            if handle is None:
+                break
+            frame = ring.view(handle)
+
+            t_frame = time.perf_counter()
+            stats.frames += 1
+            with stats.timed("gray"):
+                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+
+            # Cheap checks on every frame; the heavy ones only if those pass and the pacer has time
+            q = FrameQuality()
+            pacer.tick(t_frame, overhead)
+            analyzed = False
+            heavy_s = 0.0
+            if cheap_checks(q, gray, prev_gray, stats, gated=gate, tracker=tracker) and pacer.due():
+                t0 = time.perf_counter()
+                heavy_checks(q, frame, gray, marker_mm, diag, stats, gated=gate, tracker=tracker)
+                heavy_s = time.perf_counter() - t0
+                pacer.spend(heavy_s)
+                stats.analyzed += 1
+                analyzed = True
+            if q.failed is not None:
+                stats.failed_at[q.failed] += 1
+
+            # Auto-capture logic: counts consecutive analyzed frames that pass; any failed check resets
+            if q.failed is not None:
                 above_counter = 0
-                cv2.putText(display, "Captured!", (w - 160, 30), font, 1.0, (0, 200, 0), 2, cv2.LINE_AA)
-                print(f"[green]Saved {out_img} and {out_json}")
-
-        prev_gray = gray
-
-        cv2.imshow("Live Capture (press q to quit)", display)
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+            elif analyzed:
+                above_counter = above_counter + 1 if q.all_ok and q.good_score >= threshold else 0
+
+            # The HUD shows each check's latest result. Overlays come from the latest heavy pass and
+            # are cleared when a cheap check stops analysis.
+            shown.scores.update(q.scores)
+            shown.ok.update(q.ok)
+            if analyzed or q.failed in CHEAP_CHECKS:
+                shown.scale, shown.mask = q.scale, q.mask
+
+            with stats.timed("render"):
+                np.copyto(display, frame)
+                # Draw overlays
+                # Blend segmentation mask: 70/30 with green inside the mask, frame untouched outside
+                if shown.mask is not None:
+                    cv2.addWeighted(display, 0.7, green, 0.3, 0, dst=blend)
+                    cv2.copyTo(blend, shown.mask, display)
+                # Draw ArUco markers
+                scale = shown.scale
+                if scale is not None and scale.detected_markers > 0:
+                    cv2.aruco.drawDetectedMarkers(display, scale.corners, scale.ids)
+                # Centerline of the last capture, while the tracker can still place it
+                if tracker is not None and tracker.centerline is not None and tracker.tracking:
+                    cv2.polylines(display, [np.round(tracker.centerline).astype(np.int32)], False, (0, 0, 255), 2, cv2.LINE_AA)
+
+                # HUD text
+                y0 = 24
+                dy = 22
+                passed = shown.ok
+                hud = [
+                    f"Good score: {shown.good_score}",
+                    f"Lighting: {'OK' if passed.get('brightness') else 'Fix'}",
+                    f"Stability: {'OK' if passed.get('stability') else 'Hold steady'}",
+                    f"Marker: {'OK' if passed.get('marker') else 'Show card'}",
+                    f"Distance: {'OK' if passed.get('distance') else 'Adjust'}",
+                    f"Framing: {'OK' if passed.get('roi') else 'Reframe'}",
+                    f"px/mm: {scale.pixels_per_mm:.3f}" if scale is not None and scale.pixels_per_mm else "px/mm: N/A",
+                    f"Analyzed {100.0 * stats.analyzed / stats.frames:.0f}% of frames, {stats.work_ms_per_frame():.1f} ms/frame",
+                ]
+                for i, t in enumerate(hud):
+                    cv2.putText(display, t, (10, y0 + i * dy), font, 0.6, (0, 255, 0), 2, cv2.LINE_AA)
+
+                cv2.putText(
+                    display,
+                    f"Hold steady... {above_counter}/{consecutive}",
+                    (10, h - 20),
+                    font,
+                    0.7,
+                    (0, 255, 255) if above_counter < consecutive else (0, 165, 255),
+                    2,
+                    cv2.LINE_AA,
+                )
+            # Work on this frame besides the heavy checks, charged against the pacer's next credit
+            overhead = time.perf_counter() - t_frame - heavy_s
+
+            now = time.time()
+            if above_counter >= consecutive and now - last_capture_time > 2.0:
+                last_capture_time = now
+                # Capture burst; each frame stays in its ring slot until the best one is saved
+                burst = []
+                qualities = []
+                for _ in range(burst_frames):
+                    h2 = _grab(cap, ring)
+                    if h2 is None:
+                        break
+                    f2 = ring.view(h2)
+                    cv2.cvtColor(f2, cv2.COLOR_BGR2GRAY, dst=burst_gray)
+                    # Every check on every burst frame: the best one is picked by overall score
+                    bq = FrameQuality()
+                    burst_stats.frames += 1
+                    burst_stats.analyzed += 1
+                    cheap_checks(bq, burst_gray, gray, burst_stats, gated=False, tracker=tracker)
+                    heavy_checks(bq, f2, burst_gray, marker_mm, diag, burst_stats, gated=False, tracker=tracker)
+                    burst.append((h2, bq))
+                    qualities.append(bq.score)
+                    time.sleep(0.03)
+                f2 = None
+
+                if burst:
+                    best_idx = int(np.argmax(qualities))
+                    best_handle, best_q = burst[best_idx]
+                    best_frame, best_scale = ring.view(best_handle), best_q.scale
+                    best_mask, best_contour = best_q.mask, best_q.contour
+                    if best_q.propagated:
+                        # Tracking is good enough to score frames, but metrics need the real outline
+                        best_mask, best_contour, _ = segment_roi_contour(best_frame)
+                    # Analyze best frame
+                    m, geom_debug, path = compute_metrics(best_mask, best_scale.pixels_per_mm, contour=best_contour)
+                    result_overlay = best_frame.copy()
+                    gh, gw = geom_debug.shape[:2]
+                    result_overlay[0:gh, 0:gw] = geom_debug
+                    # Annotations
+                    y = 28
+                    for t in [
+                        f"px/mm: {best_scale.pixels_per_mm:.3f}" if best_scale.pixels_per_mm else "px/mm: N/A",
+                        f"Arc length (mm): {m.arc_length_mm:.1f}",
+                        f"Straight length (mm): {m.length_mm:.1f}",
+                        f"Max curvature (deg): {m.max_curvature_deg:.1f}",
+                        f"Hinge loc (0-1): {m.hinge_location_ratio:.2f}",
+                    ]:
+                        cv2.putText(result_overlay, t, (10, y), font, 0.7, (0, 255, 0), 2, cv2.LINE_AA)
+                        y += 26
+
+                    ts = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+                    out_img = out_dir / f"capture_{ts}.png"
+                    out_json = out_dir / f"metrics_{ts}.json"
+                    result = {
+                        "pixels_per_mm": best_scale.pixels_per_mm,
+                        "detected_markers": best_scale.detected_markers,
+                        "metrics": asdict(m),
+                    }
+                    cv2.imwrite(str(out_img), result_overlay)
+                    with open(out_json, "w", encoding="utf-8") as f:
+                        json.dump(result, f, indent=2)
+                    if frame_store is not None:
+                        frame_store.put(
+                            f"capture_{ts}",
+                            meta=result,
+                            frame=best_frame,
+                            mask=best_mask,
+                            centerline=np.asarray(path, dtype=np.float32).reshape(-1, 2),
+                        )
+                    best_frame = None
+                    if tracker is not None:
+                        # Carry the measured centerline to the newest frame, so the live view can
+                        # keep showing it for as long as tracking holds
+                        tracker.set_centerline(_follow(
+                            np.asarray(path, dtype=np.float32).reshape(-1, 2)[:, ::-1],
+                            [bq.motion.transform if bq.motion else None for _, bq in burst[best_idx + 1:]],
+                        ))
+
+                    above_counter = 0
+                    cv2.putText(display, "Captured!", (w - 160, 30), font, 1.0, (0, 200, 0), 2, cv2.LINE_AA)
+                    print(f"[green]Saved {out_img} and {out_json}")
+
+                for h2, _ in burst:
+                    ring.release(h2)
+                burst = []
+
+            # Keep this frame's gray for the next stability check; the two buffers swap roles
+            prev_gray, gray = gray, (prev_gray if prev_gray is not None else prev_gray_buf)
+            frame = None
+            ring.release(handle)
+
+            cv2.imshow("Live Capture (press q to quit)", display)
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                break
+    finally:
+        # Views into the ring must be dropped before its memory can be unmapped
+        frame = best_frame = f2 = burst = None
+        ring.close()
+        cap.release()
+        cv2.destroyAllWindows()
+    for line in stats.report():
+        print(line)
+    if burst_stats.frames:
+        # Burst frames get every check, ungated, on top of the loop's own work
+        print("Capture bursts:")
+        for line in burst_stats.report():
+            print(f"  {line}")
 
 
 if __name__ == "__main__":
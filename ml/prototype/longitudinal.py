@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# Longitudinal view of one subject's captures: every metrics record loaded once into columnar
+# float64 arrays, then trends, rolling means and change points computed over whole columns.
+#
+# Sources:
+#   a directory of live_capture / analyze_capture outputs (metrics_<UTC timestamp>.json files)
+#   a frame store (frame_store.py) whose entries carry {"metrics": ...} in their meta
+#
+# Capture times come from the timestamp live_capture puts in file names and store keys
+# (20250101T120000123456Z). Sources without one are ordered by capture index instead.
+
+
+METRIC_COLUMNS = ("arc_length_mm", "max_curvature_deg", "length_mm", "hinge_location_ratio")
+TREND_COLUMNS = ("arc_length_mm", "max_curvature_deg")
+
+_TS_RE = re.compile(r"(\d{8}T\d{6})(\d{0,6})Z")
+
+
+@dataclass
+class CaptureSeries:
+    names: List[str]
+    times: Optional[np.ndarray]  # datetime64[us], sorted; None when the source has no timestamps
+    columns: Dict[str, np.ndarray]
+    pixels_per_mm: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def days(self) -> np.ndarray:
+        """Capture time in days since the first capture (capture index when there are no times)."""
+        if self.times is None:
+            return np.arange(len(self), dtype=np.float64)
+        return (self.times - self.times[0]).astype("timedelta64[us]").astype(np.float64) / 86_400e6
+
+
+@dataclass
+class Trend:
+    column: str
+    n: int
+    mean: float
+    std: float
+    first: float
+    last: float
+    slope_per_30d: float  # least-squares slope, per 30 days (per 30 captures without times)
+    rolling: np.ndarray  # trailing rolling mean, NaN until the window fills
+    change_points: np.ndarray  # capture indices where the level shifts
+    shifts: np.ndarray  # mean after minus mean before, at each change point
+
+
+def _timestamp(name: str) -> Optional[str]:
+    m = _TS_RE.search(name)
+    if m is None:
+        return None
+    d, frac = m.group(1), m.group(2).ljust(6, "0")
+    return f"{d[0:4]}-{d[4:6]}-{d[6:8]}T{d[9:11]}:{d[11:13]}:{d[13:15]}.{frac}"
+
+
+def _build(names: List[str], records: List[dict]) -> CaptureSeries:
+    n = len(records)
+    columns = {c: np.full(n, np.nan) for c in METRIC_COLUMNS}
+    ppm = np.full(n, np.nan)
+    for i, rec in enumerate(records):
+        metrics = rec.get("metrics") or {}
+        for c, col in columns.items():
+            v = metrics.get(c)
+            if v is not None:
+                col[i] = v
+        if rec.get("pixels_per_mm") is not None:
+            ppm[i] = rec["pixels_per_mm"]
+
+    stamps = [_timestamp(name) for name in names]
+    times = None
+    if n and all(s is not None for s in stamps):
+        try:
+            times = np.array(stamps, dtype="datetime64[us]")
+        except ValueError:
+            # Something timestamp-shaped that isn't a real date; fall back to capture order
+            return CaptureSeries(names, None, columns, ppm)
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        names = [names[i] for i in order]
+        columns = {c: col[order] for c, col in columns.items()}
+        ppm = ppm[order]
+    return CaptureSeries(names, times, columns, ppm)
+
+
+def load_directory(directory: Path) -> CaptureSeries:
+    """All metrics_*.json files in ``directory`` (not recursive)."""
+    # scandir + open: Path.glob and read_bytes cost as much as parsing across 10k small files
+    files = sorted(e.name for e in os.scandir(directory) if e.name.startswith("metrics_") and e.name.endswith(".json"))
+    records = []
+    for name in files:
+        with open(os.path.join(directory, name), "rb") as f:
+            records.append(json.loads(f.read()))
+    return _build([name[:-5] for name in files], records)
+
+
+def load_store(store_dir: Path) -> CaptureSeries:
+    """Entries of a frame store that have metrics in their meta, in insertion order."""
+    from frame_store import FrameStore
+
+    fs = FrameStore(store_dir, readonly=True)
+    names, records = [], []
+    for key in fs.keys():
+        meta = fs.meta(key)
+        if meta.get("metrics"):
+            names.append(key)
+            records.append(meta)
+    return _build(names, records)
+
+
+def load_captures(source: Path) -> CaptureSeries:
+    """A frame store (directory with index.jsonl) or a directory of metrics JSON files."""
+    from frame_store import INDEX_NAME
+
+    if (Path(source) / INDEX_NAME).exists():
+        return load_store(source)
+    return load_directory(source)
+
+
+def _window_sums(x: np.ndarray, w: int) -> np.ndarray:
+    """Sum over every length-``w`` window of ``x`` (len(x) - w + 1 values)."""
+    c = np.concatenate(([0.0], np.cumsum(x)))
+    return c[w:] - c[:-w]
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over ``window`` captures, ignoring NaNs; NaN until ``window`` captures exist."""
+    out = np.full(len(x), np.nan)
+    if window < 1 or len(x) < window:
+        return out
+    valid = ~np.isnan(x)
+    sums = _window_sums(np.where(valid, x, 0.0), window)
+    counts = _window_sums(valid.astype(np.float64), window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[window - 1:] = np.where(counts > 0, sums / counts, np.nan)
+    return out
+
+
+def change_points(x: np.ndarray, window: int, threshold: float = 5.0) -> tuple:
+    """
+    Level shifts: at each index i, compare the mean of the ``window`` captures from i on with
+    the mean of the ``window`` before it, scaled by their pooled standard error. Indices whose
+    score exceeds ``threshold`` and is the largest within ``window`` either side are flagged.
+    Returns (indices, shifts). NaNs are treated as the series median.
+    """
+    n = len(x)
+    if n < 2 * window or window < 2 or np.isnan(x).all():
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    x = np.where(np.isnan(x), np.nanmedian(x), x)
+    s1 = _window_sums(x, window)
+    s2 = _window_sums(x * x, window)
+    mean = s1 / window
+    var = np.maximum(s2 / window - mean * mean, 0.0)
+    # Window k covers [k, k + window); the split at i compares window i - window with window i
+    before, after = slice(0, n - 2 * window + 1), slice(window, n - window + 1)
+    shift = mean[after] - mean[before]
+    # Floor the noise so perfectly flat stretches don't turn rounding into infinite scores
+    se = np.sqrt((var[before] + var[after]) / window + (1e-6 * (1.0 + np.abs(mean[before]))) ** 2)
+    score = np.abs(shift) / se
+    # Non-maximum suppression: keep i only if its score is the window-wide maximum around it
+    padded = np.pad(score, window, constant_values=-np.inf)
+    local_max = np.lib.stride_tricks.sliding_window_view(padded, 2 * window + 1).max(axis=1)
+    keep = np.flatnonzero((score > threshold) & (score >= local_max))
+    return keep + window, shift[keep]
+
+
+def trend(series: CaptureSeries, column: str, window: int = 7, cp_window: int = 20, threshold: float = 5.0) -> Trend:
+    x = series.columns[column]
+    t = series.days()
+    valid = ~np.isnan(x)
+    xv, tv = x[valid], t[valid]
+    slope, intercept = 0.0, float(xv.mean()) if len(xv) else 0.0
+    if len(xv) >= 2 and np.ptp(tv) > 0:
+        tc = tv - tv.mean()
+        slope = float((tc * (xv - xv.mean())).sum() / (tc * tc).sum())
+        intercept = float(xv.mean() - slope * tv.mean())
+    # Shifts are found in the residuals of the linear trend, so a steady drift isn't flagged as a
+    # string of level changes
+    cps, shifts = change_points(x - (slope * t + intercept), cp_window, threshold)
+    return Trend(
+        column=column,
+        n=int(valid.sum()),
+        mean=float(xv.mean()) if len(xv) else float("nan"),
+        std=float(xv.std()) if len(xv) else float("nan"),
+        first=float(xv[0]) if len(xv) else float("nan"),
+        last=float(xv[-1]) if len(xv) else float("nan"),
+        slope_per_30d=slope * 30.0,
+        rolling=rolling_mean(x, window),
+        change_points=cps,
+        shifts=shifts,
+    )
+
+
+def trends(series: CaptureSeries, window: int = 7, cp_window: int = 20, threshold: float = 5.0) -> Dict[str, Trend]:
+    return {c: trend(series, c, window, cp_window, threshold) for c in TREND_COLUMNS}
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import importlib
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# Unified entry point for the prototype tools:
+#
+#     python ml/prototype/ml.py <command> [options]
+#
+# Dispatch is plain argv handling so that only the module behind <command> is imported;
+# `ml triage ...` never loads OpenCV, NumPy or reportlab. Each command module defers its
+# own heavy imports to the code paths that need them, so `--help` stays cheap too.
+
+
+# command -> (module, typer app attribute, summary)
+COMMANDS: Dict[str, Tuple[str, str, str]] = {
+    "analyze": ("analyze_capture", "app", "Analyze a capture image (scale, segmentation, metrics)"),
+    "live": ("live_capture", "app", "Live camera capture with quality gating"),
+    "report": ("report_pdf", "app", "Render a clinician-style PDF report"),
+    "card": ("calibration_card", "app", "Generate a printable calibration card PDF"),
+    "triage": ("triage_cli", "app", "Run the STD triage rule engine"),
+    "triage-bulk": ("triage_bulk", "app", "Re-run triage for every user in a JSONL/CSV/Parquet table"),
+    "lab": ("lab_stub_cli", "app", "Sandbox lab orders and results"),
+    "store": ("frame_store", "app", "Pack, inspect and batch-analyze memory-mapped capture stores"),
+    "serve": ("service", "cli", "Run the local HTTP analysis service"),
+    "batch-bench": ("batching", "app", "Benchmark micro-batched model segmentation"),
+}
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def _usage() -> str:
+    width = max(len(c) for c in COMMANDS)
+    lines = [
+        "Usage: ml.py <command> [options]",
+        "",
+        "Commands:",
+        *(f"  {name:<{width}}  {summary}" for name, (_, _, summary) in COMMANDS.items()),
+        f"  {'importtime':<{width}}  Report `python -X importtime` cost per command",
+        "",
+        "Run `ml.py <command> --help` for command options.",
+    ]
+    return "\n".join(lines)
+
+
+def import_time_ms(module: str, runs: int = 5) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Best-of-``runs`` cumulative import time of ``module`` in a fresh interpreter, plus its
+    heaviest direct (first-level) dependencies from that run.
+    """
+    best: Optional[Tuple[float, List[Tuple[str, float]]]] = None
+    here = Path(__file__).resolve().parent
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=here,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+        total = None
+        children: List[Tuple[str, float]] = []
+        pending: List[Tuple[str, float]] = []
+        for line in proc.stderr.splitlines():
+            m = _IMPORTTIME_RE.match(line)
+            if not m:
+                continue
+            cumulative_ms = int(m.group(2)) / 1000.0
+            depth = len(m.group(3)) // 2
+            # Children are printed before their parent, so collect first-level entries
+            # until the next top-level line and keep them only if that line is ``module``
+            if depth == 1:
+                pending.append((m.group(4), cumulative_ms))
+            elif depth == 0:
+                if m.group(4) == module:
+                    total, children = cumulative_ms, pending
+                pending = []
+        if total is None:
+            continue
+        if best is None or total < best[0]:
+            best = (total, sorted(children, key=lambda c: -c[1])[:3])
+    if best is None:
+        raise RuntimeError(f"No importtime data for {module}")
+    return best
+
+
+def _importtime(args: List[str]) -> int:
+    runs = 5
+    names = [a for a in args if not a.startswith("--")]
+    for a in args:
+        if a.startswith("--runs="):
+            runs = max(1, int(a.split("=", 1)[1]))
+    names = names or list(COMMANDS)
+    print(f"{'command':<12} {'module':<18} {'import ms':>10}  heaviest imports")
+    for name in names:
+        if name not in COMMANDS:
+            print(f"Unknown command: {name}", file=sys.stderr)
+            return 2
+        module = COMMANDS[name][0]
+        try:
+            total, top = import_time_ms(module, runs=runs)
+        except RuntimeError as e:
+            print(f"{name:<12} {module:<18} {'error':>10}  {e}")
+            continue
+        heavy = ", ".join(f"{n} {ms:.0f}" for n, ms in top)
+        print(f"{name:<12} {module:<18} {total:>10.1f}  {heavy}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help", "help"):
+        print(_usage())
+        return 0
+    name, rest = argv[0], argv[1:]
+    if name == "importtime":
+        return _importtime(rest)
+    if name not in COMMANDS:
+        print(f"Unknown command: {name}\n\n{_usage()}", file=sys.stderr)
+        return 2
+    module, attr, _ = COMMANDS[name]
+    app = getattr(importlib.import_module(module), attr)
+    app(args=rest, prog_name=f"ml.py {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+import cv2
+import numpy as np
+
+
+# Sparse optical-flow tracking for the live loop. Points on the ROI contour and the ArUco marker
+# corners are followed from frame to frame with pyramidal Lucas-Kanade (checked forwards and
+# backwards), which gives
+#   per-region motion   median displacement of the marker and ROI points, for stability scoring
+#   ROI propagation     a similarity transform fitted to the ROI points moves the last segmented
+#                       contour, its mask and centerline to the current frame
+# Segmentation is only needed again when the fit stops explaining the tracked points (the subject
+# moved non-rigidly, e.g. bent), too many points are lost, or the mask has been propagated for
+# ``max_age`` frames.
+#
+# Flow is computed on the frame halved (pyrDown) until it is at most ``max_width`` wide: each LK
+# pass builds image pyramids for both frames, which at full HD resolution costs more than the
+# tracking itself. Points, thresholds and motion are all in full-resolution pixels.
+
+LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+
+@dataclass
+class RegionMotion:
+    points: int  # points followed in this region
+    tracked: int  # of which passed the forward-backward check
+    median_px: float  # median displacement of the tracked points since the previous frame
+    p90_px: float
+
+
+@dataclass
+class TrackResult:
+    regions: Dict[str, RegionMotion] = field(default_factory=dict)
+    confidence: float = 0.0  # share of ROI points consistent with the fitted transform
+    transform: Optional[np.ndarray] = None  # 2x3 similarity, previous frame -> this frame
+
+    @property
+    def motion_px(self) -> Optional[float]:
+        """Largest median motion over the regions that were tracked; None if none were."""
+        moving = [r.median_px for r in self.regions.values() if r.tracked]
+        return max(moving) if moving else None
+
+
+def _contour_points(mask: np.ndarray, n: int) -> Optional[np.ndarray]:
+    """``n`` points spaced evenly along the largest external contour of ``mask``, as float32 (n, 1, 2)."""
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    if not contours:
+        return None
+    contour = max(contours, key=cv2.contourArea)
+    if len(contour) < 3:
+        return None
+    idx = np.linspace(0, len(contour), n, endpoint=False).astype(np.int64)
+    return contour[idx].astype(np.float32)
+
+
+class RoiTracker:
+    def __init__(
+        self,
+        contour_points: int = 64,
+        fb_threshold_px: float = 1.0,
+        fit_threshold_px: float = 2.0,
+        min_confidence: float = 0.7,
+        max_age: int = 30,
+        max_width: int = 640,
+    ):
+        self.contour_points = contour_points
+        self.fb_threshold_px = fb_threshold_px
+        self.fit_threshold_px = fit_threshold_px
+        self.min_confidence = min_confidence
+        self.max_age = max_age
+        self.max_width = max_width
+        self._levels = 0  # pyrDown steps from the frame to the tracking image
+        self._prev: Optional[np.ndarray] = None
+        self._roi: Optional[np.ndarray] = None  # (n, 1, 2) contour points in the current frame
+        self._marker: Optional[np.ndarray] = None
+        self.centerline: Optional[np.ndarray] = None  # (m, 2) x, y in the current frame
+        self._mask: Optional[np.ndarray] = None
+        self._mask_valid = False
+        self.age = 0  # frames since the ROI was last segmented
+        self.last: Optional[TrackResult] = None
+
+    @property
+    def active(self) -> bool:
+        """Something to track from the previous frame."""
+        return self._prev is not None and (self._roi is not None or self._marker is not None)
+
+    @property
+    def tracking(self) -> bool:
+        """The ROI is where the tracker puts it: just seeded, or the last fit explained the points."""
+        if self._roi is None:
+            return False
+        return self.last is None or (self.last.transform is not None and self.last.confidence >= self.min_confidence)
+
+    @property
+    def confident(self) -> bool:
+        """The propagated ROI can stand in for segmentation on this frame."""
+        return self.last is not None and self.tracking and self.age <= self.max_age
+
+    def reset(
+        self,
+        gray: np.ndarray,
+        mask: Optional[np.ndarray] = None,
+        marker_corners: Sequence[np.ndarray] = (),
+        centerline: Optional[np.ndarray] = None,
+    ) -> None:
+        """Start over from a segmented frame: ROI contour from ``mask``, corners from ArUco detection."""
+        self._levels = 0
+        while (gray.shape[1] >> self._levels) > self.max_width:
+            self._levels += 1
+        self._prev = self._small(gray)
+        self._roi = _contour_points(mask, self.contour_points) if mask is not None else None
+        self.set_markers(marker_corners)
+        self.centerline = None if centerline is None else np.asarray(centerline, dtype=np.float32).reshape(-1, 2)
+        self._mask = mask
+        self._mask_valid = mask is not None
+        self.age = 0
+        self.last = None
+
+    def clear(self) -> None:
+        """Forget everything, e.g. after a frame that couldn't be tracked through."""
+        self._prev = self._roi = self._marker = self.centerline = self._mask = self.last = None
+        self._mask_valid = False
+        self.age = 0
+
+    def set_markers(self, marker_corners: Sequence[np.ndarray]) -> None:
+        """Replace the tracked marker corners with a fresh detection on the current frame."""
+        pts = [np.asarray(c, dtype=np.float32).reshape(-1, 1, 2) for c in marker_corners]
+        self._marker = np.concatenate(pts) if pts else None
+
+    def set_centerline(self, centerline: Optional[np.ndarray]) -> None:
+        """Attach a centerline (x, y points on the current frame) to be carried along with the ROI."""
+        self.centerline = None if centerline is None else np.asarray(centerline, dtype=np.float32).reshape(-1, 2)
+
+    def _small(self, gray: np.ndarray) -> np.ndarray:
+        # Always a new array: callers reuse their gray buffers
+        small = gray.copy() if self._levels == 0 else cv2.pyrDown(gray)
+        for _ in range(1, self._levels):
+            small = cv2.pyrDown(small)
+        return small
+
+    def _flow(self, small: np.ndarray, pts: np.ndarray):
+        f = float(1 << self._levels)
+        p = pts / f
+        fwd, st, _ = cv2.calcOpticalFlowPyrLK(self._prev, small, p, None, **LK_PARAMS)
+        back, st_back, _ = cv2.calcOpticalFlowPyrLK(small, self._prev, fwd, None, **LK_PARAMS)
+        fb = np.linalg.norm((p - back).reshape(-1, 2), axis=1) * f
+        good = (st.ravel() == 1) & (st_back.ravel() == 1) & (fb < self.fb_threshold_px)
+        return fwd * f, good
+
+    @staticmethod
+    def _region(pts: np.ndarray, fwd: np.ndarray, good: np.ndarray) -> RegionMotion:
+        d = np.linalg.norm((fwd - pts).reshape(-1, 2)[good], axis=1)
+        return RegionMotion(
+            points=len(pts),
+            tracked=int(good.sum()),
+            median_px=float(np.median(d)) if len(d) else 0.0,
+            p90_px=float(np.percentile(d, 90)) if len(d) else 0.0,
+        )
+
+    def track(self, gray: np.ndarray) -> TrackResult:
+        """Follow the points into ``gray`` (the next frame) and move the ROI along with them."""
+        result = TrackResult()
+        small = self._small(gray)
+        # One forward and one backward pass over marker and ROI points together; each pass builds
+        # both image pyramids, so that's the bulk of the cost
+        groups = [(name, pts) for name, pts in (("marker", self._marker), ("roi", self._roi)) if pts is not None]
+        tracked = {}
+        if groups:
+            fwd_all, good_all = self._flow(small, np.concatenate([pts for _, pts in groups]))
+            start = 0
+            for name, pts in groups:
+                fwd, good = fwd_all[start:start + len(pts)], good_all[start:start + len(pts)]
+                start += len(pts)
+                result.regions[name] = self._region(pts, fwd, good)
+                tracked[name] = fwd, good
+        if self._marker is not None:
+            fwd, good = tracked["marker"]
+            # Lost corners aren't worth keeping: detection re-seeds them whenever the marker check runs
+            self._marker = fwd[good] if good.any() else None
+        if self._roi is not None:
+            fwd, good = tracked["roi"]
+            if good.sum() >= 6:
+                m, inliers = cv2.estimateAffinePartial2D(
+                    self._roi[good], fwd[good], method=cv2.RANSAC, ransacReprojThreshold=self.fit_threshold_px
+                )
+                if m is not None:
+                    result.transform = m
+                    # Against all points, so lost tracks lower confidence as much as outliers do
+                    result.confidence = float(inliers.sum()) / len(self._roi)
+            if result.transform is not None:
+                # The whole contour moves with the fit, lost points included, so it keeps its shape
+                self._roi = cv2.transform(self._roi, result.transform)
+                if self.centerline is not None:
+                    self.centerline = cv2.transform(self.centerline.reshape(-1, 1, 2), result.transform).reshape(-1, 2)
+                self._mask_valid = False
+            else:
+                result.confidence = 0.0
+        self._prev = small
+        self.age += 1
+        self.last = result
+        return result
+
+    def mask(self, shape) -> Optional[np.ndarray]:
+        """The ROI mask on the current frame: the segmented one, or the propagated contour filled."""
+        if self._roi is None:
+            return None
+        if not self._mask_valid:
+            if self._mask is None or self._mask.shape != tuple(shape):
+                self._mask = np.zeros(shape, dtype=np.uint8)
+            else:
+                # Don't scribble over a mask the caller was handed earlier
+                self._mask = np.zeros_like(self._mask)
+            cv2.fillPoly(self._mask, [np.round(self._roi).astype(np.int32)], 255)
+            self._mask_valid = True
+        return self._mask
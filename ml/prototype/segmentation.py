@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from typing import Tuple
+import json
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
 
 
-def segment_roi(image_bgr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+def segment_roi(image_bgr: np.ndarray, debug: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
     """
     Produce a binary mask for the region of interest using classical image processing.
     This is a placeholder for a learned segmentation model.
@@ -15,10 +17,23 @@ def segment_roi(image_bgr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     -------
     mask: np.ndarray (uint8)
         Binary mask with foreground=255 and background=0.
-    debug_bgr: np.ndarray
-        Debug visualization image.
+    debug_bgr: np.ndarray or None
+        Debug visualization image; None when called with debug=False.
     """
-    image = image_bgr.copy()
+    mask, _, debug_vis = segment_roi_contour(image_bgr, debug=debug)
+    return mask, debug_vis
+
+
+def segment_roi_contour(
+    image_bgr: np.ndarray, debug: bool = False
+) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    segment_roi that also returns the ROI outline it filled the mask from: (mask, contour, debug_bgr).
+    The contour keeps every boundary pixel (CHAIN_APPROX_NONE), as geometry.compute_metrics
+    expects, and is None when nothing was found.
+    """
+    # Only read from here on, so no defensive copy (the input may be a read-only frame view)
+    image = image_bgr
     h, w = image.shape[:2]
 
     # Preprocess: blur and convert to HSV for robust thresholding
@@ -45,17 +60,78 @@ def segment_roi(image_bgr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     opened = cv2.morphologyEx(closed, cv2.MORPH_OPEN, kernel, iterations=1)
 
     # Keep the largest contour as ROI
-    contours, _ = cv2.findContours(opened, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    contours, _ = cv2.findContours(opened, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
     mask = np.zeros((h, w), dtype=np.uint8)
+    largest = None
     if contours:
         largest = max(contours, key=cv2.contourArea)
         cv2.drawContours(mask, [largest], -1, 255, thickness=cv2.FILLED)
 
+    if not debug:
+        return mask, largest, None
+
     # Debug visualization
-    debug = image.copy()
-    overlay = debug.copy()
+    overlay = image.copy()
     overlay[mask > 0] = (0, 255, 0)
-    debug_vis = cv2.addWeighted(debug, 0.7, overlay, 0.3, 0)
+    debug_vis = cv2.addWeighted(image, 0.7, overlay, 0.3, 0)
 
-    return mask, debug_vis
+    return mask, largest, debug_vis
+
+
+class OnnxSegmenter:
+    """
+    Segmentation backend for models exported by ml/training/export.py.
+
+    Mirrors the training preprocessing (RGB, scaled to 0..1, longest side resized to the
+    model input and centre-padded) and maps each predicted mask back to its image's size.
+    Images of any size can share one batch because they are all letterboxed to the input shape.
+    """
+
+    def __init__(self, model_path: Path | str, input_size: int = 512, intra_op_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("onnxruntime is required for model inference: pip install onnxruntime") from e
+
+        opts = ort.SessionOptions()
+        if intra_op_threads > 0:
+            opts.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(str(model_path), sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        h, w = inp.shape[2], inp.shape[3]
+        # Dynamic spatial axes are reported as names; fall back to the export resolution recorded in
+        # the model's preprocessing metadata, then to input_size
+        meta = self.session.get_modelmeta().custom_metadata_map.get("preprocessing")
+        dh, dw = json.loads(meta).get("input_size", (input_size, input_size)) if meta else (input_size, input_size)
+        self.input_hw = (h if isinstance(h, int) else dh, w if isinstance(w, int) else dw)
+
+    def _letterbox(self, image_bgr: np.ndarray, out: np.ndarray) -> Tuple[int, int, int, int]:
+        th, tw = self.input_hw
+        h, w = image_bgr.shape[:2]
+        s = min(th / h, tw / w)
+        nh, nw = max(1, int(round(h * s))), max(1, int(round(w * s)))
+        resized = cv2.resize(image_bgr, (nw, nh), interpolation=cv2.INTER_AREA if s < 1 else cv2.INTER_LINEAR)
+        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+        top, left = (th - nh) // 2, (tw - nw) // 2
+        out[:, top:top + nh, left:left + nw] = rgb.transpose(2, 0, 1)
+        out *= 1.0 / 255.0
+        return top, left, nh, nw
+
+    def predict_masks(self, images_bgr: Sequence[np.ndarray]) -> List[np.ndarray]:
+        """Run one batched inference; returns a uint8 0/255 mask per input at its original size."""
+        th, tw = self.input_hw
+        batch = np.zeros((len(images_bgr), 3, th, tw), dtype=np.float32)
+        boxes = [self._letterbox(img, batch[i]) for i, img in enumerate(images_bgr)]
+        logits = self.session.run(None, {self.input_name: batch})[0]
+
+        masks: List[np.ndarray] = []
+        for img, (top, left, nh, nw), lg in zip(images_bgr, boxes, logits):
+            h, w = img.shape[:2]
+            crop = np.ascontiguousarray(lg[0, top:top + nh, left:left + nw])
+            full = cv2.resize(crop, (w, h), interpolation=cv2.INTER_LINEAR)
+            masks.append(np.where(full > 0, 255, 0).astype(np.uint8))
+        return masks
 
+    def segment(self, image_bgr: np.ndarray) -> np.ndarray:
+        return self.predict_masks([image_bgr])[0]
@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional
+
+import cv2
+import numpy as np
+import typer
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+from rich import print
+
+from aruco_scale import detect_aruco_scale, warm_up
+from batching import MicroBatcher
+from geometry import compute_metrics
+from segmentation import OnnxSegmenter, segment_roi, segment_roi_contour
+
+
+# Long-lived local analysis service. Images arrive as raw bytes or multipart uploads,
+# are decoded in memory inside pool workers, and never touch the filesystem.
+
+
+def _warm_worker() -> None:
+    # Runs once per worker process so the first request doesn't pay OpenCV/ArUco setup
+    warm_up()
+    segment_roi(np.full((64, 64, 3), 255, dtype=np.uint8))
+
+
+def _decode(data: bytes) -> np.ndarray:
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return image
+
+
+def _scale_result(image_bgr: np.ndarray, marker_mm: float) -> dict:
+    scale = detect_aruco_scale(image_bgr, marker_length_mm=marker_mm, draw_debug=False)
+    return {
+        "pixels_per_mm": scale.pixels_per_mm,
+        "mean_marker_side_px": scale.mean_marker_side_px,
+        "detected_markers": scale.detected_markers,
+    }
+
+
+def _analyze_image(image_bgr: np.ndarray, marker_mm: float) -> dict:
+    scale = detect_aruco_scale(image_bgr, marker_length_mm=marker_mm, draw_debug=False)
+    mask, contour, _ = segment_roi_contour(image_bgr)
+    metrics, _, path = compute_metrics(mask, pixels_per_mm=scale.pixels_per_mm, contour=contour)
+    return {
+        "pixels_per_mm": scale.pixels_per_mm,
+        "detected_markers": scale.detected_markers,
+        "metrics": asdict(metrics),
+        "centerline_points": len(path),
+    }
+
+
+def scale_job(data: bytes, marker_mm: float) -> dict:
+    return _scale_result(_decode(data), marker_mm)
+
+
+def _encode_png(mask: np.ndarray) -> bytes:
+    ok, png = cv2.imencode(".png", mask)
+    if not ok:
+        raise ValueError("Could not encode mask")
+    return png.tobytes()
+
+
+def segment_job(data: bytes) -> bytes:
+    mask, _ = segment_roi(_decode(data), debug=False)
+    return _encode_png(mask)
+
+
+def analyze_job(data: bytes, marker_mm: float) -> dict:
+    return _analyze_image(_decode(data), marker_mm)
+
+
+def analyze_batch_job(items: List[bytes], marker_mm: float) -> List[dict]:
+    # One pool round-trip for several images; a bad image fails only its own slot
+    out: List[dict] = []
+    for data in items:
+        try:
+            out.append(analyze_job(data, marker_mm))
+        except Exception as e:
+            out.append({"error": str(e)})
+    return out
+
+
+class ServiceMetrics:
+    def __init__(self, window: int = 1024):
+        self.queued = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.completed: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.latencies_ms: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def observe(self, endpoint: str, latency_ms: float, ok: bool) -> None:
+        self.latencies_ms[endpoint].append(latency_ms)
+        if ok:
+            self.completed[endpoint] += 1
+        else:
+            self.errors[endpoint] += 1
+
+    def snapshot(self) -> dict:
+        latency = {}
+        for endpoint, values in self.latencies_ms.items():
+            arr = np.fromiter(values, dtype=np.float64)
+            latency[endpoint] = {
+                "count": int(arr.size),
+                "mean_ms": float(arr.mean()),
+                "p50_ms": float(np.percentile(arr, 50)),
+                "p95_ms": float(np.percentile(arr, 95)),
+                "max_ms": float(arr.max()),
+            }
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "completed": dict(self.completed),
+            "errors": dict(self.errors),
+            "latency": latency,
+        }
+
+
+class AnalysisPool:
+    """
+    Bounded process pool. At most ``workers`` jobs run at once and at most ``max_queue``
+    more may wait; anything beyond that is rejected with 503 rather than buffered.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.metrics = ServiceMetrics()
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker)
+        self._slots = asyncio.Semaphore(workers)
+
+    async def run(self, endpoint: str, fn: Callable, *args):
+        m = self.metrics
+        if m.queued >= self.max_queue and self._slots.locked():
+            m.rejected += 1
+            raise HTTPException(status_code=503, detail="Analysis queue is full")
+        start = time.perf_counter()
+        m.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            m.queued -= 1
+        m.in_flight += 1
+        ok = False
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, fn, *args)
+            ok = True
+            return result
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            m.in_flight -= 1
+            self._slots.release()
+            m.observe(endpoint, (time.perf_counter() - start) * 1000.0, ok)
+
+    def warm(self) -> None:
+        # Start every worker now (running the initializer) instead of on first request
+        futures = [self._executor.submit(os.getpid) for _ in range(self.workers)]
+        for f in futures:
+            f.result()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def _read_images(request: Request) -> List[bytes]:
+    """Image bytes from a multipart upload (every file part) or the raw request body."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        items = [await v.read() for _, v in form.multi_items() if hasattr(v, "read")]
+    else:
+        body = await request.body()
+        items = [body] if body else []
+    if not items:
+        raise HTTPException(status_code=400, detail="No image data in request")
+    return items
+
+
+def create_app(
+    workers: int = 2,
+    max_queue: int = 32,
+    batch_size: int = 4,
+    model: Optional[Path] = None,
+    max_batch: int = 8,
+    max_wait_ms: float = 5.0,
+) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        pool = AnalysisPool(workers=workers, max_queue=max_queue)
+        await asyncio.get_running_loop().run_in_executor(None, pool.warm)
+        app.state.pool = pool
+        # With a model, /segment requests from all clients share one in-process session and are
+        # coalesced into batches; ONNX Runtime releases the GIL, so the event loop stays free.
+        app.state.batcher = None
+        if model is not None:
+            segmenter = OnnxSegmenter(model)
+            app.state.batcher = MicroBatcher(segmenter.predict_masks, max_batch_size=max_batch, max_wait_ms=max_wait_ms)
+        yield
+        if app.state.batcher is not None:
+            app.state.batcher.close()
+        pool.shutdown()
+
+    app = FastAPI(title="Capture analysis service", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    @app.get("/metrics")
+    async def metrics(request: Request):
+        snap = request.app.state.pool.metrics.snapshot()
+        snap["workers"] = workers
+        snap["max_queue"] = max_queue
+        batcher: Optional[MicroBatcher] = request.app.state.batcher
+        if batcher is not None:
+            snap["segment_batcher"] = {
+                "queue_depth": batcher.queue_depth,
+                "max_batch_size": batcher.max_batch_size,
+                "max_wait_ms": batcher.max_wait_ms,
+                **batcher.stats.as_dict(),
+            }
+        return snap
+
+    @app.post("/scale")
+    async def scale(request: Request, marker_mm: float = 20.0):
+        data = (await _read_images(request))[0]
+        return await request.app.state.pool.run("scale", scale_job, data, marker_mm)
+
+    @app.post("/segment")
+    async def segment(request: Request):
+        data = (await _read_images(request))[0]
+        batcher: Optional[MicroBatcher] = request.app.state.batcher
+        if batcher is None:
+            png = await request.app.state.pool.run("segment", segment_job, data)
+            return Response(content=png, media_type="image/png")
+        start = time.perf_counter()
+        metrics: ServiceMetrics = request.app.state.pool.metrics
+        ok = False
+        try:
+            image = await asyncio.to_thread(_decode, data)
+            mask = await asyncio.wrap_future(batcher.submit(image))
+            png = await asyncio.to_thread(_encode_png, mask)
+            ok = True
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            metrics.observe("segment", (time.perf_counter() - start) * 1000.0, ok)
+        return Response(content=png, media_type="image/png")
+
+    @app.post("/analyze")
+    async def analyze(request: Request, marker_mm: float = 20.0):
+        items = await _read_images(request)
+        pool: AnalysisPool = request.app.state.pool
+        if len(items) == 1:
+            return await pool.run("analyze", analyze_job, items[0], marker_mm)
+        # Several uploads: split into chunks so each pool task amortizes IPC over a batch. At most
+        # ``workers`` chunks of one request are in the pool at a time, so a large request takes as
+        # many queue slots as a few small ones instead of rejecting itself.
+        chunks = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        in_flight = asyncio.Semaphore(workers)
+
+        async def run_chunk(chunk: List[bytes]) -> List[dict]:
+            async with in_flight:
+                return await pool.run("analyze_batch", analyze_batch_job, chunk, marker_mm)
+
+        tasks = [asyncio.create_task(run_chunk(c)) for c in chunks]
+        try:
+            parts = await asyncio.gather(*tasks)
+        finally:
+            # One chunk failed (e.g. rejected with 503) or the client went away: the rest of the
+            # request is moot, so don't queue or keep waiting on it
+            for t in tasks:
+                t.cancel()
+        return {"results": [r for part in parts for r in part]}
+
+    return app
+
+
+cli = typer.Typer(add_completion=False)
+
+
+@cli.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", help="Bind address (local only by default)"),
+    port: int = typer.Option(8765, help="Port"),
+    workers: int = typer.Option(max(1, (os.cpu_count() or 2) - 1), min=1, help="Analysis worker processes"),
+    max_queue: int = typer.Option(32, min=0, help="Requests allowed to wait for a worker before 503"),
+    batch_size: int = typer.Option(4, min=1, help="Images per pool task for multi-image /analyze requests"),
+    model: Optional[Path] = typer.Option(None, exists=True, readable=True, help="Segmentation ONNX model for /segment"),
+    max_batch: int = typer.Option(8, min=1, help="Max images per batched model call"),
+    max_wait_ms: float = typer.Option(5.0, min=0.0, help="Max time a /segment request waits for a batch to fill"),
+):
+    """
+    Run the local analysis service (endpoints: /analyze, /scale, /segment, /metrics).
+    """
+    import uvicorn
+
+    print(f"[bold]Serving on http://{host}:{port} with {workers} workers[/bold]")
+    app = create_app(
+        workers=workers,
+        max_queue=max_queue,
+        batch_size=batch_size,
+        model=model,
+        max_batch=max_batch,
+        max_wait_ms=max_wait_ms,
+    )
+    uvicorn.run(app, host=host, port=port)
+
+
+if __name__ == "__main__":
+    cli()
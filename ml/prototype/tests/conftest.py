@@ -0,0 +1,7 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# Prototype modules use flat imports (``from geometry import ...``); make them importable.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
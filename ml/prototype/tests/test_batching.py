@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from batching import MicroBatcher
+
+
+class _Recorder:
+    """infer_batch stand-in that records batch sizes and can be held until released."""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, items):
+        self.gate.wait()
+        self.batches.append(list(items))
+        if self.fail:
+            raise ValueError("model exploded")
+        return [x * 10 for x in items]
+
+
+def test_results_go_back_to_each_caller_in_order():
+    rec = _Recorder()
+    batcher = MicroBatcher(rec, max_batch_size=4, max_wait_ms=20.0)
+    results = {}
+
+    def caller(i: int) -> None:
+        results[i] = batcher(i)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {i: i * 10 for i in range(16)}
+    assert batcher.map(list(range(9))) == [i * 10 for i in range(9)]
+    batcher.close()
+
+
+def test_batch_closes_on_size():
+    rec = _Recorder()
+    batcher = MicroBatcher(rec, max_batch_size=3, max_wait_ms=10_000.0)
+    t0 = time.perf_counter()
+    futures = [batcher.submit(i) for i in range(7)]
+    # Full batches go out without waiting for the 10 s deadline
+    assert [f.result(timeout=5) for f in futures[:6]] == [i * 10 for i in range(6)]
+    assert time.perf_counter() - t0 < 5.0
+    assert rec.batches == [[0, 1, 2], [3, 4, 5]]
+    assert not futures[6].done()
+    # The partial batch is flushed by close()
+    batcher.close()
+    assert futures[6].result(timeout=0) == 60
+    assert rec.batches[-1] == [6]
+
+
+def test_batch_closes_on_wait():
+    rec = _Recorder()
+    batcher = MicroBatcher(rec, max_batch_size=100, max_wait_ms=30.0)
+    t0 = time.perf_counter()
+    futures = [batcher.submit(i) for i in range(3)]
+    assert [f.result(timeout=5) for f in futures] == [0, 10, 20]
+    elapsed = time.perf_counter() - t0
+    assert rec.batches == [[0, 1, 2]]
+    assert 0.025 <= elapsed < 1.0
+    batcher.close()
+
+
+def test_infer_error_reaches_every_future_in_the_batch():
+    rec = _Recorder(fail=True)
+    batcher = MicroBatcher(rec, max_batch_size=4, max_wait_ms=50.0)
+    futures = [batcher.submit(i) for i in range(4)]
+    for f in futures:
+        with pytest.raises(ValueError, match="model exploded"):
+            f.result(timeout=5)
+    assert len(rec.batches) == 1
+    batcher.close()
+
+
+def test_wrong_result_count_fails_the_batch():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=2, max_wait_ms=50.0)
+    futures = [batcher.submit(i) for i in range(2)]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="1 results for 2 inputs"):
+            f.result(timeout=5)
+    batcher.close()
+
+
+def test_close_drains_queue_then_rejects_submit():
+    rec = _Recorder()
+    rec.gate.clear()
+    batcher = MicroBatcher(rec, max_batch_size=2, max_wait_ms=10_000.0)
+    futures = [batcher.submit(i) for i in range(5)]
+    closer = threading.Thread(target=batcher.close)
+    closer.start()
+    rec.gate.set()
+    closer.join(timeout=5)
+    assert not closer.is_alive()
+    assert [f.result(timeout=0) for f in futures] == [i * 10 for i in range(5)]
+    with pytest.raises(RuntimeError, match="closed"):
+        batcher.submit(5)
+    batcher.close()  # idempotent
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import numpy as np
+
+from frame_store import FrameStore
+
+
+def test_empty_array_in_fresh_chunk(tmp_path):
+    fs = FrameStore(tmp_path / "s")
+    fs.put("a", centerline=np.zeros((0, 2), dtype=np.float32))
+    fs.put("b", mask=np.ones((4, 4), dtype=np.uint8))
+
+    reopened = FrameStore(tmp_path / "s", readonly=True)
+    empty = reopened.get("a", "centerline")
+    assert empty.shape == (0, 2) and empty.dtype == np.float32
+    assert (reopened.get("b", "mask") == 1).all()
+
+
+def test_compact_keeps_latest_and_survives_interrupted_run(tmp_path):
+    root = tmp_path / "s"
+    fs = FrameStore(root, chunk_bytes=256)
+    for i in range(4):
+        fs.put(f"k{i}", meta={"i": i}, frame=np.full((8, 8), i, dtype=np.uint8))
+    fs.put("k1", frame=np.full((8, 8), 9, dtype=np.uint8))
+    # Debris from a compaction that died before swapping anything in
+    (tmp_path / "s.compact").mkdir()
+    (tmp_path / "s.compact" / "chunk_00000.bin").write_bytes(b"junk")
+
+    fs.compact()
+
+    for store in (fs, FrameStore(root, readonly=True)):
+        assert store.keys() == ["k0", "k1", "k2", "k3"]
+        assert (store.get("k1", "frame") == 9).all()
+        assert (store.get("k3", "frame") == 3).all()
+        assert store.meta("k2") == {"i": 2}
+    assert not (tmp_path / "s.compact").exists()
+    assert not (root / "index.jsonl.tmp").exists()
+    fs.put("k4", frame=np.zeros((8, 8), dtype=np.uint8))
+    assert len(FrameStore(root, readonly=True)) == 5
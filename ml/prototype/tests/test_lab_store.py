@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from lab_store import JsonTreeStore, SqliteStore, migrate_json_tree
+
+
+@pytest.fixture(params=["sqlite", "json-tree"])
+def store(request, tmp_path):
+    s = SqliteStore(tmp_path / "lab.db") if request.param == "sqlite" else JsonTreeStore(tmp_path / "tree")
+    yield s
+    s.close()
+
+
+def _order(i: int, user: str = "u1", status: str = "sent") -> dict:
+    # Shared createdAt for pairs of orders, so paging has to break ties on the id
+    return {"orderId": f"o{i:03d}", "userId": user, "status": status, "createdAt": f"2025-01-{1 + i // 2:02d}T00:00:00Z"}
+
+
+def _result(i: int) -> dict:
+    return {"resultId": f"r{i:03d}", "orderId": f"o{i:03d}", "status": "final", "createdAt": f"2025-02-{1 + i // 2:02d}T00:00:00Z"}
+
+
+def test_list_orders_pages_in_key_order(store):
+    for i in reversed(range(11)):
+        store.put_order(_order(i, user="u1" if i % 3 else "u2"))
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = store.list_orders(limit=4, cursor=cursor)
+        seen.extend(o["orderId"] for o in page.items)
+        pages += 1
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert seen == [f"o{i:03d}" for i in range(11)]
+    assert pages == 3
+
+    first = store.list_orders(user_id="u1", limit=3)
+    rest = store.list_orders(user_id="u1", limit=10, cursor=first.next_cursor)
+    assert [o["orderId"] for o in first.items + rest.items] == [f"o{i:03d}" for i in range(11) if i % 3]
+    assert rest.next_cursor is None
+
+
+def test_complete_orders_skips_completed_and_missing(store):
+    for i in range(3):
+        store.put_order(_order(i))
+    store.complete_order("o000", _result(0), "2025-03-01T00:00:00Z")
+
+    done = store.complete_orders([
+        ("o000", {**_result(0), "resultId": "r000-again"}, "2025-03-02T00:00:00Z"),
+        ("o001", _result(1), "2025-03-02T00:00:00Z"),
+        ("missing", _result(9), "2025-03-02T00:00:00Z"),
+    ])
+    assert done == ["o001"]
+    assert store.get_order("o000")["completedAt"] == "2025-03-01T00:00:00Z"
+    assert store.get_result("r000-again") is None
+    assert store.get_order("o001")["status"] == "completed"
+    assert store.get_order("o002")["status"] == "sent"
+    assert [e.order_id for e in store.read_events(types=["order_completed"])] == ["o000", "o001"]
+
+
+def test_sqlite_completion_rolls_back_as_a_whole(tmp_path):
+    with SqliteStore(tmp_path / "lab.db") as store:
+        for i in range(3):
+            store.put_order(_order(i))
+        store.put_results([_result(2)])
+        last = store.read_events()[-1].offset
+
+        # r002 already exists, so the second insert fails and the first completion must not stick
+        with pytest.raises(sqlite3.IntegrityError):
+            store.complete_orders([("o001", _result(1), "2025-03-01T00:00:00Z"), ("o000", _result(2), "2025-03-01T00:00:00Z")])
+        with pytest.raises(sqlite3.IntegrityError):
+            store.complete_order("o000", _result(2), "2025-03-01T00:00:00Z")
+
+        assert [store.get_order(f"o{i:03d}")["status"] for i in range(3)] == ["sent"] * 3
+        assert store.get_result("r001") is None
+        assert store.read_events(after=last) == []
+        with pytest.raises(KeyError):
+            store.complete_order("missing", _result(9), "2025-03-01T00:00:00Z")
+
+
+def test_migrate_json_tree_is_idempotent(tmp_path):
+    src = JsonTreeStore(tmp_path / "tree")
+    for i in range(7):
+        src.put_order(_order(i))
+    for i in range(0, 7, 2):
+        src.complete_order(f"o{i:03d}", _result(i), "2025-03-01T00:00:00Z")
+
+    with SqliteStore(tmp_path / "lab.db") as dst:
+        assert migrate_json_tree(src, dst, batch_size=3) == (7, 4)
+        events = dst.read_events()
+        assert migrate_json_tree(src, dst, batch_size=3) == (7, 4)
+        assert dst.counts() == (7, 4)
+        # Unchanged documents and known results log nothing the second time
+        assert dst.read_events() == events
+        assert dst.list_orders(status="completed", limit=10).items == src.list_orders(status="completed", limit=10).items
+        assert dst.list_results(limit=10).items == src.list_results(limit=10).items
+
+
+def test_compaction_keeps_uncommitted_events_and_never_reuses_offsets(store):
+    for i in range(10):
+        store.put_order(_order(i))
+    offsets = [e.offset for e in store.read_events()]
+    assert offsets == sorted(offsets) and len(set(offsets)) == 10
+
+    # No consumers yet: only the size cap applies
+    assert store.compact_events() == 0
+    assert store.compact_events(max_events=8) == 2
+    assert store.first_event_offset() == offsets[2]
+
+    store.commit_offset("mailer", offsets[5])
+    store.commit_offset("audit", offsets[3])
+    store.commit_offset("audit", offsets[1])  # never moves backwards
+    assert store.consumer_offset("audit") == offsets[3]
+    assert store.compact_events() == 2  # up to the slowest consumer
+    assert store.first_event_offset() == offsets[4]
+    assert [e.offset for e in store.poll("audit")] == offsets[4:]
+    assert [e.offset for e in store.poll("mailer", types=["order_created"])] == offsets[6:]
+
+    store.commit_offset("audit", offsets[-1])
+    store.commit_offset("mailer", offsets[-1])
+    assert store.compact_events() == 6
+    assert store.read_events() == [] and store.first_event_offset() is None
+
+    store.put_order(_order(10))
+    assert [e.offset for e in store.read_events()] == [offsets[-1] + 1]
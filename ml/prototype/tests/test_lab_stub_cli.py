@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typer.testing import CliRunner
+
+from lab_store import SqliteStore
+from lab_stub_cli import DB_PATH, app
+
+
+def _run(tmp_path, *args: str) -> str:
+    result = CliRunner().invoke(app, ["--backend", "sqlite", "--data-root", str(tmp_path), *args])
+    assert result.exit_code == 0, result.output
+    return " ".join(result.output.split())
+
+
+def test_simulate_batch_reports_turnaround_only_for_orders_it_completed(tmp_path):
+    with SqliteStore(tmp_path / DB_PATH.name) as store:
+        for i in range(4):
+            store.put_order({"orderId": f"o{i}", "userId": "u1", "status": "completed" if i < 2 else "sent",
+                             "createdAt": f"2025-01-0{i + 1}T00:00:00Z", "completedAt": "2025-01-09T00:00:00Z"})
+
+    # Every listed order was completed by an earlier run: nothing written, nothing to report
+    out = _run(tmp_path, "simulate-batch", "--status", "completed", "--turnaround", "fixed:2")
+    assert "Completed 0 of 2" in out and "Turnaround" not in out
+
+    out = _run(tmp_path, "simulate-batch", "--status", "sent", "--turnaround", "uniform:1,3", "--seed", "1")
+    assert "Completed 2 of 2" in out and "Turnaround hours" in out
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import List
+
+from live_capture import AnalysisPacer
+
+FRAME_S = 1 / 30
+
+
+def _simulate(pacer: AnalysisPacer, heavy_s: List[float], overhead_s: float = 0.005) -> List[bool]:
+    """Drive the pacer the way the live loop does, with synthetic frame times and costs."""
+    analyzed = []
+    for i, cost in enumerate(heavy_s):
+        pacer.tick(i * FRAME_S, overhead_s if i else 0.0)
+        due = pacer.due()
+        if due:
+            pacer.spend(cost)
+        analyzed.append(due)
+    return analyzed
+
+
+def test_cheap_analysis_runs_on_every_frame():
+    assert all(_simulate(AnalysisPacer(0.8), [0.010] * 100))
+
+
+def test_expensive_analysis_is_paced_to_the_budget():
+    heavy = 0.060
+    analyzed = _simulate(AnalysisPacer(0.8), [heavy] * 300)
+    # Each frame earns 0.8 * 33.3 ms - 5 ms of overhead ~= 21.7 ms, so about one frame in 2.8
+    share = sum(analyzed) / len(analyzed)
+    assert 0.3 < share < 0.42
+    assert sum(analyzed) * heavy <= (0.8 * FRAME_S - 0.005) * len(analyzed) + heavy
+    assert analyzed[0] and not analyzed[1]
+
+
+def test_no_credit_saved_up_while_analysis_was_cheap():
+    analyzed = _simulate(AnalysisPacer(0.8), [0.001] * 200 + [0.060] * 10)
+    # A long cheap stretch doesn't buy a run of back-to-back expensive passes
+    assert analyzed[200] and not analyzed[201]
+
+
+def test_zero_budget_only_analyzes_the_first_frame():
+    assert _simulate(AnalysisPacer(0.0), [0.010] * 10) == [True] + [False] * 9
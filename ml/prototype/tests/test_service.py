@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from service import create_app
+
+
+def _png(seed: int) -> bytes:
+    image = np.random.default_rng(seed).integers(0, 256, size=(64, 64, 3), dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def _files(n: int) -> list:
+    return [("images", (f"{i}.png", _png(i), "image/png")) for i in range(n)]
+
+
+@pytest.fixture(scope="module")
+def client():
+    # Every request with more than workers + max_queue chunks used to reject itself
+    with TestClient(create_app(workers=1, max_queue=0, batch_size=2)) as c:
+        yield c
+
+
+def test_analyze_single_image(client):
+    r = client.post("/analyze", content=_png(0), headers={"content-type": "application/octet-stream"})
+    assert r.status_code == 200
+    assert {"pixels_per_mm", "detected_markers", "metrics", "centerline_points"} <= set(r.json())
+
+
+def test_analyze_many_images_in_order(client):
+    r = client.post("/analyze", files=_files(7))
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert len(results) == 7
+    single = [client.post("/analyze", content=_png(i)).json() for i in (0, 6)]
+    assert [results[0], results[6]] == single
+
+
+def test_analyze_undecodable_body_is_400(client):
+    r = client.post("/analyze", content=b"not an image")
+    assert r.status_code == 400
+    r = client.post("/analyze", content=b"")
+    assert r.status_code == 400
+
+
+def test_full_queue_is_503_and_runs_nothing(client):
+    pool = client.app.state.pool
+    before = dict(pool.metrics.completed)
+    # Hold the only worker slot; with max_queue=0 nothing may wait for it
+    client.portal.call(pool._slots.acquire)
+    try:
+        assert client.post("/analyze", content=_png(0)).status_code == 503
+        assert client.post("/analyze", files=_files(6)).status_code == 503
+    finally:
+        client.portal.call(pool._slots.release)
+    assert pool.metrics.rejected >= 2
+    # The rejected request's other chunks were cancelled, not run and discarded
+    assert client.get("/metrics").json()["completed"] == before
+    assert client.post("/analyze", files=_files(3)).status_code == 200
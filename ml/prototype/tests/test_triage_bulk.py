@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import csv
+import json
+from dataclasses import asdict
+
+import pytest
+from hypothesis import HealthCheck, given, settings, strategies as st
+
+from triage_bulk import evaluate_all, read_chunks
+from triage_rules import triage
+from triage_strategies import TODAY, exposures, profiles, symptoms
+
+
+users = st.lists(st.tuples(st.lists(exposures, max_size=4), symptoms, profiles), min_size=1, max_size=30)
+
+
+@settings(max_examples=200, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(users)
+def test_bulk_matches_triage(tmp_path, rows):
+    path = tmp_path / "users.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i, (exp, sym, prof) in enumerate(rows):
+            f.write(json.dumps({"user_id": i, "exposures": [asdict(e) for e in exp], "symptoms": asdict(sym), "profile": asdict(prof)}) + "\n")
+
+    results = [r for _, chunk in evaluate_all(read_chunks(path, chunk_size=7), TODAY, workers=1) for r in chunk]
+
+    assert [uid for uid, _ in results] == list(range(len(rows)))
+    for (_, payload), (exp, sym, prof) in zip(results, rows):
+        assert json.loads(payload) == asdict(triage(exp, sym, prof, today=TODAY))
+
+
+def _users(tmp_path) -> list:
+    from triage_bulk import FLAG_COLUMNS
+
+    day = TODAY.isoformat()
+    rows = [
+        {"user_id": i, "exposures": [{"date": day, "site": site, "condom_used": False}],
+         **{name: name == flag for name in FLAG_COLUMNS}}
+        for i, (site, flag) in enumerate([("oral", "fever"), ("anal", "on_prep"), ("vaginal", "discharge")])
+    ]
+    jsonl, table = tmp_path / "users.jsonl", tmp_path / "users.csv"
+    jsonl.write_text("".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+    with open(table, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows({**r, "exposures": json.dumps(r["exposures"])} for r in rows)
+    return rows
+
+
+def _assert_diffs_match_users(tmp_path, paths) -> None:
+    # Each input diffed against the previous one's output (wrapping around) must change nothing
+    from typer.testing import CliRunner
+
+    from triage_bulk import app
+
+    day = TODAY.isoformat()
+    runner = CliRunner()
+    outputs = {}
+    for path in paths:
+        outputs[path] = tmp_path / f"out_{path.suffix[1:]}.jsonl"
+        result = runner.invoke(app, ["--input", str(path), "--out", str(outputs[path]), "--today", day, "--workers", "1"])
+        assert result.exit_code == 0, result.output
+    for new, old in zip(paths, paths[-1:] + paths[:-1]):
+        changes = tmp_path / "changes.jsonl"
+        result = runner.invoke(app, ["--input", str(new), "--out", str(tmp_path / "again.jsonl"), "--today", day,
+                                     "--workers", "1", "--previous", str(outputs[old]), "--changes-out", str(changes)])
+        assert result.exit_code == 0, result.output
+        assert changes.read_text(encoding="utf-8") == ""
+        assert "0 changed, 0 new, 0 removed, 3 unchanged" in " ".join(result.output.split())
+
+
+def test_diff_matches_users_across_formats(tmp_path):
+    _users(tmp_path)
+    _assert_diffs_match_users(tmp_path, [tmp_path / "users.jsonl", tmp_path / "users.csv"])
+
+
+def test_diff_matches_users_from_parquet(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    rows = _users(tmp_path)
+    pq.write_table(pa.Table.from_pylist(rows), tmp_path / "users.parquet")
+    _assert_diffs_match_users(tmp_path, [tmp_path / "users.jsonl", tmp_path / "users.csv", tmp_path / "users.parquet"])
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from hypothesis import strategies as st
+
+from triage_rules import Exposure, Profile, Symptoms
+
+
+# Hypothesis strategies for triage inputs, shared by the rule and bulk-evaluation tests.
+
+
+TODAY = date.today()
+
+# Dates around the 7- and 14-day windows (and in the future), plus strings that don't parse
+iso_dates = st.one_of(
+    st.integers(min_value=-30, max_value=120).map(lambda d: (TODAY - timedelta(days=d)).isoformat()),
+    st.integers(min_value=-3, max_value=30).map(lambda d: (TODAY - timedelta(days=d)).isoformat() + "T12:30:00"),
+    st.sampled_from(["", "yesterday", "2025-13-01", "01/08/2025"]),
+    st.text(max_size=12),
+)
+exposures = st.builds(
+    Exposure,
+    date=iso_dates,
+    site=st.one_of(st.sampled_from(["oral", "vaginal", "anal", "blood", "other"]), st.text(max_size=8)),
+    condom_used=st.one_of(st.booleans(), st.none(), st.just(0)),
+    partner_known_positive=st.lists(st.sampled_from(["hiv", "syphilis", "hbv"]), max_size=2),
+)
+symptoms = st.builds(Symptoms, **{name: st.booleans() for name in Symptoms.__dataclass_fields__})
+profiles = st.builds(
+    Profile,
+    user_age=st.integers(min_value=12, max_value=90),
+    hepatitis_b_vaccinated=st.booleans(),
+    injection_drug_use=st.booleans(),
+    on_prep=st.booleans(),
+)
+
@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from itertools import chain
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+import typer
+from rich import print
+from rich.table import Table
+
+from triage_rules import (
+    EXPOSURE_AGGREGATES,
+    PROFILE_FEATURES,
+    SITES,
+    SYMPTOM_FEATURES,
+    CompiledRules,
+    _days_since,
+    compile_rules,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# Bulk triage: re-run the rules for every user in a JSONL, CSV or Parquet table, e.g. after the
+# guidance changes. One row per user:
+#
+#   user_id      any scalar
+#   exposures    list of {"date", "site", "condom_used"} (a JSON string in CSV)
+#   symptoms     Symptoms fields, either nested under "symptoms" (JSONL) or as flat columns
+#   profile      Profile fields, either nested under "profile" (JSONL) or as flat columns
+#
+# Rows are read in chunks and evaluated column-wise: exposure features and the per-person
+# aggregates are NumPy bitmask operations over whole columns, and rule outcomes come from the
+# compiled tables, which are looked up once per distinct feature set. Large inputs are spread
+# over worker processes; results stream out in input order as one JSON line per user.
+
+
+FLAG_COLUMNS = (*SYMPTOM_FEATURES, *PROFILE_FEATURES)
+
+# Identical (features, exposures) inputs give identical output; memoize the JSON payloads
+_PAYLOAD_MEMO_LIMIT = 1 << 16
+
+
+@dataclass
+class Chunk:
+    """A block of users in columnar form. Exposures are flattened; user i owns offsets[i]:offsets[i+1]."""
+
+    user_ids: List[object]
+    flags: Dict[str, "np.ndarray"]  # FLAG_COLUMNS -> bool (n,)
+    offsets: "np.ndarray"  # int64 (n + 1,)
+    dates: List[object]
+    sites: List[object]
+    condom_false: "np.ndarray"  # bool (m,): condom_used is exactly False (the Exposure default)
+
+
+def _parse_bool(value: object) -> bool:
+    # CSV cells are strings, and "false" is truthy
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "t", "yes", "y")
+    return bool(value)
+
+
+def _chunk_from_rows(rows: List[dict], start: int, text_cells: bool) -> Chunk:
+    import numpy as np
+
+    to_bool = _parse_bool if text_cells else bool
+    n = len(rows)
+    flags = {name: np.zeros(n, dtype=bool) for name in FLAG_COLUMNS}
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    user_ids: List[object] = []
+    dates: List[object] = []
+    sites: List[object] = []
+    condom_false: List[bool] = []
+    for i, row in enumerate(rows):
+        user_ids.append(row.get("user_id", start + i))
+        symptoms = row.get("symptoms") or row
+        profile = row.get("profile") or row
+        for name in SYMPTOM_FEATURES:
+            if name in symptoms:
+                flags[name][i] = to_bool(symptoms[name])
+        for name in PROFILE_FEATURES:
+            if name in profile:
+                flags[name][i] = to_bool(profile[name])
+        exposures = row.get("exposures") or []
+        if isinstance(exposures, str):
+            exposures = json.loads(exposures) if exposures.strip() else []
+        for e in exposures:
+            dates.append(e.get("date"))
+            sites.append(e.get("site"))
+            condom_false.append(e.get("condom_used", False) is False)
+        offsets[i + 1] = len(sites)
+    return Chunk(user_ids, flags, offsets, dates, sites, np.array(condom_false, dtype=bool))
+
+
+def _read_jsonl(path: Path, chunk_size: int) -> Iterator[Chunk]:
+    start = 0
+    rows: List[dict] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rows.append(json.loads(line))
+            if len(rows) == chunk_size:
+                yield _chunk_from_rows(rows, start, text_cells=False)
+                start += len(rows)
+                rows = []
+    if rows:
+        yield _chunk_from_rows(rows, start, text_cells=False)
+
+
+def _read_csv(path: Path, chunk_size: int) -> Iterator[Chunk]:
+    start = 0
+    rows: List[dict] = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield _chunk_from_rows(rows, start, text_cells=True)
+                start += len(rows)
+                rows = []
+    if rows:
+        yield _chunk_from_rows(rows, start, text_cells=True)
+
+
+def _read_parquet(path: Path, chunk_size: int) -> Iterator[Chunk]:
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("pyarrow is required for Parquet input: pip install pyarrow") from e
+    import numpy as np
+
+    start = 0
+    for batch in pq.ParquetFile(str(path)).iter_batches(batch_size=chunk_size):
+        n = batch.num_rows
+        names = batch.schema.names
+        user_ids = batch.column("user_id").to_pylist() if "user_id" in names else list(range(start, start + n))
+        flags = {}
+        for name in FLAG_COLUMNS:
+            if name not in names:
+                flags[name] = np.zeros(n, dtype=bool)
+                continue
+            col = batch.column(name)
+            if pa.types.is_boolean(col.type):
+                flags[name] = pc.fill_null(col, False).to_numpy(zero_copy_only=False)
+            else:
+                flags[name] = np.array([v is not None and _parse_bool(v) for v in col.to_pylist()], dtype=bool)
+        col = batch.column("exposures") if "exposures" in names else None
+        if col is not None and pa.types.is_list(col.type):
+            # Arrow list column: the offsets and flattened struct fields are already columnar
+            offsets = np.asarray(col.offsets, dtype=np.int64)
+            offsets = offsets - offsets[0]
+            values = col.flatten()
+            fields = {f.name for f in values.type}
+            m = len(values)
+            dates = values.field("date").to_pylist() if "date" in fields else [None] * m
+            sites = values.field("site").to_pylist() if "site" in fields else [None] * m
+            if "condom_used" in fields:
+                condom = values.field("condom_used")
+                # Null means "not recorded" (None), which does not count as condomless
+                condom_false = pc.fill_null(pc.equal(condom, False), False).to_numpy(zero_copy_only=False)
+            else:
+                condom_false = np.ones(m, dtype=bool)
+            yield Chunk(user_ids, flags, offsets, dates, sites, condom_false)
+        else:
+            rows = [{"user_id": uid, "exposures": exp} for uid, exp in zip(user_ids, col.to_pylist() if col is not None else [None] * n)]
+            chunk = _chunk_from_rows(rows, start, text_cells=True)
+            chunk.flags = flags
+            yield chunk
+        start += n
+
+
+READERS = {
+    ".jsonl": _read_jsonl,
+    ".ndjson": _read_jsonl,
+    ".csv": _read_csv,
+    ".parquet": _read_parquet,
+    ".pq": _read_parquet,
+}
+
+
+def read_chunks(path: Path, chunk_size: int = 20000) -> Iterator[Chunk]:
+    reader = READERS.get(path.suffix.lower())
+    if reader is None:
+        raise ValueError(f"Unsupported input {path.name}; expected one of {', '.join(READERS)}")
+    return reader(path, chunk_size)
+
+
+def holds(bits: "np.ndarray", mask: Tuple[int, int, int]) -> "np.ndarray":
+    """Column-wise version of a compiled When condition: one bool per row."""
+    all_of, any_of, none_of = mask
+    out = (bits & all_of) == all_of
+    if any_of:
+        out &= (bits & any_of) != 0
+    if none_of:
+        out &= (bits & none_of) == 0
+    return out
+
+
+def feature_columns(rules: CompiledRules, chunk: Chunk, today: date) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Per-exposure and per-person feature bits for a chunk, computed column-wise."""
+    import numpy as np
+
+    bit = rules.bit
+    m = len(chunk.sites)
+    # Dates repeat a lot across users; parse each distinct value once
+    parsed: Dict[object, Optional[int]] = {}
+    days = np.zeros(m, dtype=np.int64)
+    dated = np.zeros(m, dtype=bool)
+    for i, d in enumerate(chunk.dates):
+        try:
+            v = parsed[d]
+        except KeyError:
+            v = parsed[d] = _days_since(d, today)
+        except TypeError:
+            v = None
+        if v is not None:
+            days[i] = v
+            dated[i] = True
+
+    site_bits = {s: bit[f"site_{s}"] for s in SITES}
+    ebits = np.fromiter((site_bits.get(s, 0) if isinstance(s, str) else 0 for s in chunk.sites), dtype=np.int64, count=m)
+    ebits |= np.where(chunk.condom_false, bit["condom_not_used"], 0)
+    ebits |= np.where(dated & (days < 7), bit["days_lt_7"], 0)
+    ebits |= np.where(~dated | (days < 14), bit["days_lt_14_or_undated"], 0)
+
+    n = len(chunk.user_ids)
+    pbits = np.zeros(n, dtype=np.int64)
+    for name in FLAG_COLUMNS:
+        pbits |= np.where(chunk.flags[name], bit[name], 0)
+    owner = np.repeat(np.arange(n), np.diff(chunk.offsets))
+    for name, when in EXPOSURE_AGGREGATES.items():
+        hit = owner[holds(ebits, rules.mask(when))]
+        pbits[hit] |= bit[name]
+    return ebits, pbits
+
+
+_RULES: Optional[CompiledRules] = None
+_PAYLOADS: Dict[tuple, str] = {}
+_ENCODED: Dict[object, str] = {}
+
+
+def _encoded(key: object, make) -> str:
+    text = _ENCODED.get(key)
+    if text is None:
+        text = _ENCODED[key] = json.dumps(make())
+    return text
+
+
+def evaluate_chunk(chunk: Chunk, today: date) -> List[Tuple[object, str]]:
+    """(user_id, JSON payload without user_id) per user, in input order."""
+    global _RULES
+    if _RULES is None:
+        _RULES = compile_rules()
+    rules = _RULES
+    ebits, pbits = feature_columns(rules, chunk, today)
+    ebits_list = ebits.tolist()
+    offsets = chunk.offsets.tolist()
+    out: List[Tuple[object, str]] = []
+    for i, (uid, bits) in enumerate(zip(chunk.user_ids, pbits.tolist())):
+        lo, hi = offsets[i], offsets[i + 1]
+        sites, eb = chunk.sites[lo:hi], ebits_list[lo:hi]
+        key = (bits, tuple(sites), tuple(eb))
+        try:
+            payload = _PAYLOADS[key]
+        except (KeyError, TypeError):
+            recs, flags, guidance = rules.outcomes(bits, sites, eb)
+            # Same text json.dumps gives for triage_cli's output dict, assembled from cached pieces
+            payload = (
+                '{"recommendations": ['
+                + ", ".join(_encoded(r, lambda r=r: {"panel_code": r[0], "reason": r[1], "test_now": True, "retest_days": r[2]}) for r in recs)
+                + '], "urgency_flags": ' + _encoded(("flags", bits), lambda: flags)
+                + ', "guidance": ' + _encoded(("guidance", bits), lambda: guidance)
+                + "}"
+            )
+            if len(_PAYLOADS) >= _PAYLOAD_MEMO_LIMIT:
+                _PAYLOADS.clear()
+                _ENCODED.clear()
+            try:
+                _PAYLOADS[key] = payload
+            except TypeError:
+                pass
+        out.append((uid, payload))
+    return out
+
+
+def evaluate_all(chunks: Iterator[Chunk], today: date, workers: int) -> Iterator[Tuple[Chunk, List[Tuple[object, str]]]]:
+    """
+    Evaluate chunks in input order. With ``workers`` > 1 and more than one chunk, chunks go to a
+    process pool with a bounded number in flight, so memory stays flat however large the input.
+    """
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+    if second is None or workers <= 1:
+        for chunk in chain([first], [second] if second is not None else [], chunks):
+            yield chunk, evaluate_chunk(chunk, today)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for chunk in chain([first, second], chunks):
+            pending.append((chunk, pool.submit(evaluate_chunk, chunk, today)))
+            if len(pending) >= 2 * workers:
+                done, fut = pending.popleft()
+                yield done, fut.result()
+        while pending:
+            done, fut = pending.popleft()
+            yield done, fut.result()
+
+
+def _diff_key(uid: object) -> str:
+    # CSV ids are strings while JSONL and Parquet ids keep their type; runs over different formats
+    # of the same table must still match users up
+    return str(uid)
+
+
+def _load_previous(path: Path) -> Dict[str, Tuple[object, str]]:
+    """Earlier output by user: diff key -> (user_id as written, result payload)."""
+    previous: Dict[str, Tuple[object, str]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            uid = row.pop("user_id")
+            previous[_diff_key(uid)] = (uid, json.dumps(row))
+    return previous
+
+
+def _describe_change(old: Optional[str], new: Optional[str]) -> dict:
+    before = json.loads(old) if old else {"recommendations": [], "urgency_flags": [], "guidance": []}
+    after = json.loads(new) if new else {"recommendations": [], "urgency_flags": [], "guidance": []}
+    old_panels = {r["panel_code"]: r for r in before["recommendations"]}
+    new_panels = {r["panel_code"]: r for r in after["recommendations"]}
+    return {
+        "panels_added": sorted(set(new_panels) - set(old_panels)),
+        "panels_removed": sorted(set(old_panels) - set(new_panels)),
+        "panels_modified": sorted(c for c in set(old_panels) & set(new_panels) if old_panels[c] != new_panels[c]),
+        "flags_changed": before["urgency_flags"] != after["urgency_flags"],
+        "guidance_changed": before["guidance"] != after["guidance"],
+    }
+
+
+app = typer.Typer(add_completion=False)
+
+
+@app.command()
+def main(
+    input_path: Path = typer.Option(..., "--input", exists=True, readable=True, help="Users table: .jsonl, .csv or .parquet"),
+    out: Path = typer.Option(Path("triage_results.jsonl"), help="One JSON line per user, in input order"),
+    previous: Optional[Path] = typer.Option(None, exists=True, readable=True, help="Earlier output to diff against"),
+    changes_out: Optional[Path] = typer.Option(None, help="Write one JSON line per changed/new/removed user"),
+    today: Optional[str] = typer.Option(None, help="Evaluate as of this ISO date (pin it when diffing runs)"),
+    chunk_size: int = typer.Option(20000, min=1, help="Users per chunk"),
+    workers: int = typer.Option(0, min=0, help="Worker processes (0 = all cores; 1 = in-process)"),
+    show: int = typer.Option(20, min=0, help="Changed users to list"),
+):
+    """
+    Re-run triage for every user in a table and report rows/s and who changed since a previous run.
+    """
+    as_of = date.fromisoformat(today) if today else date.today()
+    workers = workers or os.cpu_count() or 1
+    prior = _load_previous(previous) if previous is not None else None
+    changes: List[dict] = []
+    seen = set()
+    counts = {"unchanged": 0, "changed": 0, "new": 0, "removed": 0}
+    users = exposures = chunks = 0
+
+    start = time.perf_counter()
+    changes_f = open(changes_out, "w", encoding="utf-8") if changes_out is not None else None
+    try:
+        with open(out, "w", encoding="utf-8") as f:
+            for chunk, results in evaluate_all(read_chunks(input_path, chunk_size), as_of, workers):
+                chunks += 1
+                users += len(results)
+                exposures += len(chunk.sites)
+                for uid, payload in results:
+                    uid_json = json.dumps(uid)
+                    f.write('{"user_id": ' + uid_json + ", " + payload[1:] + "\n")
+                    if prior is None:
+                        continue
+                    key = _diff_key(uid)
+                    seen.add(key)
+                    old = prior[key][1] if key in prior else None
+                    if old == payload:
+                        counts["unchanged"] += 1
+                        continue
+                    status = "new" if old is None else "changed"
+                    counts[status] += 1
+                    change = {"user_id": uid, "status": status, **_describe_change(old, payload)}
+                    if len(changes) < show:
+                        changes.append(change)
+                    if changes_f is not None:
+                        changes_f.write(json.dumps(change) + "\n")
+        if prior is not None:
+            for key, (uid, old) in prior.items():
+                if key in seen:
+                    continue
+                counts["removed"] += 1
+                change = {"user_id": uid, "status": "removed", **_describe_change(old, None)}
+                if len(changes) < show:
+                    changes.append(change)
+                if changes_f is not None:
+                    changes_f.write(json.dumps(change) + "\n")
+    finally:
+        if changes_f is not None:
+            changes_f.close()
+    elapsed = time.perf_counter() - start
+
+    rate = users / elapsed if elapsed > 0 else 0.0
+    print(f"[green]Triaged {users} users ({exposures} exposures) in {elapsed:.2f}s: {rate:,.0f} rows/s, "
+          f"{workers if chunks > 1 and workers > 1 else 1} process(es) -> {out}")
+    if prior is None:
+        return
+    print(f"vs {previous}: {counts['changed']} changed, {counts['new']} new, {counts['removed']} removed, {counts['unchanged']} unchanged")
+    if changes:
+        table = Table(title=f"First {len(changes)} changes")
+        for col in ("user_id", "status", "panels added", "panels removed", "panels modified", "flags", "guidance"):
+            table.add_column(col)
+        for c in changes:
+            table.add_row(
+                str(c["user_id"]), c["status"], ", ".join(c["panels_added"]), ", ".join(c["panels_removed"]),
+                ", ".join(c["panels_modified"]), "changed" if c["flags_changed"] else "", "changed" if c["guidance_changed"] else "",
+            )
+        print(table)
+
+
+if __name__ == "__main__":
+    app()
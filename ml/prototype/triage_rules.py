@@ -1,18 +1,23 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import date, datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 
 # Simple rule engine for STD triage aligned with high-level public guidance.
 # Not a diagnosis. Always direct users to lab testing and clinician follow-up where appropriate.
+#
+# The rules are data (RECOMMENDATION_RULES, URGENCY_RULES, GUIDANCE_RULES below): conditions on
+# named boolean features mapped to recommendations, flags and guidance. compile_rules() turns
+# every condition into bitmasks once; evaluation then extracts each exposure's features a single
+# time (one date parse, one shared "today") and looks rule outcomes up by feature bitset.
 
 
-def _days_since(iso_date: str) -> Optional[int]:
+def _days_since(iso_date: str, today: Optional[date] = None) -> Optional[int]:
     try:
         d = datetime.fromisoformat(iso_date).date()
-        return (date.today() - d).days
+        return ((today or date.today()) - d).days
     except Exception:
         return None
 
@@ -60,122 +65,358 @@ class TriageResult:
     guidance: List[str]
 
 
-def _recommend_cg_naat(exposures: List[Exposure], symptoms: Symptoms) -> List[Recommendation]:
-    recs: List[Recommendation] = []
-    sites = set()
-    for e in exposures:
-        if e.site in {"oral", "vaginal", "anal"}:
-            sites.add(e.site)
-    # Map sites to specimen types
-    site_to_panel = {
-        "oral": "CG_NAAT_PHARYNGEAL",
-        "vaginal": "CG_NAAT_URINE_OR_VAGINAL_SWAB",
-        "anal": "CG_NAAT_RECTAL",
-    }
-    for e in exposures:
-        if e.site not in site_to_panel:
-            continue
-        days = _days_since(e.date)
-        panel = site_to_panel[e.site]
-        test_now = True
-        retest: Optional[int] = None
-        reason_parts = ["Exposure at site: "+e.site]
-        # Window: NAAT typically ≥7 days post-exposure
+@dataclass(frozen=True)
+class When:
+    """Holds when every feature in ``all_of``, at least one in ``any_of`` (if any) and none in ``none_of`` is set."""
+
+    all_of: Tuple[str, ...] = ()
+    any_of: Tuple[str, ...] = ()
+    none_of: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class Note:
+    """Text appended to a rule's reason when ``when`` holds; ``retest_days`` then replaces the rule's."""
+
+    when: When
+    text: str
+    retest_days: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class PanelRule:
+    """At most one recommendation per person."""
+
+    panel_code: str
+    reason: str
+    when: When
+    retest_days: Optional[int] = None
+    notes: Tuple[Note, ...] = ()
+
+
+@dataclass(frozen=True)
+class SitePanelRule:
+    """
+    One recommendation per exposure at a site listed in ``panels`` (site -> panel code), in exposure
+    order. ``reason`` is formatted with ``site``; notes may test that exposure's own features.
+    """
+
+    panels: Tuple[Tuple[str, str], ...]
+    reason: str
+    retest_days: Optional[int] = None
+    notes: Tuple[Note, ...] = ()
+
+
+RecommendationRule = Union[PanelRule, SitePanelRule]
+
+
+@dataclass(frozen=True)
+class Message:
+    text: str
+    when: When
+
+
+SITES = ("oral", "vaginal", "anal", "blood", "other")
+SEXUAL_OR_BLOOD = ("site_oral", "site_vaginal", "site_anal", "site_blood")
+
+# Features of a single exposure, extracted once per exposure (see CompiledRules._exposure_bits)
+EXPOSURE_FEATURES = (
+    *(f"site_{s}" for s in SITES),
+    "condom_not_used",  # condom_used is exactly False; a missing value is not counted
+    "days_lt_7",  # dated less than 7 days ago (undated exposures don't qualify)
+    "days_lt_14_or_undated",
+)
+
+# Person-level features that hold when at least one exposure satisfies the condition
+EXPOSURE_AGGREGATES: Dict[str, When] = {
+    "exposed": When(),
+    "sexual_or_blood_exposure": When(any_of=SEXUAL_OR_BLOOD),
+    "vaginal_anal_or_blood_exposure": When(any_of=("site_vaginal", "site_anal", "site_blood")),
+    "blood_exposure": When(all_of=("site_blood",)),
+    "condomless_exposure": When(all_of=("condom_not_used",)),
+    "recent_sexual_or_blood_exposure": When(all_of=("days_lt_14_or_undated",), any_of=SEXUAL_OR_BLOOD),
+}
+
+SYMPTOM_FEATURES = tuple(f.name for f in fields(Symptoms))
+PROFILE_FEATURES = ("hepatitis_b_vaccinated", "injection_drug_use", "on_prep")
+
+
+RECOMMENDATION_RULES = (
+    # Chlamydia/gonorrhoea NAAT with the specimen type for each exposed site
+    SitePanelRule(
+        panels=(
+            ("oral", "CG_NAAT_PHARYNGEAL"),
+            ("vaginal", "CG_NAAT_URINE_OR_VAGINAL_SWAB"),
+            ("anal", "CG_NAAT_RECTAL"),
+        ),
+        reason="Exposure at site: {site}",
+        notes=(
+            # Window: NAAT typically ≥7 days post-exposure
+            Note(When(all_of=("days_lt_7",)), "Exposure <7 days, plan retest at 14 days", retest_days=14),
+            Note(
+                When(any_of=("discharge", "dysuria_pain_urination", "rectal_pain_bleeding", "sore_throat")),
+                "Symptoms suggest bacterial STI at this site",
+            ),
+        ),
+    ),
+    # Any sexual exposure or blood exposure -> HIV Ag/Ab with 6-week retest; RNA if very recent
+    PanelRule(
+        "HIV_AGAB_4TH_GEN",
+        "Sexual/blood exposure; 4th-gen HIV Ag/Ab recommended.",
+        When(all_of=("sexual_or_blood_exposure",)),
+        retest_days=42,
+    ),
+    PanelRule(
+        "HIV_RNA_PCR",
+        "Recent exposure <14 days; RNA test can detect earlier infection.",
+        When(all_of=("recent_sexual_or_blood_exposure",)),
+        retest_days=14,
+    ),
+    PanelRule(
+        "SYPHILIS_RPR_TPPA",
+        "Sexual exposure",
+        When(all_of=("exposed",)),
+        retest_days=42,
+        notes=(Note(When(any_of=("sores_ulcers", "rash_palmar_plantar")), "Symptoms possibly consistent with syphilis"),),
+    ),
+    PanelRule(
+        "HBV_PANEL (HBsAg, anti-HBs, anti-HBc)",
+        "Unvaccinated with sexual/blood exposure.",
+        When(all_of=("vaginal_anal_or_blood_exposure",), none_of=("hepatitis_b_vaccinated",)),
+        retest_days=60,
+    ),
+    PanelRule(
+        "HCV_AB (with reflex RNA)",
+        "Blood exposure/IDU risk; reflex to RNA if positive.",
+        When(any_of=("injection_drug_use", "blood_exposure")),
+        retest_days=60,
+    ),
+)
+
+URGENCY_RULES = (
+    Message("Fever with urogenital symptoms — seek urgent care", When(all_of=("fever",), any_of=("discharge", "pelvic_or_testicular_pain"))),
+    Message("Severe pelvic/testicular pain — urgent evaluation recommended", When(all_of=("pelvic_or_testicular_pain",))),
+    Message("Painful ulcers with systemic symptoms — urgent evaluation", When(all_of=("sores_ulcers", "fever"))),
+)
+
+GUIDANCE_RULES = (
+    Message("Condomless exposure increases risk; consider comprehensive panel.", When(all_of=("condomless_exposure",))),
+    Message("Continue HIV PrEP as prescribed; maintain quarterly screening.", When(all_of=("on_prep",))),
+    Message("Consider Hepatitis B vaccination with your clinician.", When(none_of=("hepatitis_b_vaccinated",))),
+)
+
+
+Mask = Tuple[int, int, int]
+
+
+def _holds(bits: int, mask: Mask) -> bool:
+    all_of, any_of, none_of = mask
+    return (bits & all_of) == all_of and (not any_of or bits & any_of != 0) and not bits & none_of
+
+
+# Outcome tables are memoized per distinct feature set; cleared if they ever grow past this
+_MEMO_LIMIT = 1 << 16
+
+# One recommendation before it becomes a Recommendation: (panel code, reason, retest days)
+Outcome = Tuple[str, str, Optional[int]]
+
+
+class CompiledRules:
+    """
+    Rule tables compiled to bitmasks over one feature namespace: exposure features, symptom and
+    profile flags, and exposure aggregates. Build with compile_rules().
+
+    Every rule outcome depends only on a feature bitset, so outcomes are memoized per distinct
+    bitset: after warm-up an evaluation is one date parse and a few dict lookups per exposure plus
+    one lookup for the person. One instance can be shared across threads (the memo tables only
+    ever gain entries that any thread would compute identically).
+    """
+
+    def __init__(
+        self,
+        recommendations: Sequence[RecommendationRule],
+        urgency: Sequence[Message],
+        guidance: Sequence[Message],
+    ):
+        names = [*EXPOSURE_FEATURES, *SYMPTOM_FEATURES, *PROFILE_FEATURES, *EXPOSURE_AGGREGATES]
+        self.bit: Dict[str, int] = {name: 1 << i for i, name in enumerate(names)}
+        self._site_bits = {s: self.bit[f"site_{s}"] for s in SITES}
+        self._any_site = self._bits(f"site_{s}" for s in SITES)
+        self._symptom_bits = [(name, self.bit[name]) for name in SYMPTOM_FEATURES]
+        self._profile_bits = [(name, self.bit[name]) for name in PROFILE_FEATURES]
+        self._aggregates = [(self.bit[name], self.mask(when)) for name, when in EXPOSURE_AGGREGATES.items()]
+        self._recommendations = []
+        for rule in recommendations:
+            notes = [(self.mask(n.when), n.text, n.retest_days) for n in rule.notes]
+            # (site -> panel, panel code, reason, retest, notes, condition); site rules have no condition
+            if isinstance(rule, SitePanelRule):
+                unknown = [site for site, _ in rule.panels if site not in self._site_bits]
+                if unknown:
+                    raise ValueError(f"Unknown exposure site(s) in site rule: {unknown}; known sites are {SITES}")
+                self._recommendations.append((dict(rule.panels), None, rule.reason, rule.retest_days, notes, None))
+            elif isinstance(rule, PanelRule):
+                self._recommendations.append((None, rule.panel_code, rule.reason, rule.retest_days, notes, self.mask(rule.when)))
+            else:
+                raise TypeError(f"Unsupported rule type: {type(rule).__name__}")
+        self._urgency = [(self.mask(m.when), m.text) for m in urgency]
+        self._guidance = [(self.mask(m.when), m.text) for m in guidance]
+        self._exposure_aggregates: Dict[int, int] = {}
+        self._plans: Dict[int, tuple] = {}
+        self._site_outcomes: Dict[Tuple[int, int], Optional[Outcome]] = {}
+
+    def _bits(self, names: Iterable[str]) -> int:
+        out = 0
+        for name in names:
+            if name not in self.bit:
+                raise ValueError(f"Unknown triage feature: {name!r}")
+            out |= self.bit[name]
+        return out
+
+    def mask(self, when: When) -> Mask:
+        return self._bits(when.all_of), self._bits(when.any_of), self._bits(when.none_of)
+
+    def exposure_bits(self, e: Exposure, today: date) -> int:
+        days = _days_since(e.date, today)
+        bits = self._site_bits.get(e.site, 0)
+        if e.condom_used is False:
+            bits |= self.bit["condom_not_used"]
         if days is not None and days < 7:
-            retest = 14
-            reason_parts.append("Exposure <7 days, plan retest at 14 days")
-        if symptoms.discharge or symptoms.dysuria_pain_urination or symptoms.rectal_pain_bleeding or symptoms.sore_throat:
-            reason_parts.append("Symptoms suggest bacterial STI at this site")
-        recs.append(Recommendation(panel, "; ".join(reason_parts), test_now, retest))
-    return recs
-
-
-def _recommend_hiv(exposures: List[Exposure], profile: Profile) -> List[Recommendation]:
-    recs: List[Recommendation] = []
-    # Any sexual exposure or blood exposure -> HIV Ag/Ab with retest guidance
-    relevant = [e for e in exposures if e.site in {"oral", "vaginal", "anal", "blood"}]
-    if not relevant:
-        return recs
-    soonest_days = min([_days_since(e.date) or 0 for e in relevant]) if relevant else None
-    reason = "Sexual/blood exposure; 4th-gen HIV Ag/Ab recommended."
-    retest = 42  # 6 weeks
-    recs.append(Recommendation("HIV_AGAB_4TH_GEN", reason, True, retest_days=retest))
-    # If very recent exposure (<14 days), consider RNA
-    if soonest_days is not None and soonest_days < 14:
-        recs.append(Recommendation("HIV_RNA_PCR", "Recent exposure <14 days; RNA test can detect earlier infection.", True, retest_days=14))
-    return recs
-
-
-def _recommend_syphilis(exposures: List[Exposure], symptoms: Symptoms) -> List[Recommendation]:
-    recs: List[Recommendation] = []
-    if not exposures:
-        return recs
-    reason_parts = ["Sexual exposure"]
-    retest = 42  # 6 weeks
-    if symptoms.sores_ulcers or symptoms.rash_palmar_plantar:
-        reason_parts.append("Symptoms possibly consistent with syphilis")
-    recs.append(Recommendation("SYPHILIS_RPR_TPPA", "; ".join(reason_parts), True, retest_days=retest))
-    return recs
-
-
-def _recommend_hepatitis(exposures: List[Exposure], profile: Profile) -> List[Recommendation]:
-    recs: List[Recommendation] = []
-    # HBV: if unvaccinated and sexual/blood exposure
-    if not profile.hepatitis_b_vaccinated and any(e.site in {"vaginal", "anal", "blood"} for e in exposures):
-        recs.append(Recommendation("HBV_PANEL (HBsAg, anti-HBs, anti-HBc)", "Unvaccinated with sexual/blood exposure.", True, retest_days=60))
-    # HCV: if blood exposure or IDU
-    if profile.injection_drug_use or any(e.site == "blood" for e in exposures):
-        recs.append(Recommendation("HCV_AB (with reflex RNA)", "Blood exposure/IDU risk; reflex to RNA if positive.", True, retest_days=60))
-    return recs
-
-
-def _urgency_flags(symptoms: Symptoms) -> List[str]:
-    flags: List[str] = []
-    if symptoms.fever and (symptoms.discharge or symptoms.pelvic_or_testicular_pain):
-        flags.append("Fever with urogenital symptoms — seek urgent care")
-    if symptoms.pelvic_or_testicular_pain:
-        flags.append("Severe pelvic/testicular pain — urgent evaluation recommended")
-    if symptoms.sores_ulcers and symptoms.fever:
-        flags.append("Painful ulcers with systemic symptoms — urgent evaluation")
-    return flags
-
-
-def _general_guidance(exposures: List[Exposure], profile: Profile) -> List[str]:
-    g: List[str] = []
-    if any(e.condom_used is False for e in exposures):
-        g.append("Condomless exposure increases risk; consider comprehensive panel.")
-    if profile.on_prep:
-        g.append("Continue HIV PrEP as prescribed; maintain quarterly screening.")
-    if not profile.hepatitis_b_vaccinated:
-        g.append("Consider Hepatitis B vaccination with your clinician.")
-    return g
+            bits |= self.bit["days_lt_7"]
+        if days is None or days < 14:
+            bits |= self.bit["days_lt_14_or_undated"]
+        return bits
+
+    def aggregate_bits(self, exposure_bits: int) -> int:
+        """Person-level aggregate features that one exposure with these features switches on."""
+        out = self._exposure_aggregates.get(exposure_bits)
+        if out is None:
+            out = 0
+            for bit, mask in self._aggregates:
+                if _holds(exposure_bits, mask):
+                    out |= bit
+            self._exposure_aggregates[exposure_bits] = out
+        return out
+
+    def person_bits(self, exposure_bits: Sequence[int], symptoms: Symptoms, profile: Profile) -> int:
+        bits = 0
+        for name, bit in self._symptom_bits:
+            if getattr(symptoms, name):
+                bits |= bit
+        for name, bit in self._profile_bits:
+            if getattr(profile, name):
+                bits |= bit
+        for eb in exposure_bits:
+            bits |= self.aggregate_bits(eb)
+        return bits
+
+    @staticmethod
+    def _outcome(code: str, reason: str, retest: Optional[int], notes, bits: int) -> Outcome:
+        parts = [reason]
+        for mask, text, note_retest in notes:
+            if _holds(bits, mask):
+                parts.append(text)
+                if note_retest is not None:
+                    retest = note_retest
+        return code, "; ".join(parts), retest
+
+    def plan(self, bits: int) -> tuple:
+        """
+        Outcomes for a person-level feature set: per recommendation rule either an Outcome, None
+        (condition false) or the rule index (site rules, expanded per exposure), then the urgency
+        flags and guidance.
+        """
+        plan = self._plans.get(bits)
+        if plan is None:
+            recs: List[object] = []
+            for i, (panels, code, reason, retest, notes, mask) in enumerate(self._recommendations):
+                if panels is not None:
+                    recs.append(i)
+                elif _holds(bits, mask):
+                    recs.append(self._outcome(code, reason, retest, notes, bits))
+            flags = [text for mask, text in self._urgency if _holds(bits, mask)]
+            guidance = [text for mask, text in self._guidance if _holds(bits, mask)]
+            if len(self._plans) >= _MEMO_LIMIT:
+                self._plans.clear()
+            plan = self._plans[bits] = (recs, flags, guidance)
+        return plan
+
+    def site_outcome(self, rule_index: int, site: str, bits: int) -> Optional[Outcome]:
+        """Outcome of a site rule for one exposure; ``bits`` are the person's plus that exposure's."""
+        key = (rule_index, bits)
+        if key not in self._site_outcomes:
+            panels, _, reason, retest, notes, _ = self._recommendations[rule_index]
+            panel = panels.get(site)
+            if len(self._site_outcomes) >= _MEMO_LIMIT:
+                self._site_outcomes.clear()
+            # Sites that have a panel always have a site feature, so the bits identify the site
+            self._site_outcomes[key] = None if panel is None else self._outcome(panel, reason.format(site=site), retest, notes, bits)
+        return self._site_outcomes[key]
+
+    def evaluate(
+        self,
+        exposures: List[Exposure],
+        symptoms: Symptoms,
+        profile: Profile,
+        today: Optional[date] = None,
+    ) -> TriageResult:
+        today = today or date.today()
+        exposure_bits = [self.exposure_bits(e, today) for e in exposures]
+        bits = self.person_bits(exposure_bits, symptoms, profile)
+        return self.result(bits, [e.site for e in exposures], exposure_bits)
+
+    def outcomes(self, bits: int, sites: Sequence[object], exposure_bits: Sequence[int]) -> Tuple[List[Outcome], List[str], List[str]]:
+        """Deduplicated recommendation outcomes, urgency flags and guidance for one person."""
+        planned, flags, guidance = self.plan(bits)
+        recs: List[Outcome] = []
+        for entry in planned:
+            if entry is None:
+                continue
+            if isinstance(entry, int):
+                for site, eb in zip(sites, exposure_bits):
+                    outcome = self.site_outcome(entry, site, bits | eb) if eb & self._any_site else None
+                    if outcome is not None:
+                        recs.append(outcome)
+            else:
+                recs.append(entry)
+
+        # Deduplicate by panel_code while keeping the earliest retest recommendation
+        by_code: Dict[str, Outcome] = {}
+        for r in recs:
+            code, _, retest = r
+            if code not in by_code:
+                by_code[code] = r
+            else:
+                existing = by_code[code][2]
+                # Prefer the smaller retest_days if both present
+                if retest is not None and (existing is None or retest < existing):
+                    by_code[code] = r
+        return list(by_code.values()), flags, guidance
+
+    def result(self, bits: int, sites: Sequence[object], exposure_bits: Sequence[int]) -> TriageResult:
+        """Assemble one person's result from their feature bits and each exposure's site and bits."""
+        recs, flags, guidance = self.outcomes(bits, sites, exposure_bits)
+        return TriageResult([Recommendation(code, reason, True, retest) for code, reason, retest in recs], list(flags), list(guidance))
+
+
+def compile_rules(
+    recommendations: Sequence[RecommendationRule] = RECOMMENDATION_RULES,
+    urgency: Sequence[Message] = URGENCY_RULES,
+    guidance: Sequence[Message] = GUIDANCE_RULES,
+) -> CompiledRules:
+    """Compile rule tables once; raises ValueError for conditions on unknown features."""
+    return CompiledRules(recommendations, urgency, guidance)
+
+
+_DEFAULT_RULES: Optional[CompiledRules] = None
 
 
 def triage(
     exposures: List[Exposure],
     symptoms: Symptoms,
     profile: Profile,
+    today: Optional[date] = None,
 ) -> TriageResult:
-    recs: List[Recommendation] = []
-    recs.extend(_recommend_cg_naat(exposures, symptoms))
-    recs.extend(_recommend_hiv(exposures, profile))
-    recs.extend(_recommend_syphilis(exposures, symptoms))
-    recs.extend(_recommend_hepatitis(exposures, profile))
-
-    # Deduplicate by panel_code while keeping the earliest retest recommendation
-    by_code: Dict[str, Recommendation] = {}
-    for r in recs:
-        if r.panel_code not in by_code:
-            by_code[r.panel_code] = r
-        else:
-            existing = by_code[r.panel_code]
-            # Prefer the smaller retest_days if both present
-            if r.retest_days is not None and (
-                existing.retest_days is None or r.retest_days < existing.retest_days
-            ):
-                by_code[r.panel_code] = r
-
-    flags = _urgency_flags(symptoms)
-    guidance = _general_guidance(exposures, profile)
-    return TriageResult(list(by_code.values()), flags, guidance)
-
+    global _DEFAULT_RULES
+    if _DEFAULT_RULES is None:
+        _DEFAULT_RULES = compile_rules()
+    return _DEFAULT_RULES.evaluate(exposures, symptoms, profile, today)
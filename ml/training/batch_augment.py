@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import torch
+from torch.utils.data import default_collate
+import typer
+from rich import print
+
+
+# Photometric augmentation for a whole collated uint8 batch, replacing the per-sample
+# albumentations ColorJitter / GaussNoise / Blur chain that ShardSegDataset would otherwise
+# run in every DataLoader worker.
+#
+# Random parameters (on/off flags, jitter factors, noise strength and offsets) are drawn for the
+# whole batch at once from one seeded generator. The pixel work runs in place on the batch with
+# OpenCV's uint8 kernels: colour jitter (brightness, contrast, saturation, hue) is folded into a
+# single 3x4 colour matrix per sample, noise is read from a pre-drawn Gaussian bank at random
+# offsets instead of drawing H*W*3 normals per sample, and blur is a 3x3 box filter.
+
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float64)
+_RGB2YIQ = np.array([[0.299, 0.587, 0.114], [0.596, -0.274, -0.322], [0.211, -0.523, 0.312]])
+_YIQ2RGB = np.linalg.inv(_RGB2YIQ)
+
+
+class BatchAugment:
+    """
+    Colour jitter, Gaussian noise and 3x3 blur over an (N, H, W, 3) uint8 RGB batch.
+
+    Defaults mirror ``photometric_transforms``: ColorJitter(p=0.3), GaussNoise(p=0.2,
+    var_limit=(10, 50) as in albumentations 1.4), Blur(blur_limit=3, p=0.2). Each sample gets
+    its own flags and parameters. Draws come from a private generator seeded from ``seed`` plus
+    the process's torch seed. DataLoader gives each worker a fresh torch seed every epoch (drawn
+    from the main process's generator), so epochs don't replay each other's augmentations, and a
+    run with the same torch seed and worker count is reproducible.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        p_color: float = 0.3,
+        brightness: float = 0.2,
+        contrast: float = 0.2,
+        saturation: float = 0.2,
+        hue: float = 0.5,
+        p_noise: float = 0.2,
+        noise_var: Tuple[float, float] = (10.0, 50.0),
+        p_blur: float = 0.2,
+        bank_refresh: int = 64,
+    ):
+        self.seed = seed
+        self.p_color = p_color
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.hue = hue
+        self.p_noise = p_noise
+        self.noise_var = noise_var
+        self.p_blur = p_blur
+        self.bank_refresh = bank_refresh
+        self._rng: Optional[np.random.Generator] = None
+        self._bank: Optional[np.ndarray] = None
+        self._bank_uses = 0
+
+    def __getstate__(self):
+        # Each DataLoader worker seeds its own generator on first use
+        state = self.__dict__.copy()
+        state["_rng"] = None
+        state["_bank"] = None
+        return state
+
+    def _generator(self) -> np.random.Generator:
+        if self._rng is None:
+            # In a worker this is the per-epoch worker seed; workers are recreated (and this object
+            # unpickled without a generator) every epoch unless persistent_workers is set
+            self._rng = np.random.default_rng([self.seed, torch.initial_seed()])
+        return self._rng
+
+    def _noise_bank(self, h: int, w: int) -> np.ndarray:
+        bank = self._bank
+        if bank is None or bank.shape[0] < 2 * h or bank.shape[1] < 2 * w or self._bank_uses >= self.bank_refresh:
+            bank = self._generator().standard_normal((2 * h, 2 * w, 3), dtype=np.float32)
+            self._bank, self._bank_uses = bank, 0
+        self._bank_uses += 1
+        return bank
+
+    def color_matrices(self, images: np.ndarray, b: np.ndarray, c: np.ndarray, s: np.ndarray, h: np.ndarray) -> np.ndarray:
+        """
+        Per-sample 3x4 RGB matrices for brightness ``b``, contrast ``c``, saturation ``s`` (factors)
+        and hue ``h`` (fraction of a turn), applied in that order without intermediate clipping.
+        """
+        k = len(images)
+        gray_mean = np.array([cv2.mean(img)[:3] for img in images]) @ _LUMA  # (k,)
+        eye = np.eye(3)
+        sat = s[:, None, None] * eye + (1.0 - s)[:, None, None] * np.outer(np.ones(3), _LUMA)
+        angle = h * 2.0 * np.pi
+        rot = np.zeros((k, 3, 3))
+        rot[:, 0, 0] = 1.0
+        rot[:, 1, 1], rot[:, 1, 2] = np.cos(angle), -np.sin(angle)
+        rot[:, 2, 1], rot[:, 2, 2] = np.sin(angle), np.cos(angle)
+        linear = _YIQ2RGB @ rot @ _RGB2YIQ @ sat * (b * c)[:, None, None]
+        # Contrast pulls towards the (brightened) mean gray; gray is unchanged by saturation and hue
+        offset = ((1.0 - c) * b * gray_mean)[:, None] * np.ones(3)
+        return np.concatenate([linear, offset[:, :, None]], axis=2).astype(np.float32)
+
+    def __call__(self, images: torch.Tensor) -> torch.Tensor:
+        """Augment an (N, H, W, 3) uint8 batch in place and return it."""
+        batch = images.numpy()
+        n, h, w = batch.shape[:3]
+        rng = self._generator()
+        flags = rng.random((3, n)) < np.array([[self.p_color], [self.p_noise], [self.p_blur]])
+
+        color_idx = np.flatnonzero(flags[0])
+        if color_idx.size:
+            k = color_idx.size
+            b = rng.uniform(1 - self.brightness, 1 + self.brightness, k)
+            c = rng.uniform(1 - self.contrast, 1 + self.contrast, k)
+            s = rng.uniform(1 - self.saturation, 1 + self.saturation, k)
+            hue = rng.uniform(-self.hue, self.hue, k)
+            mats = self.color_matrices(batch[color_idx], b, c, s, hue)
+            for i, m in zip(color_idx, mats):
+                cv2.transform(batch[i], m, dst=batch[i])
+
+        noise_idx = np.flatnonzero(flags[1])
+        if noise_idx.size:
+            bank = self._noise_bank(h, w)
+            std = np.sqrt(rng.uniform(*self.noise_var, noise_idx.size))
+            oy = rng.integers(0, bank.shape[0] - h + 1, noise_idx.size)
+            ox = rng.integers(0, bank.shape[1] - w + 1, noise_idx.size)
+            for i, sd, y0, x0 in zip(noise_idx, std, oy, ox):
+                cv2.addWeighted(batch[i], 1.0, bank[y0:y0 + h, x0:x0 + w], float(sd), 0.0, dst=batch[i], dtype=cv2.CV_8U)
+
+        for i in np.flatnonzero(flags[2]):
+            cv2.blur(batch[i], (3, 3), dst=batch[i])
+        return images
+
+
+class BatchAugmentCollate:
+    """collate_fn: default collation, then BatchAugment on the image tensor (masks untouched)."""
+
+    def __init__(self, augment: BatchAugment):
+        self.augment = augment
+
+    def __call__(self, samples: Sequence):
+        images, masks = default_collate(samples)
+        return self.augment(images), masks
+
+
+app = typer.Typer(add_completion=False)
+
+
+def _loader_rate(loader, batches: int) -> float:
+    seen = 0
+    start = None
+    for i, (x, _) in enumerate(loader):
+        if i == 0:
+            start = time.perf_counter()
+            continue
+        seen += x.shape[0]
+        if i >= batches:
+            break
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    return seen / elapsed if elapsed > 0 else 0.0
+
+
+@app.command()
+def bench(
+    shards_dir: Path = typer.Option(..., exists=True, readable=True, help="Shards from shards.py pack"),
+    batch_size: int = typer.Option(8),
+    num_workers: int = typer.Option(4),
+    batches: int = typer.Option(50, help="Batches to time (after the first)"),
+    epochs: int = typer.Option(0, min=0, help="If >0, also train each variant this long and report val IoU"),
+    seed: int = typer.Option(0),
+):
+    """
+    Compare per-sample albumentations with batched augmentation: loader samples/s and, optionally, val IoU.
+    """
+    import lightning as L
+    from torch.utils.data import DataLoader, random_split
+
+    from dataset import ShardSegDataset, photometric_transforms
+    from train import SegModule
+
+    per_sample = ShardSegDataset(shards_dir, augment=photometric_transforms())
+    raw = ShardSegDataset(shards_dir)
+    variants = {
+        "per-sample albumentations": (per_sample, None),
+        "batched": (raw, BatchAugmentCollate(BatchAugment(seed=seed))),
+    }
+
+    for name, (ds, collate) in variants.items():
+        torch.manual_seed(seed)
+        loader = DataLoader(ds, batch_size=batch_size, shuffle=True, num_workers=num_workers, collate_fn=collate, drop_last=True)
+        rate = _loader_rate(loader, batches)
+        line = f"{name:<28} {rate:8.1f} samples/s"
+
+        if epochs > 0:
+            L.seed_everything(seed, workers=True)
+            val_len = max(1, int(len(raw) * 0.1))
+            gen = torch.Generator().manual_seed(seed)
+            train_idx, val_idx = random_split(range(len(raw)), [len(raw) - val_len, val_len], generator=gen)
+            train_ds = torch.utils.data.Subset(ds, list(train_idx))
+            val_ds = torch.utils.data.Subset(raw, list(val_idx))
+            train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True, num_workers=num_workers, collate_fn=collate)
+            val_loader = DataLoader(val_ds, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+            model = SegModule(lr=1e-3)
+            trainer = L.Trainer(max_epochs=epochs, logger=False, enable_checkpointing=False, enable_progress_bar=False)
+            trainer.fit(model, train_loader, val_loader)
+            iou = trainer.callback_metrics.get("val/iou")
+            line += f"  val IoU {float(iou):.4f}" if iou is not None else "  val IoU n/a"
+        print(line)
+
+
+if __name__ == "__main__":
+    app()
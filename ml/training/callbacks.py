@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import lightning as L
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb(children: bool = False) -> Optional[float]:
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024.0, 1)
+
+
+class ResumeCheckpoint(L.Callback):
+    """
+    Keep a single resumable checkpoint at ``path``, rewritten every ``every_n_steps`` training
+    steps (0 = never mid-epoch) and at the end of every epoch. Each save goes to a temporary
+    file that then replaces ``path``, so a run killed mid-save still leaves the previous one.
+    """
+
+    def __init__(self, path: Path, every_n_steps: int = 0):
+        self.path = Path(path)
+        self.every_n_steps = every_n_steps
+        self._last_step = -1
+
+    def _save(self, trainer) -> None:
+        if trainer.global_step == self._last_step or trainer.sanity_checking:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        trainer.save_checkpoint(str(tmp))
+        if trainer.is_global_zero:
+            os.replace(tmp, self.path)
+        self._last_step = trainer.global_step
+
+    def on_fit_start(self, trainer, pl_module) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx) -> None:
+        if self.every_n_steps > 0 and trainer.global_step % self.every_n_steps == 0:
+            self._save(trainer)
+
+    def on_train_epoch_end(self, trainer, pl_module) -> None:
+        self._save(trainer)
+
+
+class ThroughputLogger(L.Callback):
+    """
+    Per-epoch training throughput: samples/s over the training loop (validation excluded), time
+    waiting on the dataloader vs time in the training step, and peak RSS. One row per epoch is
+    appended to ``path`` (JSONL, or CSV when the suffix is .csv), so a resumed run keeps
+    extending the same log.
+
+    Peak RSS is the high-water mark so far of the training process and of DataLoader workers
+    that have exited (non-persistent workers exit at the end of every epoch).
+    """
+
+    FIELDS = [
+        "epoch", "global_step", "samples", "seconds", "samples_per_s",
+        "data_wait_s", "compute_s", "data_wait_frac",
+        "peak_rss_mb", "peak_rss_workers_mb", "train_loss", "val_iou",
+    ]
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._samples = 0
+        self._wait = 0.0
+        self._compute = 0.0
+        self._epoch_start = time.perf_counter()
+        self._last_end = self._epoch_start
+        self._step_start = self._epoch_start
+
+    def on_train_epoch_start(self, trainer, pl_module) -> None:
+        self._reset()
+
+    def on_train_batch_start(self, trainer, pl_module, batch, batch_idx) -> None:
+        now = time.perf_counter()
+        self._wait += now - self._last_end
+        self._step_start = now
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx) -> None:
+        now = time.perf_counter()
+        self._compute += now - self._step_start
+        self._last_end = now
+        self._samples += int(batch[0].shape[0])
+
+    def on_train_epoch_end(self, trainer, pl_module) -> None:
+        # Runs after validation, so val metrics for this epoch are available
+        elapsed = time.perf_counter() - self._epoch_start
+        train_time = self._last_end - self._epoch_start
+        metrics = trainer.callback_metrics
+        loss = metrics.get("train/loss")
+        iou = metrics.get("val/iou")
+        busy = self._wait + self._compute
+        row = {
+            "epoch": trainer.current_epoch,
+            "global_step": trainer.global_step,
+            "samples": self._samples,
+            "seconds": round(elapsed, 3),
+            "samples_per_s": round(self._samples / train_time, 2) if train_time > 0 else 0.0,
+            "data_wait_s": round(self._wait, 3),
+            "compute_s": round(self._compute, 3),
+            "data_wait_frac": round(self._wait / busy, 4) if busy > 0 else 0.0,
+            "peak_rss_mb": _peak_rss_mb(),
+            "peak_rss_workers_mb": _peak_rss_mb(children=True),
+            "train_loss": float(loss) if loss is not None else None,
+            "val_iou": float(iou) if iou is not None else None,
+        }
+        if trainer.is_global_zero:
+            self._write(row)
+
+    def _write(self, row: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.suffix == ".csv":
+            new = not self.path.exists()
+            with open(self.path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+                if new:
+                    writer.writeheader()
+                writer.writerow(row)
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
+import json
 import os
 import shutil
 import subprocess
@@ -13,6 +15,27 @@ def run(cmd: list[str]) -> None:
     subprocess.run(cmd, check=True)
 
 
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def export_input_size(onnx_path: Path) -> tuple[tuple[int, int], bool]:
+    """(height, width) and dynamic flag from the preprocessing metadata written by export.py."""
+    import onnx
+
+    model = onnx.load(str(onnx_path), load_external_data=False)
+    meta = {p.key: p.value for p in model.metadata_props}
+    if "preprocessing" not in meta:
+        return (512, 512), False
+    pre = json.loads(meta["preprocessing"])
+    h, w = pre.get("input_size", (512, 512))
+    return (h, w), bool(pre.get("dynamic_hw", False))
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Convert ONNX to TFLite via onnx2tf and TensorFlow converter")
     parser.add_argument("onnx", type=Path, help="Path to ONNX model (e.g., segmentation.onnx)")
@@ -20,6 +43,7 @@ def main() -> None:
     parser.add_argument("--savedmodel_dir", type=Path, default=Path("build_tf"), help="Temp SavedModel output dir")
     parser.add_argument("--int8", action="store_true", help="Export INT8 quantized TFLite (requires representative dataset)")
     parser.add_argument("--rep_data", type=Path, help="Representative images directory for INT8 calibration (RGB images)")
+    parser.add_argument("--rebuild", action="store_true", help="Re-run onnx2tf even if --savedmodel_dir was built from this ONNX file")
     args = parser.parse_args()
 
     try:
@@ -28,10 +52,24 @@ def main() -> None:
         print("ERROR: TensorFlow is required. Install: pip install 'tensorflow<2.16' onnx2tf", file=sys.stderr)
         sys.exit(1)
 
-    # Step 1: ONNX -> SavedModel via onnx2tf
-    if args.savedmodel_dir.exists():
-        shutil.rmtree(args.savedmodel_dir)
-    run([sys.executable, "-m", "onnx2tf", "-i", str(args.onnx), "-o", str(args.savedmodel_dir)])
+    (height, width), dynamic_hw = export_input_size(args.onnx)
+
+    # Step 1: ONNX -> SavedModel via onnx2tf. This is the slow step, so the SavedModel is reused
+    # when its stamp says it was built from an identical ONNX file.
+    stamp = args.savedmodel_dir / "onnx_source.json"
+    digest = file_sha256(args.onnx)
+    cached = not args.rebuild and stamp.exists() and json.loads(stamp.read_text(encoding="utf-8")).get("sha256") == digest
+    if cached:
+        print(f"Reusing SavedModel in {args.savedmodel_dir} (built from the same ONNX)")
+    else:
+        if args.savedmodel_dir.exists():
+            shutil.rmtree(args.savedmodel_dir)
+        cmd = [sys.executable, "-m", "onnx2tf", "-i", str(args.onnx), "-o", str(args.savedmodel_dir)]
+        if dynamic_hw:
+            # TFLite needs static spatial dims; fix them at the export resolution
+            cmd += ["-ois", f"input:1,3,{height},{width}"]
+        run(cmd)
+        stamp.write_text(json.dumps({"onnx": str(args.onnx), "sha256": digest}), encoding="utf-8")
 
     # Step 2: SavedModel -> TFLite
     import tensorflow as tf  # type: ignore
@@ -47,7 +85,7 @@ def main() -> None:
         def representative_dataset():
             images = list(args.rep_data.glob("*.jpg")) + list(args.rep_data.glob("*.png"))
             for img_path in images[:200]:
-                img = Image.open(img_path).convert("RGB").resize((512, 512))
+                img = Image.open(img_path).convert("RGB").resize((width, height))
                 arr = np.asarray(img).astype(np.float32) / 255.0
                 arr = np.expand_dims(arr, axis=0)
                 yield [arr]
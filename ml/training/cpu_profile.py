@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset, default_collate
+
+from dataset import normalize_batch
+
+
+# Settings for training on CPU-only machines, and a quick autotuner that picks batch size and
+# DataLoader workers by measuring samples/s on the actual model and data.
+
+
+CONFIG_NAME = "train_config.json"
+
+
+@dataclass
+class TrainConfig:
+    device_profile: str = "gpu"
+    precision: str = "16-mixed"
+    channels_last: bool = False
+    compile: bool = False
+    threads: Optional[int] = None
+    batch_size: int = 8
+    num_workers: int = 4
+    encoder: Optional[str] = None  # missing from configs saved before it was recorded
+    autotune: Dict[str, List[dict]] = field(default_factory=dict)
+
+    def save(self, out_dir: Path) -> Path:
+        path = Path(out_dir) / CONFIG_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(asdict(self), indent=2), encoding="utf-8")
+        return path
+
+    @classmethod
+    def load(cls, out_dir: Path) -> Optional["TrainConfig"]:
+        path = Path(out_dir) / CONFIG_NAME
+        if not path.exists():
+            return None
+        return cls(**json.loads(path.read_text(encoding="utf-8")))
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        return os.cpu_count() or 1
+
+
+def bf16_supported() -> bool:
+    """Native bf16 matmul/conv on this CPU (AVX512-BF16 or AMX); elsewhere bf16 is emulated and slower than fp32."""
+    try:
+        return bool(torch.cpu._is_avx512_bf16_supported() or torch.cpu._is_amx_tile_supported())
+    except AttributeError:
+        return False
+
+
+def cpu_precision() -> str:
+    return "bf16-mixed" if bf16_supported() else "32-true"
+
+
+def set_threads(threads: int) -> None:
+    torch.set_num_threads(max(1, threads))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first inter-op parallel work has started
+        pass
+
+
+def _sample_batch(ds: Dataset, batch_size: int, collate_fn: Optional[Callable]) -> tuple:
+    samples = [ds[i % len(ds)] for i in range(batch_size)]
+    x, y = (collate_fn or default_collate)(samples)
+    return normalize_batch(x, y)
+
+
+def measure_compute(
+    net: torch.nn.Module,
+    ds: Dataset,
+    batch_size: int,
+    bf16: bool,
+    channels_last: bool,
+    collate_fn: Optional[Callable] = None,
+    steps: int = 3,
+) -> float:
+    """Training-step samples/s (forward, backward, optimizer) for one batch size, data loading excluded."""
+    x, y = _sample_batch(ds, batch_size, collate_fn)
+    if channels_last:
+        x = x.contiguous(memory_format=torch.channels_last)
+    opt = torch.optim.AdamW(net.parameters(), lr=1e-4)
+    net.train()
+
+    def step() -> None:
+        with torch.autocast("cpu", dtype=torch.bfloat16, enabled=bf16):
+            logits = net(x)
+        loss = F.binary_cross_entropy_with_logits(logits.float(), y)
+        opt.zero_grad(set_to_none=True)
+        loss.backward()
+        opt.step()
+
+    step()  # warm-up (allocator, oneDNN primitive caches)
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    return batch_size * steps / (time.perf_counter() - start)
+
+
+def measure_loader(ds: Dataset, batch_size: int, num_workers: int, collate_fn: Optional[Callable] = None, batches: int = 20) -> float:
+    """DataLoader samples/s (including normalize_batch), worker start-up excluded."""
+    loader = DataLoader(ds, batch_size=batch_size, shuffle=True, num_workers=num_workers, collate_fn=collate_fn, drop_last=True)
+    seen = 0
+    start = None
+    for i, (x, y) in enumerate(loader):
+        normalize_batch(x, y)
+        if i == 0:
+            start = time.perf_counter()
+            continue
+        seen += x.shape[0]
+        if i >= batches:
+            break
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    return seen / elapsed if elapsed > 0 else 0.0
+
+
+def autotune(
+    make_net: Callable[[], torch.nn.Module],
+    ds: Dataset,
+    config: TrainConfig,
+    collate_fn: Optional[Callable] = None,
+    batch_sizes: Sequence[int] = (4, 8, 16, 32),
+    worker_counts: Sequence[int] = (0, 1, 2, 4, 8),
+    log: Callable[[str], None] = print,
+) -> TrainConfig:
+    """
+    Pick the batch size with the highest training-step samples/s, then the fewest DataLoader
+    workers whose loader rate keeps up with it (20% headroom), and give the remaining cores to
+    intra-op threads. Updates and returns ``config``; measurements go into ``config.autotune``.
+    """
+    cores = available_cores()
+    set_threads(cores)
+    bf16 = config.precision.startswith("bf16")
+    net = make_net()
+    if config.channels_last:
+        net = net.to(memory_format=torch.channels_last)
+
+    compute_rows: List[dict] = []
+    for bs in sorted(batch_sizes):
+        if bs > len(ds):
+            break
+        try:
+            rate = measure_compute(net, ds, bs, bf16, config.channels_last, collate_fn)
+        except RuntimeError as e:  # out of memory
+            log(f"batch_size={bs}: {e.__class__.__name__}, stopping")
+            break
+        compute_rows.append({"batch_size": bs, "samples_per_s": round(rate, 2)})
+        log(f"batch_size={bs}: {rate:.1f} samples/s compute")
+    if not compute_rows:
+        raise RuntimeError("Autotune could not run a single training step")
+    best = max(compute_rows, key=lambda r: r["samples_per_s"])
+    config.batch_size = best["batch_size"]
+    target = best["samples_per_s"] * 1.2
+
+    loader_rows: List[dict] = []
+    candidates = sorted({w for w in worker_counts if w <= cores})
+    chosen = None
+    for w in candidates:
+        rate = measure_loader(ds, config.batch_size, w, collate_fn)
+        loader_rows.append({"num_workers": w, "samples_per_s": round(rate, 2)})
+        log(f"num_workers={w}: {rate:.1f} samples/s loading")
+        if rate >= target:
+            chosen = w
+            break
+    if chosen is None:
+        chosen = max(loader_rows, key=lambda r: r["samples_per_s"])["num_workers"]
+    config.num_workers = chosen
+    config.threads = max(1, cores - chosen)
+    config.autotune = {"compute": compute_rows, "loader": loader_rows}
+    return config
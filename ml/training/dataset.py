@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+import sys
 from pathlib import Path
 from typing import Callable, List, Tuple
 
@@ -41,12 +43,150 @@ class SegDataset(Dataset):
         return image_t, mask_t
 
 
-def default_transforms(img_size: int = 512) -> A.Compose:
+def _open_frame_store(root: Path):
+    # frame_store lives with the prototype tools; training scripts run from ml/training
+    proto = str(Path(__file__).resolve().parent.parent / "prototype")
+    if proto not in sys.path:
+        sys.path.insert(0, proto)
+    from frame_store import FrameStore
+
+    return FrameStore(root, readonly=True)
+
+
+class StoreSegDataset(Dataset):
+    """
+    SegDataset over a frame store (ml/prototype/frame_store.py) instead of image files.
+    Frames (BGR) and masks are memory-mapped, so nothing is decoded per sample.
+    """
+
+    def __init__(self, store_dir: Path, augment: Callable | None = None):
+        self.store_dir = Path(store_dir)
+        self.augment = augment
+        self._store = None
+        self.keys = _open_frame_store(self.store_dir).keys("frame")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _get_store(self):
+        # Opened lazily so each DataLoader worker maps the chunks itself
+        if self._store is None:
+            self._store = _open_frame_store(self.store_dir)
+        return self._store
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_store"] = None
+        return state
+
+    def __getitem__(self, idx: int):
+        store = self._get_store()
+        key = self.keys[idx]
+        frame = store.get(key, "frame")
+        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if "mask" in store.fields(key):
+            mask = np.asarray(store.get(key, "mask"))
+        else:
+            mask = np.zeros(image.shape[:2], dtype=np.uint8)
+
+        if self.augment is not None:
+            aug = self.augment(image=image, mask=mask)
+            image, mask = aug['image'], aug['mask']
+
+        image = image.astype(np.float32) / 255.0
+        mask = (mask > 127).astype(np.float32)
+
+        image_t = torch.from_numpy(image.transpose(2, 0, 1))
+        mask_t = torch.from_numpy(mask[None, ...])
+        return image_t, mask_t
+
+
+class ShardSegDataset(Dataset):
+    """
+    Dataset over shards written by ``shards.py pack``: images and masks already resized to the
+    training resolution and stored as uint8 .npy arrays that are memory-mapped, not decoded.
+
+    Samples come back as uint8 tensors, image HWC (RGB) and mask 1xHxW (0/255). Float conversion
+    and layout change happen once per batch in ``normalize_batch``, after transfer to the device.
+    Only photometric augmentation applies here since resize/pad was done at pack time.
+    """
+
+    def __init__(self, shards_dir: Path, augment: Callable | None = None):
+        self.shards_dir = Path(shards_dir)
+        self.augment = augment
+        index = json.loads((self.shards_dir / "index.json").read_text(encoding="utf-8"))
+        self.img_size = int(index["img_size"])
+        self.names: List[str] = index["names"]
+        self.shards = index["shards"]
+        self._starts = np.cumsum([0] + [sh["count"] for sh in self.shards])
+        self._arrays: List[Tuple[np.ndarray, np.ndarray]] | None = None
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def _open(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        # Mapped lazily so every DataLoader worker holds its own maps. Copy-on-write mode keeps
+        # the arrays writable for torch.from_numpy without copying anything up front.
+        if self._arrays is None:
+            self._arrays = [
+                (
+                    np.load(self.shards_dir / sh["images"], mmap_mode="c"),
+                    np.load(self.shards_dir / sh["masks"], mmap_mode="c"),
+                )
+                for sh in self.shards
+            ]
+        return self._arrays
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_arrays"] = None
+        return state
+
+    def __getitem__(self, idx: int):
+        if idx < 0:
+            idx += len(self)
+        shard = int(np.searchsorted(self._starts, idx, side="right")) - 1
+        images, masks = self._open()[shard]
+        local = idx - int(self._starts[shard])
+        image = images[local]
+        mask = masks[local]
+
+        if self.augment is not None:
+            aug = self.augment(image=image, mask=mask)
+            image, mask = aug['image'], aug['mask']
+
+        return torch.from_numpy(image), torch.from_numpy(mask)[None, ...]
+
+
+def normalize_batch(x: torch.Tensor, y: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Convert a uint8 batch from ShardSegDataset (N,H,W,3 image, N,1,H,W 0/255 mask) into the
+    float N,3,H,W / N,1,H,W tensors the model trains on. Float batches pass through unchanged.
+    """
+    if x.dtype == torch.uint8:
+        x = x.permute(0, 3, 1, 2).float().div_(255.0)
+    if y.dtype == torch.uint8:
+        y = (y > 127).float()
+    return x, y
+
+
+def resize_transforms(img_size: int = 512) -> A.Compose:
     return A.Compose([
         A.LongestMaxSize(img_size),
         A.PadIfNeeded(img_size, img_size, border_mode=cv2.BORDER_CONSTANT),
+    ])
+
+
+def photometric_transforms() -> A.Compose:
+    return A.Compose([
         A.ColorJitter(p=0.3),
         A.GaussNoise(p=0.2),
         A.Blur(blur_limit=3, p=0.2),
     ])
 
+
+def default_transforms(img_size: int = 512) -> A.Compose:
+    return A.Compose([
+        *resize_transforms(img_size).transforms,
+        *photometric_transforms().transforms,
+    ])
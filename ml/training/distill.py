@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import lightning as L
+import torch
+from torch.utils.data import DataLoader, Subset
+import typer
+from rich import print
+from rich.table import Table
+
+from cpu_profile import cpu_precision
+from dataset import SegDataset, ShardSegDataset, default_transforms, photometric_transforms, resize_transforms
+from export import export_onnx
+from ort_bench import benchmark_onnx, model_size_mb
+from sweep import evaluate_onnx
+from train import SegModule, load_or_create_split
+
+
+# Smaller models for real-time CPU use, derived from a trained teacher checkpoint:
+#   distill  train a narrow student (small encoder, fewer decoder channels) on the ground truth
+#            plus the teacher's soft masks
+#   prune    structured channel pruning of any checkpoint (torch-pruning), then fine-tuning
+#   report   export teacher and candidates through export.py and compare ORT latency and IoU
+#
+# Pruned checkpoints carry the pruned module itself (see SegModule.on_save_checkpoint), so they
+# load and export like any other checkpoint.
+
+
+app = typer.Typer(add_completion=False)
+
+
+def _loaders(
+    images_dir: Optional[Path],
+    masks_dir: Optional[Path],
+    shards: Optional[Path],
+    img_size: int,
+    batch_size: int,
+    num_workers: int,
+    out_dir: Path,
+    val_split: float,
+    seed: int,
+) -> Tuple[DataLoader, DataLoader]:
+    if shards is not None:
+        train_src = ShardSegDataset(shards, augment=photometric_transforms())
+        val_src = ShardSegDataset(shards)
+    elif images_dir is not None and masks_dir is not None:
+        train_src = SegDataset(images_dir, masks_dir, augment=default_transforms(img_size))
+        val_src = SegDataset(images_dir, masks_dir, augment=resize_transforms(img_size))
+    else:
+        raise typer.BadParameter("Pass --shards or both --images-dir and --masks-dir")
+    train_idx, val_idx = load_or_create_split(out_dir / "split.json", len(train_src), val_split, seed)
+    train_loader = DataLoader(Subset(train_src, train_idx), batch_size=batch_size, shuffle=True, num_workers=num_workers)
+    val_loader = DataLoader(Subset(val_src, val_idx), batch_size=batch_size, shuffle=False, num_workers=num_workers)
+    return train_loader, val_loader
+
+
+def _fit(model: SegModule, loaders: Tuple[DataLoader, DataLoader], epochs: int, out_dir: Path) -> Path:
+    trainer = L.Trainer(
+        max_epochs=epochs,
+        precision="16-mixed" if torch.cuda.is_available() else cpu_precision(),
+        default_root_dir=str(out_dir),
+        logger=False,
+        enable_checkpointing=False,
+    )
+    trainer.fit(model, *loaders)
+    ckpt = out_dir / "model.ckpt"
+    trainer.save_checkpoint(str(ckpt))
+    return ckpt
+
+
+def _load(checkpoint: Path, **overrides) -> SegModule:
+    return SegModule.load_from_checkpoint(str(checkpoint), map_location="cpu", pretrained=False, weights_only=False, **overrides)
+
+
+@app.command()
+def distill(
+    teacher: Path = typer.Option(..., exists=True, readable=True, help="Trained teacher checkpoint"),
+    images_dir: Optional[Path] = typer.Option(None, exists=True, readable=True),
+    masks_dir: Optional[Path] = typer.Option(None, exists=True, readable=True),
+    shards: Optional[Path] = typer.Option(None, exists=True, readable=True),
+    encoder: str = typer.Option("mobilenet_v2", help="Student encoder"),
+    decoder_channels: List[int] = typer.Option([128, 64, 32, 16, 8], "--decoder-channel", help="Student decoder widths (5, repeatable)"),
+    alpha: float = typer.Option(0.5, min=0.0, max=1.0, help="Weight of the teacher soft-mask loss vs the ground-truth loss"),
+    temperature: float = typer.Option(2.0, min=0.1),
+    pretrained: bool = typer.Option(True, help="Start the student encoder from ImageNet weights"),
+    img_size: int = typer.Option(512),
+    batch_size: int = typer.Option(8),
+    num_workers: int = typer.Option(4, min=0),
+    epochs: int = typer.Option(20),
+    val_split: float = typer.Option(0.1),
+    seed: int = typer.Option(0),
+    out_dir: Path = typer.Option(Path("runs/student")),
+):
+    """
+    Train a small student on ground-truth masks plus the teacher's temperature-softened masks.
+    """
+    if len(decoder_channels) != 5:
+        raise typer.BadParameter("Pass exactly 5 --decoder-channel values")
+    L.seed_everything(seed, workers=True)
+    loaders = _loaders(images_dir, masks_dir, shards, img_size, batch_size, num_workers, out_dir, val_split, seed)
+    student = SegModule(
+        lr=1e-3,
+        encoder_name=encoder,
+        pretrained=pretrained,
+        decoder_channels=decoder_channels,
+        kd_alpha=alpha,
+        kd_temperature=temperature,
+        teacher=_load(teacher).net,
+    )
+    ckpt = _fit(student, loaders, epochs, out_dir)
+    print(f"[green]Saved student checkpoint to {ckpt}")
+
+
+@app.command()
+def prune(
+    checkpoint: Path = typer.Option(..., exists=True, readable=True, help="Checkpoint to prune (teacher or student)"),
+    images_dir: Optional[Path] = typer.Option(None, exists=True, readable=True),
+    masks_dir: Optional[Path] = typer.Option(None, exists=True, readable=True),
+    shards: Optional[Path] = typer.Option(None, exists=True, readable=True),
+    ratio: float = typer.Option(0.3, min=0.0, max=0.9, help="Fraction of channels removed per prunable layer group"),
+    teacher: Optional[Path] = typer.Option(None, exists=True, readable=True, help="Optionally distill from this teacher while fine-tuning"),
+    alpha: float = typer.Option(0.5, min=0.0, max=1.0),
+    img_size: int = typer.Option(512),
+    batch_size: int = typer.Option(8),
+    num_workers: int = typer.Option(4, min=0),
+    epochs: int = typer.Option(5, help="Fine-tuning epochs after pruning"),
+    val_split: float = typer.Option(0.1),
+    seed: int = typer.Option(0),
+    out_dir: Path = typer.Option(Path("runs/pruned")),
+):
+    """
+    Remove the lowest-magnitude channels (L2, dependency-aware across skips and concats) and fine-tune.
+    """
+    try:
+        import torch_pruning as tp
+    except ImportError as e:
+        raise RuntimeError("torch-pruning is required for pruning: pip install torch-pruning") from e
+
+    L.seed_everything(seed, workers=True)
+    loaders = _loaders(images_dir, masks_dir, shards, img_size, batch_size, num_workers, out_dir, val_split, seed)
+    model = _load(
+        checkpoint,
+        pruned=True,
+        kd_alpha=alpha if teacher is not None else 0.0,
+        teacher=_load(teacher).net if teacher is not None else None,
+    )
+    net = model.net.eval()
+    example = torch.randn(1, 3, img_size, img_size)
+    macs_before, params_before = tp.utils.count_ops_and_params(net, example)
+    pruner = tp.pruner.MetaPruner(
+        net,
+        example,
+        importance=tp.importance.MagnitudeImportance(p=2),
+        pruning_ratio=ratio,
+        ignored_layers=[net.segmentation_head],
+    )
+    pruner.step()
+    macs_after, params_after = tp.utils.count_ops_and_params(net, example)
+    print(f"Pruned {ratio:.0%} of channels: {macs_before / 1e9:.2f} -> {macs_after / 1e9:.2f} GMACs, "
+          f"{params_before / 1e6:.2f}M -> {params_after / 1e6:.2f}M params")
+
+    ckpt = _fit(model, loaders, epochs, out_dir)
+    print(f"[green]Saved pruned checkpoint to {ckpt}")
+
+
+@app.command()
+def report(
+    teacher: Path = typer.Option(..., exists=True, readable=True),
+    models: List[Path] = typer.Option(..., "--model", exists=True, readable=True, help="Student / pruned checkpoints (repeatable)"),
+    images_dir: Path = typer.Option(..., exists=True, readable=True),
+    masks_dir: Path = typer.Option(..., exists=True, readable=True),
+    split: Optional[Path] = typer.Option(None, exists=True, readable=True, help="split.json to evaluate only its val images"),
+    img_size: int = typer.Option(512),
+    runs: int = typer.Option(50, min=1),
+    threads: int = typer.Option(0, min=0, help="ORT intra-op threads (0 = runtime default)"),
+    out_dir: Path = typer.Option(Path("runs/compression")),
+):
+    """
+    Export the teacher and each candidate through export.py and compare ORT CPU latency and IoU.
+    """
+    images = SegDataset(images_dir, masks_dir).images
+    if split is not None:
+        images = [images[i] for i in json.loads(split.read_text(encoding="utf-8"))["val"]]
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    for i, ckpt in enumerate([teacher, *models]):
+        onnx_path = export_onnx(ckpt, out_dir / f"{i:02d}_{ckpt.parent.name}_{ckpt.stem}.onnx", img_size, img_size)
+        bench = benchmark_onnx(onnx_path, img_size, img_size, runs=runs, threads=threads)
+        quality = evaluate_onnx(onnx_path, images, masks_dir)
+        params = sum(p.numel() for p in _load(ckpt).parameters())
+        rows.append({"checkpoint": str(ckpt), "params_m": round(params / 1e6, 2), "size_mb": model_size_mb(onnx_path), **bench, **quality})
+
+    base = rows[0]
+    table = Table(title=f"{len(images)} images at {img_size}px, ORT CPU batch 1")
+    for col in ("model", "params M", "onnx MB", "p50 ms", "speedup", "IoU", "dIoU", "arc err %"):
+        table.add_column(col, justify="left" if col == "model" else "right")
+    for r in rows:
+        name = "teacher" if r is base else Path(r["checkpoint"]).parent.name
+        table.add_row(name, f"{r['params_m']:.2f}", f"{r['size_mb']:.1f}", f"{r['p50_ms']:.1f}", f"x{base['p50_ms'] / r['p50_ms']:.2f}",
+                      f"{r['iou']:.3f}", f"{r['iou'] - base['iou']:+.3f}", f"{r['arc_length_err_pct']:.1f}")
+    print(table)
+    (out_dir / "report.json").write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    print(f"[green]Saved {out_dir / 'report.json'}")
+
+
+if __name__ == "__main__":
+    app()
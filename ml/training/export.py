@@ -1,42 +1,199 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
 
-import lightning as L
+import numpy as np
 import onnx
 import torch
 import typer
 
+from ort_bench import benchmark_onnx, model_size_mb
 from train import SegModule
 
 
+# Preprocessing contract embedded in every exported model's metadata (key "preprocessing"), so
+# runtimes don't have to hard-code what training did: RGB, scaled to 0..1 (no mean/std), NCHW,
+# longest side resized to input_size and centre-padded; logits > 0 is foreground. Models with
+# dynamic height/width take any size that is a multiple of ``stride``.
+PREPROCESSING = {
+    "layout": "NCHW",
+    "color": "RGB",
+    "scale": 1.0 / 255.0,
+    "mean": [0.0, 0.0, 0.0],
+    "std": [1.0, 1.0, 1.0],
+    "resize": "letterbox-center",
+    "stride": 32,
+    "output": "logits",
+    "threshold_logit": 0.0,
+}
+
+
 app = typer.Typer(add_completion=False)
 
 
-@app.command()
-def onnx_export(
-    checkpoint: Path = typer.Option(..., exists=True, readable=True),
-    out_onnx: Path = typer.Option(Path("segmentation.onnx")),
-    height: int = typer.Option(512),
-    width: int = typer.Option(512),
-):
-    model = SegModule.load_from_checkpoint(str(checkpoint))
+def _load_model(checkpoint: Path) -> SegModule:
+    # Weights come from the checkpoint, so don't fetch pretrained encoder weights first. Pruned
+    # checkpoints pickle the pruned module, which weights-only loading refuses.
+    model = SegModule.load_from_checkpoint(str(checkpoint), map_location="cpu", pretrained=False, weights_only=False)
     model.eval()
+    return model
+
+
+def _write_metadata(out_onnx: Path, meta: dict) -> None:
+    model = onnx.load(str(out_onnx))
+    del model.metadata_props[:]
+    for key, value in meta.items():
+        prop = model.metadata_props.add()
+        prop.key = key
+        prop.value = value if isinstance(value, str) else json.dumps(value)
+    onnx.checker.check_model(model)
+    # Re-saving inlines weights the exporter may have put in a .data sidecar; one file is easier to ship
+    onnx.save(model, str(out_onnx))
+    sidecar = out_onnx.with_name(out_onnx.name + ".data")
+    if sidecar.exists():
+        sidecar.unlink()
+
+
+def export_onnx(
+    checkpoint: Path,
+    out_onnx: Path,
+    height: int = 512,
+    width: int = 512,
+    dynamic_hw: bool = False,
+    model: Optional[SegModule] = None,
+) -> Path:
+    model = model or _load_model(checkpoint)
     x = torch.randn(1, 3, height, width)
+    axes = {0: "batch", 2: "height", 3: "width"} if dynamic_hw else {0: "batch"}
     torch.onnx.export(
         model,
         x,
         str(out_onnx),
         input_names=["input"],
         output_names=["logits"],
-        opset_version=17,
-        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        # The dynamo exporter emits opset 18 natively; asking for 17 only triggers a failing down-conversion
+        opset_version=18,
+        do_constant_folding=True,
+        dynamic_axes={"input": axes, "logits": axes},
     )
-    onnx_model = onnx.load(str(out_onnx))
-    onnx.checker.check_model(onnx_model)
-    typer.echo(f"Saved ONNX to {out_onnx}")
+    meta = {
+        "preprocessing": {**PREPROCESSING, "input_size": [height, width], "dynamic_hw": dynamic_hw},
+        "encoder": model.hparams.get("encoder_name", ""),
+        "source_checkpoint": Path(checkpoint).name,
+    }
+    _write_metadata(out_onnx, meta)
+    return out_onnx
+
+
+def optimize_onnx(onnx_path: Path, ort_format: bool = False, level: str = "extended") -> Path:
+    """
+    Run ONNX Runtime's offline graph optimizations once (constant folding, redundant node removal,
+    node fusions) and save the result next to the input as ``*.opt.onnx``, or as ``*.ort`` for
+    ORT-format / minimal-build runtimes.
+
+    ``level="extended"`` stays portable across CPUs. ORT-format models are not re-optimized when
+    loaded, so they miss the CPU-specific NCHWc layout transforms that ``"all"`` bakes in; use it
+    for ``.ort`` files that will run on the same kind of CPU they were built on.
+    """
+    import onnxruntime as ort
+
+    levels = {"extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED, "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL}
+    if level not in levels:
+        raise ValueError(f"level must be one of {sorted(levels)}, got {level!r}")
+    out = onnx_path.with_suffix(".ort" if ort_format else ".opt.onnx")
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = levels[level]
+    opts.optimized_model_filepath = str(out)
+    if ort_format:
+        opts.add_session_config_entry("session.save_model_format", "ORT")
+    ort.InferenceSession(str(onnx_path), sess_options=opts, providers=["CPUExecutionProvider"])
+    return out
+
+
+def parity_check(model: SegModule, onnx_path: Path, shapes: Sequence[Tuple[int, int]], batch: int = 2) -> dict:
+    """Max abs logit difference and foreground agreement between PyTorch and ORT on random inputs."""
+    import onnxruntime as ort
+
+    sess = ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"])
+    gen = torch.Generator().manual_seed(0)
+    max_diff, agree = 0.0, 1.0
+    for h, w in shapes:
+        x = torch.rand(batch, 3, h, w, generator=gen)
+        with torch.no_grad():
+            ref = model(x).float().numpy()
+        out = sess.run(None, {"input": x.numpy()})[0]
+        max_diff = max(max_diff, float(np.abs(out - ref).max()))
+        agree = min(agree, float(np.mean((out > 0) == (ref > 0))))
+    return {"max_abs_diff": max_diff, "mask_agreement": agree}
+
+
+def _parse_bucket(value: str) -> Tuple[int, int]:
+    try:
+        h, w = (int(v) for v in value.lower().split("x"))
+    except ValueError as e:
+        raise typer.BadParameter(f"Bucket must look like 384x512, got {value!r}") from e
+    if h % 32 or w % 32:
+        raise typer.BadParameter(f"Bucket {value} must be a multiple of 32 in both dimensions")
+    return h, w
+
+
+@app.command()
+def onnx_export(
+    checkpoint: Path = typer.Option(..., exists=True, readable=True),
+    out_onnx: Path = typer.Option(Path("segmentation.onnx")),
+    height: int = typer.Option(512),
+    width: int = typer.Option(512),
+    dynamic_hw: bool = typer.Option(False, help="Dynamic height and width (multiples of 32) instead of a fixed shape"),
+    buckets: List[str] = typer.Option([], "--bucket", help="Also export fixed-shape models, e.g. --bucket 384x512 (repeatable)"),
+    optimize: bool = typer.Option(True, help="Save an ORT-optimized copy (*.opt.onnx) next to each export"),
+    ort_format: bool = typer.Option(False, help="Also save an ORT-format model (*.ort)"),
+    ort_level: str = typer.Option("extended", help="Optimization level baked into *.ort: extended (portable) or all (CPU-specific, faster)"),
+    atol: float = typer.Option(1e-3, help="Parity tolerance on logits between PyTorch and each exported model"),
+    latency_runs: int = typer.Option(20, min=0, help="Timed ORT runs per model for the latency report (0 = skip)"),
+):
+    """
+    Export ONNX with embedded preprocessing metadata, optimize it for ONNX Runtime, check parity
+    against PyTorch and report latency.
+    """
+    if ort_level not in ("extended", "all"):
+        raise typer.BadParameter("--ort-level must be extended or all")
+    model = _load_model(checkpoint)
+    targets = [(out_onnx, height, width, dynamic_hw)]
+    for b in buckets:
+        h, w = _parse_bucket(b)
+        targets.append((out_onnx.with_name(f"{out_onnx.stem}_{h}x{w}{out_onnx.suffix}"), h, w, False))
+
+    rows = []
+    failed = False
+    for path, h, w, dyn in targets:
+        export_onnx(checkpoint, path, h, w, dynamic_hw=dyn, model=model)
+        produced = [path]
+        if optimize:
+            produced.append(optimize_onnx(path))
+        if ort_format:
+            produced.append(optimize_onnx(path, ort_format=True, level=ort_level))
+        # Dynamic models are also checked at a second, non-square shape
+        shapes = [(h, w), (max(32, h // 64 * 32), w)] if dyn else [(h, w)]
+        for p in produced:
+            parity = parity_check(model, p, shapes)
+            ok = parity["max_abs_diff"] <= atol
+            failed |= not ok
+            row = {"model": str(p), "height": h, "width": w, "dynamic_hw": dyn, "size_mb": model_size_mb(p), **parity, "parity_ok": ok}
+            if latency_runs > 0:
+                row.update(benchmark_onnx(p, h, w, runs=latency_runs))
+            rows.append(row)
+            lat = f", p50 {row['p50_ms']} ms" if latency_runs > 0 else ""
+            typer.echo(f"{p.name}: {row['size_mb']} MB, max|diff| {parity['max_abs_diff']:.2e}, "
+                       f"mask agreement {parity['mask_agreement']:.4f}{lat}{'' if ok else '  PARITY FAILED'}")
+
+    report = out_onnx.with_name(out_onnx.stem + ".export.json")
+    report.write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    typer.echo(f"Saved ONNX to {out_onnx} (report: {report})")
+    if failed:
+        raise typer.Exit(code=1)
 
 
 if __name__ == "__main__":
     app()
-
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import typer
+
+
+# ONNX Runtime CPU latency and memory for exported models. Each measurement runs in a fresh
+# interpreter that imports only NumPy and ONNX Runtime, so peak RSS reflects that model's session
+# rather than whatever the caller (e.g. a training run with torch loaded) has allocated.
+
+
+def _peak_rss_kb() -> int:
+    # VmHWM belongs to this process image; ru_maxrss is carried over from a parent across
+    # fork+exec, so it would report the (much larger) caller's peak
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(model_path: str, height: int, width: int, batch: int, runs: int, warmup: int, threads: int) -> dict:
+    import onnxruntime as ort
+
+    base_kb = _peak_rss_kb()
+    opts = ort.SessionOptions()
+    if threads > 0:
+        opts.intra_op_num_threads = threads
+    start = time.perf_counter()
+    sess = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+    load_ms = (time.perf_counter() - start) * 1000.0
+    name = sess.get_inputs()[0].name
+    x = np.random.default_rng(0).random((batch, 3, height, width), dtype=np.float32)
+    for _ in range(warmup):
+        sess.run(None, {name: x})
+    lat = np.empty(runs, dtype=np.float64)
+    for i in range(runs):
+        t0 = time.perf_counter()
+        sess.run(None, {name: x})
+        lat[i] = (time.perf_counter() - t0) * 1000.0
+    peak_kb = _peak_rss_kb()
+    return {
+        "load_ms": round(load_ms, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+        "mem_mb": round((peak_kb - base_kb) / 1024.0, 1),
+    }
+
+
+def benchmark_onnx(
+    model_path: Path,
+    height: int,
+    width: int,
+    batch: int = 1,
+    runs: int = 50,
+    warmup: int = 5,
+    threads: int = 0,
+    isolate: bool = True,
+) -> dict:
+    """
+    Latency (p50/p95 ms per call), session load time and extra peak RSS of one model on the ORT
+    CPU provider. ``threads=0`` keeps the runtime's default intra-op thread count.
+    """
+    if not isolate:
+        return _measure(str(model_path), height, width, batch, runs, warmup, threads)
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()),
+        "--model", str(model_path), "--height", str(height), "--width", str(width), "--batch", str(batch),
+        "--runs", str(runs), "--warmup", str(warmup), "--threads", str(threads), "--json",
+    ]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def model_size_mb(model_path: Path) -> float:
+    """On-disk size including an external-data sidecar (``model.onnx.data``) if the exporter wrote one."""
+    path = Path(model_path)
+    size = path.stat().st_size
+    sidecar = path.with_name(path.name + ".data")
+    if sidecar.exists():
+        size += sidecar.stat().st_size
+    return round(size / (1 << 20), 2)
+
+
+app = typer.Typer(add_completion=False)
+
+
+@app.command()
+def main(
+    model: Path = typer.Option(..., exists=True, readable=True, help="ONNX or .ort model"),
+    height: int = typer.Option(512),
+    width: int = typer.Option(512),
+    batch: int = typer.Option(1, min=1),
+    runs: int = typer.Option(50, min=1),
+    warmup: int = typer.Option(5, min=0),
+    threads: int = typer.Option(0, min=0, help="Intra-op threads (0 = runtime default)"),
+    json_out: bool = typer.Option(False, "--json", help="Print one JSON line instead of text"),
+):
+    """
+    Measure ONNX Runtime CPU latency and memory of one model in this process.
+    """
+    result = _measure(str(model), height, width, batch, runs, warmup, threads)
+    result["size_mb"] = model_size_mb(model)
+    if json_out:
+        typer.echo(json.dumps(result))
+    else:
+        typer.echo(f"{model.name}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                   f"load {result['load_ms']} ms, +{result['mem_mb']} MB RSS, {result['size_mb']} MB on disk")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+import torch
+import typer
+from rich import print
+from torch.utils.data import DataLoader
+
+from dataset import (
+    SegDataset,
+    ShardSegDataset,
+    default_transforms,
+    normalize_batch,
+    photometric_transforms,
+    resize_transforms,
+)
+
+
+# One-time preprocessing for training: decode, resize/pad to the training resolution and pack
+# images and masks as uint8 into memory-mapped .npy shards.
+#
+#   index.json                {"img_size", "names", "shards": [{"images", "masks", "count"}]}
+#   shard_00000.images.npy    (count, img_size, img_size, 3) uint8 RGB
+#   shard_00000.masks.npy     (count, img_size, img_size) uint8 0/255
+
+
+app = typer.Typer(add_completion=False)
+
+
+def _load_resized(img_path: Path, masks_dir: Path, img_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    image = cv2.imread(str(img_path))
+    if image is None:
+        raise ValueError(f"Could not read {img_path}")
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    mask = cv2.imread(str(masks_dir / img_path.name), cv2.IMREAD_GRAYSCALE)
+    if mask is None:
+        mask = np.zeros(image.shape[:2], dtype=np.uint8)
+    # Same resize/pad as the on-the-fly training transforms, so packed samples match them
+    out = resize_transforms(img_size)(image=image, mask=mask)
+    return out["image"], out["mask"]
+
+
+@app.command()
+def pack(
+    images_dir: Path = typer.Option(..., exists=True, readable=True),
+    masks_dir: Path = typer.Option(..., exists=True, readable=True),
+    out_dir: Path = typer.Option(Path("shards")),
+    img_size: int = typer.Option(512),
+    shard_size: int = typer.Option(2048, min=1, help="Samples per shard file"),
+    workers: int = typer.Option(4, min=1, help="Decode/resize threads"),
+):
+    """
+    Decode and resize a SegDataset directory once into uint8 memory-mapped shards.
+    """
+    src = SegDataset(images_dir, masks_dir)
+    paths: List[Path] = src.images
+    if not paths:
+        raise typer.BadParameter("No images found")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    shards = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for s, first in enumerate(range(0, len(paths), shard_size)):
+            chunk = paths[first:first + shard_size]
+            images_name = f"shard_{s:05d}.images.npy"
+            masks_name = f"shard_{s:05d}.masks.npy"
+            images = np.lib.format.open_memmap(out_dir / images_name, mode="w+", dtype=np.uint8, shape=(len(chunk), img_size, img_size, 3))
+            masks = np.lib.format.open_memmap(out_dir / masks_name, mode="w+", dtype=np.uint8, shape=(len(chunk), img_size, img_size))
+            for i, (img, msk) in enumerate(pool.map(lambda p: _load_resized(p, masks_dir, img_size), chunk)):
+                images[i] = img
+                masks[i] = msk
+            images.flush()
+            masks.flush()
+            del images, masks
+            shards.append({"images": images_name, "masks": masks_name, "count": len(chunk)})
+
+    index = {"img_size": img_size, "names": [p.name for p in paths], "shards": shards}
+    (out_dir / "index.json").write_text(json.dumps(index, indent=2), encoding="utf-8")
+    elapsed = time.perf_counter() - start
+    print(f"[green]Packed {len(paths)} samples into {len(shards)} shard(s) at {out_dir} in {elapsed:.1f}s")
+
+
+def _samples_per_sec(ds, batch_size: int, num_workers: int, batches: int) -> float:
+    loader = DataLoader(ds, batch_size=batch_size, shuffle=True, num_workers=num_workers, drop_last=True)
+    seen = 0
+    start = None
+    for i, (x, y) in enumerate(loader):
+        x, y = normalize_batch(x, y)
+        if i == 0:
+            # Exclude worker start-up from the measurement
+            start = time.perf_counter()
+            continue
+        seen += x.shape[0]
+        if i >= batches:
+            break
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    return seen / elapsed if elapsed > 0 else 0.0
+
+
+@app.command()
+def bench(
+    images_dir: Path = typer.Option(..., exists=True, readable=True),
+    masks_dir: Path = typer.Option(..., exists=True, readable=True),
+    shards_dir: Path = typer.Option(..., exists=True, readable=True),
+    batch_size: int = typer.Option(8),
+    num_workers: int = typer.Option(4),
+    batches: int = typer.Option(50, help="Batches to time (after the first)"),
+):
+    """
+    Compare DataLoader samples/s: per-sample decode (SegDataset) vs packed shards (ShardSegDataset).
+    """
+    torch.manual_seed(0)
+    ds_files = SegDataset(images_dir, masks_dir, augment=default_transforms(ShardSegDataset(shards_dir).img_size))
+    ds_shards = ShardSegDataset(shards_dir, augment=photometric_transforms())
+    ds_shards_raw = ShardSegDataset(shards_dir)
+    rows = [
+        ("SegDataset (decode + resize + augment)", _samples_per_sec(ds_files, batch_size, num_workers, batches)),
+        ("ShardSegDataset (augment)", _samples_per_sec(ds_shards, batch_size, num_workers, batches)),
+        ("ShardSegDataset (no augment)", _samples_per_sec(ds_shards_raw, batch_size, num_workers, batches)),
+    ]
+    base = rows[0][1]
+    for name, rate in rows:
+        speedup = rate / base if base > 0 else 0.0
+        print(f"{name:<42} {rate:8.1f} samples/s  x{speedup:.2f}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import json
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List
+
+import cv2
+import lightning as L
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Subset
+import typer
+from rich import print
+from rich.table import Table
+
+from cpu_profile import cpu_precision
+from dataset import SegDataset, default_transforms, resize_transforms
+from export import export_onnx
+from ort_bench import benchmark_onnx, model_size_mb
+from train import SegModule, load_or_create_split
+
+
+# Encoder x input-size sweep: train each combination on the same seeded split, export it through
+# export.py, then measure ONNX Runtime CPU latency/memory, IoU at full image resolution (through
+# OnnxSegmenter, as the prototype tools run it) and the downstream compute_metrics error against
+# the ground-truth masks. Results are cached per combination, so an interrupted sweep picks up
+# where it stopped.
+
+
+def _prototype():
+    proto = str(Path(__file__).resolve().parent.parent / "prototype")
+    if proto not in sys.path:
+        sys.path.insert(0, proto)
+    from geometry import compute_metrics
+    from segmentation import OnnxSegmenter
+
+    return compute_metrics, OnnxSegmenter
+
+
+@dataclass
+class SweepResult:
+    encoder: str
+    img_size: int
+    params_m: float
+    size_mb: float
+    p50_ms: float
+    p95_ms: float
+    mem_mb: float
+    iou: float
+    arc_length_err_pct: float
+    curvature_err_deg: float
+    pareto: bool = False
+
+
+def _train(
+    encoder: str,
+    img_size: int,
+    images_dir: Path,
+    masks_dir: Path,
+    train_idx: List[int],
+    val_idx: List[int],
+    run_dir: Path,
+    epochs: int,
+    batch_size: int,
+    num_workers: int,
+    pretrained: bool,
+    seed: int,
+) -> Path:
+    L.seed_everything(seed, workers=True)
+    train_ds = Subset(SegDataset(images_dir, masks_dir, augment=default_transforms(img_size)), train_idx)
+    val_ds = Subset(SegDataset(images_dir, masks_dir, augment=resize_transforms(img_size)), val_idx)
+    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True, num_workers=num_workers)
+    val_loader = DataLoader(val_ds, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+    model = SegModule(lr=1e-3, encoder_name=encoder, pretrained=pretrained)
+    trainer = L.Trainer(
+        max_epochs=epochs,
+        precision="16-mixed" if torch.cuda.is_available() else cpu_precision(),
+        default_root_dir=str(run_dir),
+        logger=False,
+        enable_checkpointing=False,
+    )
+    trainer.fit(model, train_loader, val_loader)
+    ckpt = run_dir / "model.ckpt"
+    trainer.save_checkpoint(str(ckpt))
+    return ckpt
+
+
+def evaluate_onnx(onnx_path: Path, images: List[Path], masks_dir: Path, batch: int = 4) -> dict:
+    """
+    Full-resolution IoU of an exported model and the compute_metrics error of its masks against
+    the ground truth: relative arc length error and absolute max-curvature error.
+    """
+    compute_metrics, OnnxSegmenter = _prototype()
+    seg = OnnxSegmenter(onnx_path)
+    ious, arc_err, curv_err = [], [], []
+    for first in range(0, len(images), batch):
+        paths = images[first:first + batch]
+        frames = [cv2.imread(str(p)) for p in paths]
+        for p, pred in zip(paths, seg.predict_masks(frames)):
+            gt = cv2.imread(str(masks_dir / p.name), cv2.IMREAD_GRAYSCALE)
+            if gt is None:
+                continue
+            gt = np.where(gt > 127, 255, 0).astype(np.uint8)
+            inter = np.count_nonzero((pred > 0) & (gt > 0))
+            union = np.count_nonzero((pred > 0) | (gt > 0))
+            ious.append(inter / union if union else 1.0)
+            # pixels_per_mm=1 keeps lengths in pixels
+            m_gt, _, _ = compute_metrics(gt, pixels_per_mm=1.0)
+            m_pred, _, _ = compute_metrics(pred, pixels_per_mm=1.0)
+            if m_gt.arc_length_mm > 0:
+                arc_err.append(abs(m_pred.arc_length_mm - m_gt.arc_length_mm) / m_gt.arc_length_mm * 100.0)
+            curv_err.append(abs(m_pred.max_curvature_deg - m_gt.max_curvature_deg))
+    return {
+        "iou": float(np.mean(ious)) if ious else 0.0,
+        "arc_length_err_pct": float(np.mean(arc_err)) if arc_err else 0.0,
+        "curvature_err_deg": float(np.mean(curv_err)) if curv_err else 0.0,
+    }
+
+
+def mark_pareto(results: List[SweepResult]) -> None:
+    """Flag results not dominated on (lower p50 latency, higher IoU)."""
+    for r in results:
+        r.pareto = not any(
+            o is not r and o.p50_ms <= r.p50_ms and o.iou >= r.iou and (o.p50_ms < r.p50_ms or o.iou > r.iou)
+            for o in results
+        )
+
+
+app = typer.Typer(add_completion=False)
+
+
+@app.command()
+def main(
+    images_dir: Path = typer.Option(..., exists=True, readable=True),
+    masks_dir: Path = typer.Option(..., exists=True, readable=True),
+    encoders: List[str] = typer.Option(["timm-efficientnet-b0", "mobilenet_v2", "resnet18"], "--encoder", help="Encoders to try (repeatable)"),
+    img_sizes: List[int] = typer.Option([256, 384, 512], "--img-size", help="Input sizes to try (repeatable)"),
+    epochs: int = typer.Option(10),
+    batch_size: int = typer.Option(8),
+    num_workers: int = typer.Option(4, min=0),
+    val_split: float = typer.Option(0.1),
+    seed: int = typer.Option(0),
+    pretrained: bool = typer.Option(True, help="Fine-tune from ImageNet encoder weights"),
+    threads: int = typer.Option(0, min=0, help="ORT intra-op threads for latency (0 = runtime default)"),
+    runs: int = typer.Option(50, min=1, help="Timed inferences per model"),
+    out_dir: Path = typer.Option(Path("runs/sweep")),
+):
+    """
+    Train, export and benchmark each encoder x input-size combination; print a Pareto table.
+    """
+    images = SegDataset(images_dir, masks_dir).images
+    train_idx, val_idx = load_or_create_split(out_dir / "split.json", len(images), val_split, seed)
+    val_images = [images[i] for i in val_idx]
+
+    results: List[SweepResult] = []
+    for encoder in encoders:
+        for img_size in img_sizes:
+            run_dir = out_dir / f"{encoder}_{img_size}"
+            cached = run_dir / "result.json"
+            if cached.exists():
+                results.append(SweepResult(**json.loads(cached.read_text(encoding="utf-8"))))
+                print(f"[dim]{encoder} @ {img_size}: cached[/dim]")
+                continue
+            run_dir.mkdir(parents=True, exist_ok=True)
+            print(f"[bold]{encoder} @ {img_size}: training...[/bold]")
+            ckpt = _train(encoder, img_size, images_dir, masks_dir, train_idx, val_idx, run_dir,
+                          epochs, batch_size, num_workers, pretrained, seed)
+            onnx_path = export_onnx(ckpt, run_dir / "model.onnx", img_size, img_size)
+            params = sum(p.numel() for p in SegModule.load_from_checkpoint(str(ckpt), map_location="cpu", pretrained=False).parameters())
+            bench = benchmark_onnx(onnx_path, img_size, img_size, runs=runs, threads=threads)
+            quality = evaluate_onnx(onnx_path, val_images, masks_dir)
+            result = SweepResult(
+                encoder=encoder,
+                img_size=img_size,
+                params_m=round(params / 1e6, 2),
+                size_mb=model_size_mb(onnx_path),
+                p50_ms=bench["p50_ms"],
+                p95_ms=bench["p95_ms"],
+                mem_mb=bench["mem_mb"],
+                **{k: round(v, 4) for k, v in quality.items()},
+            )
+            cached.write_text(json.dumps(asdict(result), indent=2), encoding="utf-8")
+            results.append(result)
+
+    mark_pareto(results)
+    results.sort(key=lambda r: r.p50_ms)
+    (out_dir / "sweep.json").write_text(json.dumps([asdict(r) for r in results], indent=2), encoding="utf-8")
+
+    table = Table(title=f"{len(val_images)} validation images, ORT CPU batch 1")
+    for col in ("encoder", "size", "params M", "onnx MB", "p50 ms", "p95 ms", "mem MB", "IoU", "arc err %", "curv err deg", "pareto"):
+        table.add_column(col, justify="left" if col == "encoder" else "right")
+    for r in results:
+        table.add_row(r.encoder, str(r.img_size), f"{r.params_m:.2f}", f"{r.size_mb:.1f}", f"{r.p50_ms:.1f}", f"{r.p95_ms:.1f}",
+                      f"{r.mem_mb:.0f}", f"{r.iou:.3f}", f"{r.arc_length_err_pct:.1f}", f"{r.curvature_err_deg:.1f}",
+                      "*" if r.pareto else "")
+    print(table)
+    print(f"[green]Saved {out_dir / 'sweep.json'}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,7 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# Training modules use flat imports (``from dataset import ...``); make them importable.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from batch_augment import BatchAugment, BatchAugmentCollate
+
+
+def _epochs(seed: int, epochs: int = 2):
+    images = torch.full((16, 8, 8, 3), 128, dtype=torch.uint8)
+    masks = torch.zeros((16, 8, 8), dtype=torch.uint8)
+    augment = BatchAugment(seed=0, p_color=1.0, p_noise=1.0, p_blur=0.0)
+    torch.manual_seed(seed)
+    # Workers are recreated each epoch, as they are in training without persistent_workers
+    loader = DataLoader(TensorDataset(images, masks), batch_size=4, num_workers=1,
+                        collate_fn=BatchAugmentCollate(augment))
+    return [torch.cat([x.clone() for x, _ in loader]) for _ in range(epochs)]
+
+
+def test_epochs_draw_different_augmentations():
+    first, second = _epochs(seed=0)
+    assert not torch.equal(first, second)
+
+
+def test_same_torch_seed_reproduces():
+    assert all(torch.equal(a, b) for a, b in zip(_epochs(seed=3), _epochs(seed=3)))
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import pytest
+from typer.testing import CliRunner
+
+from cpu_profile import TrainConfig
+from train import DEFAULT_ENCODER, app
+
+
+@pytest.fixture
+def run_dir(tmp_path):
+    (tmp_path / "checkpoints").mkdir()
+    (tmp_path / "checkpoints" / "last.ckpt").write_bytes(b"")
+    TrainConfig(device_profile="cpu", precision="32-true", channels_last=True, batch_size=16, num_workers=2,
+                encoder="resnet18").save(tmp_path)
+    return tmp_path
+
+
+def _invoke(*args: str):
+    result = CliRunner().invoke(app, list(args))
+    return result, " ".join(result.output.split())
+
+
+def test_resume_rejects_flags_that_differ_from_saved_config(run_dir):
+    result, output = _invoke("--out-dir", str(run_dir), "--encoder", DEFAULT_ENCODER, "--batch-size", "16", "--num-workers", "4")
+    assert result.exit_code != 0
+    assert f"--encoder {DEFAULT_ENCODER} (saved: resnet18)" in output
+    assert "--num-workers 4 (saved: 2)" in output
+    assert "--batch-size" not in output  # same as saved
+
+
+def test_resume_accepts_defaults_and_matching_flags(run_dir):
+    # Gets past the config check to the dataset check, which needs an input
+    result, output = _invoke("--out-dir", str(run_dir), "--encoder", "resnet18")
+    assert result.exit_code != 0
+    assert "Pass --shards" in output
+    # Without the checkpoint nothing is resumed, so flags apply as given
+    (run_dir / "checkpoints" / "last.ckpt").unlink()
+    result, output = _invoke("--out-dir", str(run_dir), "--encoder", DEFAULT_ENCODER)
+    assert "Pass --shards" in output
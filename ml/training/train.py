@@ -1,28 +1,81 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Sequence, Tuple
 
 import lightning as L
 import segmentation_models_pytorch as smp
 import torch
 import torch.nn.functional as F
-from torch.utils.data import DataLoader, random_split
+from torch.utils.data import DataLoader, Subset
 import typer
 from rich import print
 
-from dataset import SegDataset, default_transforms
+from batch_augment import BatchAugment, BatchAugmentCollate
+from callbacks import ResumeCheckpoint, ThroughputLogger
+from cpu_profile import CONFIG_NAME, TrainConfig, autotune, available_cores, cpu_precision, set_threads
+from dataset import SegDataset, ShardSegDataset, StoreSegDataset, default_transforms, normalize_batch, photometric_transforms
+
+
+DEFAULT_ENCODER = "timm-efficientnet-b0"
+
+
+def build_net(
+    encoder_name: str = DEFAULT_ENCODER,
+    pretrained: bool = True,
+    decoder_channels: Optional[Sequence[int]] = None,
+) -> torch.nn.Module:
+    kwargs = {"decoder_channels": tuple(decoder_channels)} if decoder_channels else {}
+    return smp.Unet(encoder_name=encoder_name, encoder_weights="imagenet" if pretrained else None, in_channels=3, classes=1, **kwargs)
 
 
 class SegModule(L.LightningModule):
-    def __init__(self, lr: float = 1e-3):
+    def __init__(
+        self,
+        lr: float = 1e-3,
+        channels_last: bool = False,
+        encoder_name: str = DEFAULT_ENCODER,
+        pretrained: bool = True,
+        decoder_channels: Optional[List[int]] = None,
+        kd_alpha: float = 0.0,
+        kd_temperature: float = 2.0,
+        pruned: bool = False,
+        teacher: Optional[torch.nn.Module] = None,
+    ):
         super().__init__()
-        self.save_hyperparameters()
-        self.net = smp.Unet(encoder_name="timm-efficientnet-b0", in_channels=3, classes=1)
+        self.save_hyperparameters(ignore=["teacher"])
+        # pretrained only matters for a fresh model; pass pretrained=False when loading a checkpoint
+        self.net = build_net(encoder_name, pretrained, decoder_channels)
+        if channels_last:
+            # NHWC activations let oneDNN pick its fastest CPU convolution kernels
+            self.net = self.net.to(memory_format=torch.channels_last)
+        # Kept out of the module tree so its weights never end up in this model's checkpoints
+        self.__dict__["teacher"] = teacher.eval().requires_grad_(False) if teacher is not None else None
 
     def forward(self, x):
         return self.net(x)
 
+    def on_fit_start(self):
+        if self.teacher is not None:
+            self.teacher.to(self.device)
+
+    def on_save_checkpoint(self, checkpoint):
+        # Pruned nets no longer match what build_net() creates from the hparams, so store the module itself
+        if self.hparams.pruned:
+            checkpoint["pruned_net"] = self.net
+
+    def on_load_checkpoint(self, checkpoint):
+        if "pruned_net" in checkpoint:
+            self.net = checkpoint["pruned_net"]
+
+    def on_after_batch_transfer(self, batch, dataloader_idx: int):
+        # Shard datasets yield uint8 batches; convert once per batch on the target device
+        x, y = normalize_batch(*batch)
+        if self.hparams.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        return x, y
+
     def configure_optimizers(self):
         opt = torch.optim.AdamW(self.parameters(), lr=self.hparams.lr)
         sch = torch.optim.lr_scheduler.CosineAnnealingLR(opt, T_max=20)
@@ -32,6 +85,14 @@ class SegModule(L.LightningModule):
         x, y = batch
         logits = self(x)
         loss = smp.losses.DiceLoss(mode="binary")(logits, y) + F.binary_cross_entropy_with_logits(logits, y)
+        if stage == "train" and self.teacher is not None and self.hparams.kd_alpha > 0:
+            # Distillation: match the teacher's temperature-softened per-pixel probabilities
+            t = self.hparams.kd_temperature
+            with torch.no_grad():
+                soft = torch.sigmoid(self.teacher(x).float() / t)
+            kd = F.binary_cross_entropy_with_logits(logits.float() / t, soft) * (t * t)
+            self.log("train/kd_loss", kd)
+            loss = (1.0 - self.hparams.kd_alpha) * loss + self.hparams.kd_alpha * kd
         with torch.no_grad():
             preds = (torch.sigmoid(logits) > 0.5).float()
             iou = (preds * y).sum() / ((preds + y - preds * y).sum() + 1e-6)
@@ -46,30 +107,146 @@ class SegModule(L.LightningModule):
         self._step(batch, "val")
 
 
+def load_or_create_split(path: Path, n: int, val_split: float, seed: int) -> Tuple[List[int], List[int]]:
+    """
+    Seeded train/val split over ``n`` samples, written to ``path`` on first use and read back on
+    later runs (e.g. when resuming) so validation never leaks into training.
+    """
+    if path.exists():
+        split = json.loads(path.read_text(encoding="utf-8"))
+        if split["size"] != n:
+            raise typer.BadParameter(f"{path} was made for {split['size']} samples, dataset has {n}; use a new --out-dir")
+        return split["train"], split["val"]
+    val_len = max(1, int(n * val_split))
+    perm = torch.randperm(n, generator=torch.Generator().manual_seed(seed)).tolist()
+    train_idx, val_idx = sorted(perm[val_len:]), sorted(perm[:val_len])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"size": n, "seed": seed, "val_split": val_split, "train": train_idx, "val": val_idx}), encoding="utf-8")
+    return train_idx, val_idx
+
+
+def resume_conflicts(ctx: typer.Context, cfg: TrainConfig) -> List[str]:
+    """Flags given on the command line that differ from what the resumed run saved in its config."""
+    def given(name: str) -> bool:
+        # By name: typer may bring its own copy of click and with it its own ParameterSource enum
+        source = ctx.get_parameter_source(name)
+        return source is not None and source.name == "COMMANDLINE"
+
+    conflicts = []
+    for name in ("encoder", "device_profile", "compile", "threads", "batch_size", "num_workers"):
+        if not given(name):
+            continue
+        value, saved = ctx.params[name], getattr(cfg, name)
+        if value != saved:
+            conflicts.append(f"--{name.replace('_', '-')} {value} (saved: {saved})")
+    if given("autotune_loader") and ctx.params["autotune_loader"]:
+        conflicts.append("--autotune (saved settings are reused)")
+    return conflicts
+
+
 app = typer.Typer(add_completion=False)
 
 
 @app.command()
 def main(
-    images_dir: Path = typer.Option(..., exists=True, readable=True),
-    masks_dir: Path = typer.Option(..., exists=True, readable=True),
+    ctx: typer.Context,
+    images_dir: Optional[Path] = typer.Option(None, exists=True, readable=True),
+    masks_dir: Optional[Path] = typer.Option(None, exists=True, readable=True),
+    store: Optional[Path] = typer.Option(None, exists=True, readable=True, help="Frame store with frame/mask fields (instead of image dirs)"),
+    shards: Optional[Path] = typer.Option(None, exists=True, readable=True, help="Packed shards from shards.py pack (fastest input path)"),
+    batch_augment: bool = typer.Option(False, help="With --shards: colour/noise/blur per batch after collation instead of per sample"),
+    seed: int = typer.Option(0, help="Seed for the train/val split, shuffling and augmentation"),
+    encoder: str = typer.Option(DEFAULT_ENCODER, help="segmentation_models_pytorch encoder name"),
     batch_size: int = typer.Option(8),
+    num_workers: int = typer.Option(4, min=0),
+    device_profile: str = typer.Option("gpu", help="gpu: fp16 mixed precision (previous default); cpu: bf16 autocast if native, channels-last, thread tuning"),
+    compile: bool = typer.Option(False, help="Wrap the model in torch.compile"),
+    threads: Optional[int] = typer.Option(None, min=1, help="Intra-op threads (cpu profile default: cores minus DataLoader workers)"),
+    autotune_loader: bool = typer.Option(False, "--autotune", help="Measure and pick batch size and num_workers with the highest samples/s"),
     epochs: int = typer.Option(20),
     val_split: float = typer.Option(0.1),
     out_dir: Path = typer.Option(Path("runs/seg")),
+    ckpt_every_n_steps: int = typer.Option(200, min=0, help="Also write out_dir/checkpoints/last.ckpt every N steps (0 = epoch ends only)"),
+    resume: bool = typer.Option(True, help="Continue from out_dir/checkpoints/last.ckpt if present"),
+    metrics_log: Optional[Path] = typer.Option(None, help="Per-epoch throughput log, .jsonl or .csv (default: out_dir/throughput.jsonl)"),
 ):
+    L.seed_everything(seed, workers=True)
+    last = out_dir / "checkpoints" / "last.ckpt"
+    resuming = resume and last.exists()
+    cfg = TrainConfig.load(out_dir) if resuming else None
+    if cfg is not None:
+        cfg.encoder = cfg.encoder or DEFAULT_ENCODER
+        # The checkpoint only fits the settings it was trained with, so don't let flags drift silently
+        conflicts = resume_conflicts(ctx, cfg)
+        if conflicts:
+            raise typer.BadParameter(f"Resuming from {last} with {out_dir / CONFIG_NAME}, which conflicts with: "
+                                     f"{'; '.join(conflicts)}. Drop those flags, pass --no-resume, or use a new --out-dir")
     print("[bold]Preparing datasets...[/bold]")
-    ds = SegDataset(images_dir, masks_dir, augment=default_transforms(512))
-    val_len = max(1, int(len(ds) * val_split))
-    train_len = len(ds) - val_len
-    train_ds, val_ds = random_split(ds, [train_len, val_len])
+    if batch_augment and shards is None:
+        raise typer.BadParameter("--batch-augment needs --shards (uint8 batches)")
+    collate_fn = None
+    if shards is not None and batch_augment:
+        ds = ShardSegDataset(shards)
+        collate_fn = BatchAugmentCollate(BatchAugment(seed=seed))
+    elif shards is not None:
+        ds = ShardSegDataset(shards, augment=photometric_transforms())
+    elif store is not None:
+        ds = StoreSegDataset(store, augment=default_transforms(512))
+    elif images_dir is not None and masks_dir is not None:
+        ds = SegDataset(images_dir, masks_dir, augment=default_transforms(512))
+    else:
+        raise typer.BadParameter("Pass --shards, --store, or both --images-dir and --masks-dir")
+    train_idx, val_idx = load_or_create_split(out_dir / "split.json", len(ds), val_split, seed)
+    train_ds, val_ds = Subset(ds, train_idx), Subset(ds, val_idx)
+
+    if cfg is not None:
+        print(f"[bold]Using saved config from {out_dir}[/bold]")
+    else:
+        if device_profile not in ("gpu", "cpu"):
+            raise typer.BadParameter("--device-profile must be gpu or cpu")
+        cpu = device_profile == "cpu"
+        cfg = TrainConfig(
+            device_profile=device_profile,
+            precision=cpu_precision() if cpu else "16-mixed",
+            channels_last=cpu,
+            compile=compile,
+            threads=threads,
+            batch_size=batch_size,
+            num_workers=num_workers,
+            encoder=encoder,
+        )
+        if autotune_loader:
+            print("[bold]Autotuning batch size and DataLoader workers...[/bold]")
+            autotune(lambda: build_net(cfg.encoder, pretrained=False), train_ds, cfg, collate_fn=collate_fn)
+            if threads is not None:
+                cfg.threads = threads
+        elif cpu and cfg.threads is None:
+            cfg.threads = max(1, available_cores() - cfg.num_workers)
+        cfg.save(out_dir)
+    if cfg.threads is not None:
+        set_threads(cfg.threads)
+    print(f"Config: {cfg.device_profile} profile, precision={cfg.precision}, channels_last={cfg.channels_last}, "
+          f"compile={cfg.compile}, threads={cfg.threads}, batch_size={cfg.batch_size}, num_workers={cfg.num_workers}, encoder={cfg.encoder}")
 
-    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True, num_workers=4)
-    val_loader = DataLoader(val_ds, batch_size=batch_size, shuffle=False, num_workers=4)
+    # A ragged last batch would make torch.compile recompile for a new shape every epoch
+    train_loader = DataLoader(train_ds, batch_size=cfg.batch_size, shuffle=True, num_workers=cfg.num_workers, collate_fn=collate_fn, drop_last=cfg.compile)
+    val_loader = DataLoader(val_ds, batch_size=cfg.batch_size, shuffle=False, num_workers=cfg.num_workers)
 
-    model = SegModule(lr=1e-3)
-    trainer = L.Trainer(max_epochs=epochs, precision="16-mixed", default_root_dir=str(out_dir))
-    trainer.fit(model, train_loader, val_loader)
+    model = SegModule(lr=1e-3, channels_last=cfg.channels_last, encoder_name=cfg.encoder)
+    checkpoint = ResumeCheckpoint(last, every_n_steps=ckpt_every_n_steps)
+    throughput = ThroughputLogger(metrics_log or out_dir / "throughput.jsonl")
+    trainer = L.Trainer(
+        max_epochs=epochs,
+        accelerator="cpu" if cfg.device_profile == "cpu" else "auto",
+        precision=cfg.precision,
+        default_root_dir=str(out_dir),
+        callbacks=[checkpoint, throughput],
+        deterministic="warn",
+    )
+    ckpt = str(last) if resuming else None
+    if ckpt is not None:
+        print(f"[bold]Resuming from {last}[/bold]")
+    trainer.fit(torch.compile(model) if cfg.compile else model, train_loader, val_loader, ckpt_path=ckpt)
 
     ckpt_path = out_dir / "model.ckpt"
     trainer.save_checkpoint(str(ckpt_path))